@@ -1,13 +1,63 @@
-from typing import List, Dict, Any
-import os
-
-import yaml
+import threading
+from typing import List, Dict, Any, Mapping, Tuple
 
+from config_service import ConfigService, get_config_service
+from endpoint_pool import character_endpoints
 from llm_factory import LLMFactory
 from llm_instance_manager import LLMInstanceManager
 from persona_manager import PersonaManager
 from log_manager import write_operation_log
-import yaml
+
+# 運用ログごとに共有する部品（LLMFactory / LLMInstanceManager / PersonaManager）。
+# いずれも会話ログ（セッション固有）には書かないため、運用ログ単位で使い回せる
+_shared_parts: Dict[str, Tuple[LLMFactory, LLMInstanceManager, PersonaManager]] = {}
+_shared_parts_lock = threading.Lock()
+
+
+def _shared_components(operation_log_filename: str) -> Tuple[LLMFactory, LLMInstanceManager, PersonaManager]:
+    with _shared_parts_lock:
+        parts = _shared_parts.get(operation_log_filename)
+        if parts is None:
+            parts = (
+                LLMFactory("", operation_log_filename),
+                LLMInstanceManager("", operation_log_filename),
+                PersonaManager("", operation_log_filename),
+            )
+            _shared_parts[operation_log_filename] = parts
+        return parts
+
+
+_profile_block_cache: Tuple[Any, str] = (None, "")
+
+
+def _user_profile_block(up: Mapping[str, Any]) -> str:
+    """user_profile.yaml の profile をペルソナ末尾に付ける要約ブロックにする（同じ profile なら前回の結果を返す）。"""
+    global _profile_block_cache
+    cached_profile, cached_block = _profile_block_cache
+    if cached_profile is up:
+        return cached_block
+    if not up:
+        return ""
+    extras = []
+    if up.get('birth_date') or up.get('gender'):
+        extras.append(f"ユーザー: {up.get('birth_date','?')} 生まれ / {up.get('gender','?')}")
+    if up.get('personality'):
+        pers = up['personality']
+        af = pers.get('animal_fortune')
+        mbti = pers.get('mbti')
+        extras.append(f"性格参考: 動物占い={af or '-'}, MBTI={mbti or '-'}")
+    if up.get('career'):
+        extras.append(f"職歴: {up['career'].get('since','?')}年〜 {up['career'].get('role','')}".strip())
+    if up.get('family'):
+        extras.append("家族: 結婚(2000)、娘(2008) 中学受験に付き添い")
+    if up.get('interaction_preferences'):
+        extras.append("会話方針: ユーザー発言には『よろしくお願いします』が含意。あなたの返答は『ありがとうございます』の姿勢で。短く分かりやすい文章を心がける。")
+    if up.get('social_watch'):
+        extras.append("参考リンクを随時ウォッチ: " + ", ".join(up['social_watch']))
+    block = "\n\n## ユーザープロファイル（要約）\n- " + "\n- ".join(extras)
+    _profile_block_cache = (up, block)
+    return block
+
 
 class CharacterManager:
     def __init__(self, log_filename: str, operation_log_filename: str, config_path: str = None, persona_path: str = None):
@@ -15,33 +65,30 @@ class CharacterManager:
         self.operation_log_filename = operation_log_filename
         
         write_operation_log(self.operation_log_filename, "INFO", "CharacterManager", "Initializing CharacterManager.")
-        # ベースディレクトリをこのファイルの位置に固定し、相対パス問題を回避
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        resolved_config_path = config_path or os.path.join(base_dir, 'config.yaml')
-        resolved_persona_path = persona_path or os.path.join(base_dir, 'personas.yaml')
-
-        with open(resolved_config_path, 'r', encoding='utf-8') as file:
-            self.character_configs = yaml.safe_load(file).get('characters', [])
-        
-        self.llm_factory = LLMFactory(self.log_filename, self.operation_log_filename)
-        self.llm_manager = LLMInstanceManager(self.log_filename, self.operation_log_filename)
-        self.persona_manager = PersonaManager(self.log_filename, self.operation_log_filename, resolved_persona_path)
-
-        # ユーザープロファイル読み込み（任意）
-        self.user_profile = {}
-        user_profile_path = os.path.join(base_dir, 'user_profile.yaml')
-        try:
-            if os.path.exists(user_profile_path):
-                with open(user_profile_path, 'r', encoding='utf-8') as f:
-                    data = yaml.safe_load(f) or {}
-                    self.user_profile = data.get('profile') or {}
-        except Exception:
-            self.user_profile = {}
+        # 設定（characters / personas / user_profile）は設定サービスのスナップショットを参照する。
+        # パスを明示した場合のみ専用のサービスを持つ
+        if config_path or persona_path:
+            self._config_service = ConfigService({"app": config_path, "personas": persona_path})
+            self.llm_factory = LLMFactory(self.log_filename, self.operation_log_filename)
+            self.llm_manager = LLMInstanceManager(self.log_filename, self.operation_log_filename)
+            self.persona_manager = PersonaManager(self.log_filename, self.operation_log_filename, persona_path)
+        else:
+            # 既定の設定ではセッション間で部品と LLM クライアントを共有し、セッション固有なのはログ/履歴だけにする
+            self._config_service = get_config_service()
+            self.llm_factory, self.llm_manager, self.persona_manager = _shared_components(self.operation_log_filename)
         
         write_operation_log(self.operation_log_filename, "INFO", "CharacterManager", "CharacterManager initialized.")
 
+    @property
+    def character_configs(self) -> Tuple[Mapping[str, Any], ...]:
+        return self._config_service.get().app.characters
+
+    @property
+    def user_profile(self) -> Mapping[str, Any]:
+        return self._config_service.get().user_profile
+
     def get_llm(self, character_name: str):
-        write_operation_log(self.operation_log_filename, "INFO", "CharacterManager", f"Getting LLM for {character_name}.")
+        write_operation_log(self.operation_log_filename, "INFO", "CharacterManager", "Getting LLM for %s.", character_name)
         
         # display_name（UI表示）→ 対応する internal_id を解決
         character_config = next((char for char in self.character_configs if char.get("display_name", char["name"]) == character_name or char.get("name") == character_name), None)
@@ -49,45 +96,36 @@ class CharacterManager:
         if character_config:
             provider = character_config.get("provider", "openai")
             model = character_config.get("model", "gpt-4o-mini")
-            base_url = character_config.get("base_url", None)
+            # base_url は単一 URL か URL のリスト（同じモデルを提供する複数サーバへ振り分け）
+            endpoints = character_endpoints(character_config)
+            base_url = endpoints if len(endpoints) > 1 else (endpoints[0] if endpoints else None)
             gen_params = character_config.get("generation", {}) or {}
+            # プロバイダ固有のクライアント設定（Ollama の api / keep_alive / carry_context / balance）
+            client_options = character_config.get(str(provider).lower()) or {}
             
-            llm = self.llm_manager.get_llm(character_name, provider, model, self.llm_factory, base_url, gen_params)
+            # 応答キャッシュは temperature 0（決定的）の場合だけ有効にする
+            response_cache = bool(character_config.get("response_cache")) and float(gen_params.get("temperature", 0.7)) == 0.0
+            if character_config.get("response_cache") and not response_cache:
+                write_operation_log(self.operation_log_filename, "WARNING", "CharacterManager", f"response_cache ignored for {character_name}: temperature is not 0.")
+
+            llm = self.llm_manager.get_llm(character_name, provider, model, self.llm_factory, base_url, gen_params, client_options, response_cache)
             
-            write_operation_log(self.operation_log_filename, "INFO", "CharacterManager", f"LLM retrieved for {character_name}.")
+            write_operation_log(self.operation_log_filename, "INFO", "CharacterManager", "LLM retrieved for %s.", character_name)
             return llm
             
         write_operation_log(self.operation_log_filename, "WARNING", "CharacterManager", f"Character {character_name} not found.")
         return None
 
     def get_persona_prompt(self, character_name: str) -> str:
-        write_operation_log(self.operation_log_filename, "INFO", "CharacterManager", f"Getting persona prompt for {character_name}.")
+        write_operation_log(self.operation_log_filename, "INFO", "CharacterManager", "Getting persona prompt for %s.", character_name)
         persona = self.persona_manager.get_persona_prompt(character_name)
-        # ユーザープロファイルを末尾に付加（軽量）
-        if self.user_profile:
-            up = self.user_profile
-            extras = []
-            if up.get('birth_date') or up.get('gender'):
-                extras.append(f"ユーザー: {up.get('birth_date','?')} 生まれ / {up.get('gender','?')}")
-            if up.get('personality'):
-                pers = up['personality']
-                af = pers.get('animal_fortune')
-                mbti = pers.get('mbti')
-                extras.append(f"性格参考: 動物占い={af or '-'}, MBTI={mbti or '-'}")
-            if up.get('career'):
-                extras.append(f"職歴: {up['career'].get('since','?')}年〜 {up['career'].get('role','')}".strip())
-            if up.get('family'):
-                extras.append("家族: 結婚(2000)、娘(2008) 中学受験に付き添い")
-            if up.get('interaction_preferences'):
-                ip = up['interaction_preferences']
-                extras.append("会話方針: ユーザー発言には『よろしくお願いします』が含意。あなたの返答は『ありがとうございます』の姿勢で。短く分かりやすい文章を心がける。")
-            if up.get('social_watch'):
-                extras.append("参考リンクを随時ウォッチ: " + ", ".join(up['social_watch']))
-            user_block = "\n\n## ユーザープロファイル（要約）\n- " + "\n- ".join(extras)
+        # ユーザープロファイルを末尾に付加（要約はスナップショットごとに一度だけ作る）
+        user_block = _user_profile_block(self.user_profile)
+        if user_block:
             return (persona or "") + user_block
         return persona
 
-    def list_characters(self) -> List[Dict[str, Any]]:
+    def list_characters(self) -> Tuple[Mapping[str, Any], ...]:
         return self.character_configs
 
     def get_character_names(self, include_hidden: bool = False) -> List[str]:
@@ -0,0 +1,309 @@
+import os
+import threading
+import time
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import yaml
+
+
+# 設定ファイル（LLM/config.yaml, KB/config.yaml, global_rules.yaml, personas.yaml, user_profile.yaml）を
+# 一度だけ読み込んで不変のスナップショットとして共有する。
+# get() は前回の確認から check_interval_sec 以上経っていれば os.stat で mtime/size を比べ、
+# 変わったファイルだけを読み直して新しいスナップショットに差し替える（ホットリロード）。
+
+_BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+_ROOT_DIR = os.path.abspath(os.path.join(_BASE_DIR, '..'))
+_KB_DIR = os.path.join(_ROOT_DIR, 'KB')
+
+DEFAULT_PATHS: Dict[str, str] = {
+    "app": os.path.join(_BASE_DIR, 'config.yaml'),
+    "kb": os.path.join(_KB_DIR, 'config.yaml'),
+    "global_rules": os.path.join(_BASE_DIR, 'global_rules.yaml'),
+    "personas": os.path.join(_BASE_DIR, 'personas.yaml'),
+    "user_profile": os.path.join(_BASE_DIR, 'user_profile.yaml'),
+}
+
+# 変更確認（stat）の最短間隔（秒）。0 なら毎回確認する
+DEFAULT_CHECK_INTERVAL_SEC = 1.0
+
+_EMPTY: Mapping[str, Any] = MappingProxyType({})
+
+
+def freeze(value: Any) -> Any:
+    """dict → MappingProxyType、list → tuple に再帰的に変換する（読み取り専用にする）。"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(v) for v in value)
+    return value
+
+
+def read_yaml(path: str) -> Dict[str, Any]:
+    """YAML を dict として読み込む（ファイルが無い/空なら {}）。構文エラーは呼び出し側へ送出する。"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as f:
+        data = yaml.safe_load(f)
+    return data if isinstance(data, dict) else {}
+
+
+def _section(data: Mapping[str, Any], key: str) -> Mapping[str, Any]:
+    value = data.get(key)
+    return value if isinstance(value, Mapping) else _EMPTY
+
+
+def resolve_kb_db_path(db_path: Optional[str]) -> str:
+    """
+    KB/config.yaml の db_path を絶対パスにする（KB/api.resolve_db_path と同じ規則）。
+    サブディレクトリを含む相対パスはプロジェクトルート基準、単純ファイル名は KB ディレクトリ基準。
+    """
+    db_path = db_path or 'DB/media.db'
+    if os.path.isabs(db_path):
+        return db_path
+    if ("/" in db_path) or ("\\" in db_path):
+        return os.path.abspath(os.path.join(_ROOT_DIR, db_path))
+    return os.path.abspath(os.path.join(_KB_DIR, db_path))
+
+
+@dataclass(frozen=True)
+class ConversationSettings:
+    """config.yaml の conversation セクション。"""
+    auto_loops: Optional[int] = None
+    streaming_enabled: bool = True
+    stop_at_budget: bool = True
+    debug_timing: bool = False
+    speculative_next: bool = True
+    pacing: Mapping[str, Any] = field(default_factory=lambda: _EMPTY)
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, Any]) -> "ConversationSettings":
+        auto_loops = data.get('auto_loops')
+        streaming = _section(data, 'streaming')
+        return cls(
+            auto_loops=auto_loops if isinstance(auto_loops, int) and auto_loops >= 0 else None,
+            streaming_enabled=bool(streaming.get('enabled', True)),
+            stop_at_budget=bool(streaming.get('stop_at_budget', True)),
+            debug_timing=bool(data.get('debug_timing', False)),
+            speculative_next=bool(data.get('speculative_next', True)),
+            pacing=_section(data, 'pacing'),
+        )
+
+
+@dataclass(frozen=True)
+class LogSettings:
+    """config.yaml の logs セクション。"""
+    conversation_dir: Optional[str] = None
+    operation_dir: Optional[str] = None
+    operation_level: Optional[str] = None
+    flush_interval_sec: Optional[float] = None
+    flush_bytes: Optional[int] = None
+    structured: bool = False
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, Any]) -> "LogSettings":
+        return cls(
+            conversation_dir=data.get('conversation_dir'),
+            operation_dir=data.get('operation_dir'),
+            operation_level=data.get('operation_level'),
+            flush_interval_sec=data.get('flush_interval_sec'),
+            flush_bytes=data.get('flush_bytes'),
+            structured=bool(data.get('structured', False)),
+        )
+
+
+@dataclass(frozen=True)
+class StartupSettings:
+    """config.yaml の startup セクション。"""
+    preload_models: bool = True
+    preload_blocking: bool = True
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, Any]) -> "StartupSettings":
+        return cls(
+            preload_models=bool(data.get('preload_models', True)),
+            preload_blocking=bool(data.get('preload_blocking', True)),
+        )
+
+
+@dataclass(frozen=True)
+class KBIngestSettings:
+    """config.yaml の kb セクション（会話中の kbjson 自動取り込み）。db_path は未指定なら None。"""
+    ingest_mode: bool = False
+    db_path: Optional[str] = None
+    category_hint: str = ""
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, Any]) -> "KBIngestSettings":
+        db_path = data.get('db_path')
+        if db_path and not os.path.isabs(db_path):
+            db_path = os.path.abspath(os.path.join(_ROOT_DIR, db_path))
+        return cls(
+            ingest_mode=bool(data.get('ingest_mode', False)),
+            db_path=db_path or None,
+            category_hint=str(data.get('category_hint') or ""),
+        )
+
+
+@dataclass(frozen=True)
+class AppConfig:
+    """LLM/config.yaml。raw は読み取り専用の元データ。"""
+    raw: Mapping[str, Any]
+    characters: Tuple[Mapping[str, Any], ...]
+    conversation: ConversationSettings
+    logs: LogSettings
+    startup: StartupSettings
+    kb: KBIngestSettings
+    http_pool: Mapping[str, Any]
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, Any]) -> "AppConfig":
+        characters = data.get('characters')
+        return cls(
+            raw=data,
+            characters=tuple(c for c in characters if isinstance(c, Mapping)) if isinstance(characters, tuple) else (),
+            conversation=ConversationSettings.from_mapping(_section(data, 'conversation')),
+            logs=LogSettings.from_mapping(_section(data, 'logs')),
+            startup=StartupSettings.from_mapping(_section(data, 'startup')),
+            kb=KBIngestSettings.from_mapping(_section(data, 'kb')),
+            http_pool=_section(data, 'http_pool'),
+        )
+
+
+@dataclass(frozen=True)
+class KBConfig:
+    """KB/config.yaml。db_path は解決済みの絶対パス。"""
+    raw: Mapping[str, Any]
+    db_path: str
+    max_auto_next: int = 3
+
+    @classmethod
+    def from_mapping(cls, data: Mapping[str, Any]) -> "KBConfig":
+        v = data.get('max_auto_next')
+        return cls(
+            raw=data,
+            db_path=resolve_kb_db_path(data.get('db_path')),
+            max_auto_next=v if isinstance(v, int) and v >= 0 else 3,
+        )
+
+
+def _persona_prompts(data: Mapping[str, Any]) -> Mapping[str, str]:
+    """personas.yaml を 表示名 → system_prompt に変換する。"""
+    prompts: Dict[str, str] = {}
+    for persona_info in data.values():
+        if not isinstance(persona_info, Mapping):
+            continue
+        display_name = persona_info.get("name")
+        prompt = persona_info.get("system_prompt")
+        if display_name and prompt:
+            prompts[display_name] = prompt
+    return MappingProxyType(prompts)
+
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """ある時点の全設定。差し替えはスナップショット単位なので、参照中に値が混ざることはない。"""
+    app: AppConfig
+    kb: KBConfig
+    global_rules: Mapping[str, Any]
+    personas: Mapping[str, str]
+    user_profile: Mapping[str, Any]
+    version: int = 0
+
+    @property
+    def kb_ingest_db_path(self) -> str:
+        """kbjson 取り込み先。LLM/config.yaml の kb.db_path があれば優先し、無ければ KB/config.yaml。"""
+        return self.app.kb.db_path or self.kb.db_path
+
+
+def _stat(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+class ConfigService:
+    """
+    設定ファイル群のキャッシュ。get() はほぼ常にキャッシュ済みのスナップショットを返すだけで、
+    check_interval_sec ごとに stat で変更を確認する。読み込みに失敗したファイル（編集途中など）は
+    直前の内容を使い続け、次の確認で再読込する。
+    """
+
+    def __init__(self, paths: Optional[Dict[str, str]] = None, check_interval_sec: float = DEFAULT_CHECK_INTERVAL_SEC):
+        self.paths: Dict[str, str] = dict(DEFAULT_PATHS)
+        self.paths.update({k: v for k, v in (paths or {}).items() if v})
+        self.check_interval_sec = check_interval_sec
+        self._stamps: Dict[str, Optional[Tuple[int, int]]] = {}
+        self._data: Dict[str, Mapping[str, Any]] = {}
+        self._snapshot: Optional[ConfigSnapshot] = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def get(self) -> ConfigSnapshot:
+        snapshot = self._snapshot
+        if snapshot is not None and time.monotonic() < self._next_check:
+            return snapshot
+        return self.refresh()
+
+    def refresh(self, force: bool = False) -> ConfigSnapshot:
+        """変更のあったファイルを読み直す（force=True なら全ファイル）。"""
+        with self._lock:
+            changed = False
+            for key, path in self.paths.items():
+                stamp = _stat(path)
+                if not force and key in self._stamps and self._stamps[key] == stamp:
+                    continue
+                try:
+                    data = freeze(read_yaml(path))
+                except Exception as e:
+                    print(f"Warning: Could not load config from {path}. Error: {e}")
+                    self._data.setdefault(key, _EMPTY)
+                    continue
+                self._stamps[key] = stamp
+                self._data[key] = data
+                changed = True
+            if changed or self._snapshot is None:
+                self._snapshot = self._build(self._snapshot.version + 1 if self._snapshot else 1)
+            self._next_check = time.monotonic() + max(0.0, self.check_interval_sec)
+            return self._snapshot
+
+    def _build(self, version: int) -> ConfigSnapshot:
+        profile = self._data.get("user_profile", _EMPTY).get('profile')
+        return ConfigSnapshot(
+            app=AppConfig.from_mapping(self._data.get("app", _EMPTY)),
+            kb=KBConfig.from_mapping(self._data.get("kb", _EMPTY)),
+            global_rules=self._data.get("global_rules", _EMPTY),
+            personas=_persona_prompts(self._data.get("personas", _EMPTY)),
+            user_profile=profile if isinstance(profile, Mapping) else _EMPTY,
+            version=version,
+        )
+
+
+_service: Optional[ConfigService] = None
+_service_lock = threading.Lock()
+
+
+def get_config_service() -> ConfigService:
+    """既定パスの共有 ConfigService を返す。"""
+    global _service
+    if _service is None:
+        with _service_lock:
+            if _service is None:
+                _service = ConfigService()
+    return _service
+
+
+def configure_config_service(paths: Optional[Dict[str, str]] = None, check_interval_sec: float = DEFAULT_CHECK_INTERVAL_SEC) -> ConfigService:
+    """共有 ConfigService を差し替える（テストや別の設定ディレクトリで起動する場合）。"""
+    global _service
+    with _service_lock:
+        _service = ConfigService(paths, check_interval_sec)
+    return _service
+
+
+def get_config() -> ConfigSnapshot:
+    """現在の設定スナップショット。"""
+    return get_config_service().get()
@@ -7,21 +7,32 @@ import json
 import shutil
 from datetime import datetime
 import traceback
+import time
 import uuid
 from datetime import datetime
 from fastapi import WebSocket
-import yaml
 import os
 import sys
 from typing import Dict, List, Dict as TDict
-from typing import Optional
+from typing import AsyncIterator, Awaitable, Callable, Optional, Tuple
 import random
 
 from character_manager import CharacterManager
 from status_manager import update_status, update_all_statuses
-from log_manager import write_log, get_formatted_conversation_history, write_operation_log
+from log_manager import write_log, get_formatted_conversation_history, aload_conversation_history, write_operation_log, release_conversation_history, close_log_file, write_structured_log
+from llm_factory import llm_call_stats
+from deadline import deadline_settings, llm_deadline, wait_with_deadline
+from endpoint_pool import CIRCUIT_HALF_OPEN, CIRCUIT_OPEN, CircuitOpenError, character_circuit_state, character_endpoints
+import metrics
 from memory_manager import persist_thread_from_log
 from next_speaker_resolver import resolve_next_speaker, NextPolicy
+from stop_policy import StopPolicy
+from turn_timer import TurnTimer
+from pacing import PacingSettings, TurnPacer
+from speculation import SpeculativeStream, invoke_once
+from config_service import get_config, read_yaml
+from prompt_template import PLACEHOLDER_PATTERN, PROMPT_CACHE
+from llm_scheduler import llm_priority, llm_session_var
 try:
     from ingest_mode import run_ingest_mode as _kb_run_ingest  # type: ignore
 except Exception:
@@ -50,9 +61,6 @@ def safe_brace_format(template: str, **kwargs) -> str:
     - 置換対象は {identifier} のみ（英数字とアンダースコア）。
     - それ以外（例: JSON の {"next": ...} や波括弧を含む構造）は無視してそのまま残す。
     """
-    import re as _re
-    pattern = _re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
-
     def _repl(match):
         key = match.group(1)
         if key in kwargs:
@@ -60,7 +68,7 @@ def safe_brace_format(template: str, **kwargs) -> str:
         # 未定義キーは元のまま残す（KeyErrorを避ける）
         return match.group(0)
 
-    return pattern.sub(_repl, template)
+    return PLACEHOLDER_PATTERN.sub(_repl, template)
 
 
 def shorten_text(text: str, max_sentences: int = 2, max_chars: int = 140) -> str:
@@ -77,26 +85,31 @@ def shorten_text(text: str, max_sentences: int = 2, max_chars: int = 140) -> str
     return clipped
 
 
+_PREAMBLE_PATTERNS = [
+    re.compile(r"^おはようございます[！!。\s]*"),
+    re.compile(r"^こんにちは[！!。\s]*"),
+    re.compile(r"^こんばんは[！!。\s]*"),
+    re.compile(r"^(本日|今日は|今回|ここでは).{0,15}について(お知らせ|ご案内)いたします[。！!\s]*"),
+    re.compile(r"^(本日|今日は|今回|ここでは).{0,15}について(お知らせ|ご案内)します[。！!\s]*"),
+    re.compile(r"^ご連絡いたします[。！!\s]*"),
+]
+
+
+def _strip_preamble(s: str) -> str:
+    """定型の前置きを除去した結果を返す（前置きのみなら空文字）。"""
+    for pat in _PREAMBLE_PATTERNS:
+        s = pat.sub("", s)
+    # 先頭に残った読点/句読点/記号を除去
+    s = s.lstrip(" 、。!！?？・:;　\t")
+    return s.strip()
+
+
 def remove_preamble(text: str) -> str:
     """挨拶・導入の定型句を除去して要点を先頭に出す。空になりそうな場合は元を返す。"""
     if not text:
         return text
     original = text
-    s = str(text).strip()
-    import re as _re
-    patterns = [
-        r"^おはようございます[！!。\s]*",
-        r"^こんにちは[！!。\s]*",
-        r"^こんばんは[！!。\s]*",
-        r"^(本日|今日は|今回|ここでは).{0,15}について(お知らせ|ご案内)いたします[。！!\s]*",
-        r"^(本日|今日は|今回|ここでは).{0,15}について(お知らせ|ご案内)します[。！!\s]*",
-        r"^ご連絡いたします[。！!\s]*",
-    ]
-    for pat in patterns:
-        s = _re.sub(pat, "", s)
-    # 先頭に残った読点/句読点/記号を除去
-    s = s.lstrip(" 、。!！?？・:;　\t")
-    s = s.strip()
+    s = _strip_preamble(str(text).strip())
     return s or original
 
 
@@ -112,30 +125,211 @@ def ensure_sentence_complete(text: str) -> str:
     return s + "。"
 
 
-def _load_auto_loops_from_config(default_value: int) -> int:
-    """LLM/config.yaml の conversation.auto_loops を読み込む（存在しなければ既定値）。"""
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[。.!?！？])\s*")
+_THINK_BLOCK_RE = re.compile(r"<think>.*?</think>", re.DOTALL)
+_DISPLAY_TAG_RE = re.compile(r"\[(?:Next|ASK_SEARCHER):[^\]]*\]", re.IGNORECASE)
+# remove_preamble のパターンが判定できるまで表示を保留する最小文字数
+_PREAMBLE_HOLD_CHARS = 40
+
+
+class _LogPreview:
+    """運用ログ用のプレビュー。ログレベルで捨てられる場合は切り詰め/改行置換を行わない（%s 整形時に評価）。"""
+    __slots__ = ("text", "limit")
+
+    def __init__(self, text: Optional[str], limit: int):
+        self.text = text
+        self.limit = limit
+
+    def __str__(self) -> str:
+        return (self.text or "")[: self.limit].replace("\n", " ")
+
+
+def _clean_stream_text(raw: str) -> str:
+    """ストリーム途中の生テキストから、表示対象外の部分（<think>、タグ、JSON 片）を除いた本文を返す。"""
+    s = _THINK_BLOCK_RE.sub("", raw)
+    open_think = s.find("<think>")
+    if open_think != -1:
+        s = s[:open_think]
+    s = _DISPLAY_TAG_RE.sub("", s)
+    # 閉じていないタグ/JSON 片は確定するまで保留
+    open_tag = s.rfind("[")
+    if open_tag != -1 and "]" not in s[open_tag:]:
+        s = s[:open_tag]
+    brace = s.find("{")
+    if brace != -1:
+        s = s[:brace]
+    return s.strip()
+
+
+# 表示の上限（2文/160字）に達した後も、応答末尾の [Next: X] 指名を待って読み続ける文字数
+NEXT_TAG_GRACE_CHARS = 80
+
+
+def build_turn_stop_policy(max_sentences: int = 2, max_chars: int = 160, next_tag_grace_chars: int = NEXT_TAG_GRACE_CHARS) -> StopPolicy:
+    """
+    会話ターン用の打ち切り条件。表示整形後の本文で文数/文字数を数え、[Next:] 指名が出たら止める。
+    文数/文字数に達しても表示はそこで止まる（StreamingResponseShaper）が、上流は指名タグが来るか
+    next_tag_grace_chars 文字読むまで続ける（指名を落として巡回順に戻らないように）。
+    """
+    return StopPolicy(
+        max_sentences=max_sentences,
+        max_chars=max_chars,
+        stop_on_next_tag=True,
+        next_tag_grace_chars=next_tag_grace_chars,
+        text_filter=lambda raw: _strip_preamble(_clean_stream_text(raw)),
+    )
+
+
+class StreamingResponseShaper:
+    """
+    ストリーミング応答を逐次整形し、表示してよい確定部分だけを差分で返す。
+    - <think> ブロック、[Next: ...] / [ASK_SEARCHER: ...] タグ、JSON 片は表示しない（閉じていない途中のものも保留）
+    - 前置き除去は判定に十分な長さが揃うまで保留してから適用
+    最終的な表示テキストは従来どおり全文に対する整形結果（message_end）で確定させる。
+    """
+
+    def __init__(self, max_sentences: int = 2, max_chars: int = 160) -> None:
+        self.max_sentences = max_sentences
+        self.max_chars = max_chars
+        self.raw = ""
+        self.sent = ""
+
+    def _shaped(self) -> str:
+        s = _clean_stream_text(self.raw)
+        if not s:
+            return ""
+        if len(s) < _PREAMBLE_HOLD_CHARS and not re.search(r"[。！!？?]", s):
+            return ""
+        # 前置きだけの段階では何も出さない（後続が来てから除去結果を表示）
+        s = _strip_preamble(s)
+        if not s:
+            return ""
+        return shorten_text(s, max_sentences=self.max_sentences, max_chars=self.max_chars)
+
+    def feed(self, delta: str) -> str:
+        """差分を取り込み、新たに表示可能になったテキスト（未送信分）を返す。"""
+        self.raw += delta or ""
+        candidate = self._shaped()
+        if not candidate.startswith(self.sent) or len(candidate) <= len(self.sent):
+            return ""
+        out = candidate[len(self.sent):]
+        self.sent = candidate
+        return out
+
+
+async def _stream_response(
+    websocket: WebSocket,
+    agen: AsyncIterator[str],
+    character_name: str,
+    shaper: StreamingResponseShaper,
+    before_first_send: Optional[Callable[[], Awaitable[None]]] = None,
+) -> str:
+    """
+    差分ストリーム（llm.astream または先行生成の再生）を message_delta として送る。
+    打ち切りは LLM 層の stop_policy に任せる。生の全文を返す。
+    before_first_send は最初の差分を送る直前に一度だけ待つ（ペーシング。待つ間も生成は進む）。
+    """
+    pending_gate = before_first_send
     try:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        config_path = os.path.join(base_dir, 'config.yaml')
-        with open(config_path, 'r', encoding='utf-8') as f:
-            cfg = yaml.safe_load(f) or {}
-        conv = cfg.get('conversation') or {}
-        val = conv.get('auto_loops')
-        if isinstance(val, int) and val >= 0:
-            return val
+        async for delta in agen:
+            out = shaper.feed(delta)
+            if out:
+                if pending_gate is not None:
+                    await pending_gate()
+                    pending_gate = None
+                await websocket.send_json({"type": "message_delta", "speaker": character_name, "text": out})
+    finally:
+        # 途中で抜けた場合もストリームを閉じ、GPU時間の浪費を防ぐ
+        await agen.aclose()
+    return shaper.raw
+
+
+def _final_message_frame(shaper: StreamingResponseShaper, character_name: str, text: str, wants_ack: bool = False) -> Dict:
+    """
+    発言の確定フレーム。ストリーミング済み（差分を送った）なら message_end で全文整形結果に置き換え、
+    未送信なら従来どおり message で一括送信する。wants_ack なら描画完了後に {"type": "ack"} を返してもらう。
+    """
+    frame = {
+        "type": "message_end" if shaper.sent else "message",
+        "speaker": character_name,
+        "text": text,
+    }
+    if wants_ack:
+        frame["ack"] = True
+    return frame
+
+
+def _call_timing_fields(call_stats: Dict, started: float, finished: float) -> Dict:
+    """llm_call_stats に記録された時刻/サーバ報告値から、構造化ログ用のレイテンシ項目(ms)を組み立てる。"""
+    sent = call_stats.get("sent_at", started)
+    fields: Dict = {"gen_ms": round((finished - sent) * 1000, 1)}
+    first = call_stats.get("first_token_at")
+    if first is not None:
+        fields["ttft_ms"] = round((first - sent) * 1000, 1)
+    total = call_stats.get("total_ms")
+    done = call_stats.get("done_at")
+    if total is not None and done is not None:
+        # 実測の往復時間からサーバ処理時間を引いた残り ≒ サーバ側の待ち行列 + 通信
+        fields["queue_wait_ms"] = round(max(0.0, (done - sent) * 1000 - total), 1)
+        fields["server_total_ms"] = round(total, 1)
+    for key in ("load_ms", "prompt_eval_ms", "eval_ms", "scheduler_wait_ms"):
+        if key in call_stats:
+            fields[key] = round(call_stats[key], 1)
+    for key in ("prompt_eval_count", "eval_count", "priority", "hedged", "cache_hit"):
+        if key in call_stats:
+            fields[key] = call_stats[key]
+    return fields
+
+
+async def _emit_turn_timing(websocket: WebSocket, timer: TurnTimer, character_name: str, req_id: str, operation_log_filename: str) -> None:
+    """ターンの区間内訳を timing フレームとして送り、構造化ログにも残す。"""
+    frame = timer.frame(character_name, req_id)
+    write_structured_log(operation_log_filename, "turn_timing", speaker=character_name, req_id=req_id,
+                         total_ms=frame["total_ms"], spans=frame["spans"], llm=frame.get("llm"),
+                         unaccounted_ms=frame["unaccounted_ms"])
+    try:
+        await websocket.send_json(frame)
+    except Exception as e:
+        write_operation_log(operation_log_filename, "WARNING", "ConversationLoop", f"Failed to send timing frame: {e}")
+
+
+def _load_pacing_settings() -> PacingSettings:
+    """LLM/config.yaml の conversation.pacing を読み込む（未指定なら fixed 1秒）。"""
+    try:
+        return PacingSettings.from_dict(get_config().app.conversation.pacing)
     except Exception:
-        pass
-    return default_value
+        return PacingSettings()
+
+
+def _load_speculative_setting() -> bool:
+    """LLM/config.yaml の conversation.speculative_next（次話者の先行生成）を読み込む。"""
+    return get_config().app.conversation.speculative_next
+
+
+def _load_debug_timing_setting() -> bool:
+    """LLM/config.yaml の conversation.debug_timing（ターンごとの timing フレーム送出）を読み込む。"""
+    return get_config().app.conversation.debug_timing
+
+
+def _load_streaming_settings() -> tuple:
+    """LLM/config.yaml の conversation.streaming を読み込み、(enabled, stop_at_budget) を返す。"""
+    conv = get_config().app.conversation
+    return conv.streaming_enabled, conv.stop_at_budget
+
+
+def _load_auto_loops_from_config(default_value: int) -> int:
+    """LLM/config.yaml の conversation.auto_loops を読み込む（存在しなければ既定値）。"""
+    val = get_config().app.conversation.auto_loops
+    return default_value if val is None else val
 
 def load_global_rules(rules_path: str = None) -> Dict:
-    """LLM/global_rules.yaml をこのファイルの位置からの絶対パスで確実に読み込む"""
+    """LLM/global_rules.yaml を読み込む（既定パスは設定サービスのキャッシュを使う）"""
+    if not rules_path:
+        return get_config().global_rules
     try:
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        resolved_path = rules_path or os.path.join(base_dir, 'global_rules.yaml')
-        with open(resolved_path, 'r', encoding='utf-8') as file:
-            return yaml.safe_load(file)
+        return read_yaml(rules_path)
     except Exception as e:
-        print(f"Warning: Could not load global rules from {rules_path or resolved_path}. Error: {e}")
+        print(f"Warning: Could not load global rules from {rules_path}. Error: {e}")
         return {}
 
 # ===== kbjson 抽出/正規化/登録の準備 =====
@@ -158,15 +352,8 @@ except Exception:
 
 
 def _resolve_kb_db_path_from_kb_config() -> str:
-    """KB公式APIでDBパスを解決する。失敗時は KB/DB/media.db にフォールバック。
-    """
-    try:
-        if _KB_DIR not in sys.path:
-            sys.path.append(_KB_DIR)
-        import api as kb  # type: ignore
-        return kb.resolve_db_path()
-    except Exception:
-        return os.path.abspath(os.path.join(_KB_DIR, 'DB', 'media.db'))
+    """KB/config.yaml の db_path（設定サービスで解決済みの絶対パス）を返す。"""
+    return get_config().kb.db_path
 
 
 # ==== KB ユーティリティ（会話コマンド用） ====
@@ -460,21 +647,130 @@ def _is_kb_domain_query(text: str) -> bool:
 
 def _load_kb_ingest_settings() -> tuple:
     """LLM/config.yaml から kb.ingest_mode と db_path を読み出し、(enabled, db_path) を返す。"""
+    cfg = get_config()
+    return cfg.app.kb.ingest_mode, cfg.kb_ingest_db_path
+
+def _build_turn_prompt(manager: CharacterManager, character_name: str, log_filename: str, global_rules: Dict, timer: Optional[TurnTimer] = None) -> Tuple[str, int]:
+    """
+    ペルソナ・会話履歴・グローバルルールからシステムプロンプトを組み立て、(プロンプト, 静的プレフィックス長) を返す。
+    履歴より前の部分はキャラクターごとにキャッシュ済みのものを使う。
+    """
+    timer = timer or TurnTimer(False)
+    with timer.span("persona_lookup"):
+        persona_prompt = manager.get_persona_prompt(character_name)
+
+    with timer.span("history_read"):
+        conversation_log = get_formatted_conversation_history(log_filename)
+    with timer.span("prompt_format"):
+        compiled = PROMPT_CACHE.get(
+            character_name,
+            persona_prompt,
+            global_rules,
+            manager.list_characters(),
+            lambda: ", ".join(name for name in manager.get_character_names() if name != character_name),
+        )
+        return compiled.render(conversation_log), compiled.static_prefix_len
+
+
+def _resolve_next_display_name(manager: CharacterManager, character_name: str, response_text: str, operation_log_filename: str) -> Optional[str]:
+    """応答末尾の [Next: ...] 等から次話者を解決し、表示名で返す（解決できなければ None）。"""
+    registry: List[TDict[str, str]] = []
+    for c in manager.list_characters():
+        registry.append({
+            "internal_id": c.get("name"),
+            "display_name": c.get("display_name", c.get("name")),
+            "short_name": c.get("short_name", ""),
+        })
+
+    # 現在の internal_id を display→internal 変換
+    current_internal_id = None
+    for c in registry:
+        if c["display_name"] == character_name:
+            current_internal_id = c["internal_id"]
+            break
+    if current_internal_id is None and registry:
+        current_internal_id = registry[0]["internal_id"]
+
+    policy = NextPolicy(allow_self_nomination=False, fallback="round_robin", fuzzy_threshold=0.85)
+    next_internal_id, reason, extracted, normalized = resolve_next_speaker(
+        response_text, current_internal_id, registry, policy, operation_log_filename
+    )
+
+    # internal_id → display_name へ戻す
+    if next_internal_id:
+        for c in registry:
+            if c["internal_id"] == next_internal_id:
+                return c["display_name"]
+    return None
+
+
+def _character_call_meta(manager: CharacterManager, character_name: str) -> tuple:
+    """ログ/メトリクス用に (provider, model, base_url) を返す。"""
+    char_cfg = next((c for c in manager.list_characters() if c.get("display_name", c.get("name")) == character_name or c.get("name") == character_name), None)
+    return (
+        (char_cfg or {}).get("provider", ""),
+        (char_cfg or {}).get("model", ""),
+        ",".join(character_endpoints(char_cfg or {})),
+    )
+
+
+# サーキットブレーカーの状態 → ステータス表示
+_CIRCUIT_STATUS = {CIRCUIT_OPEN: "OFFLINE", CIRCUIT_HALF_OPEN: "RECOVERING"}
+
+
+def _circuit_status(manager: CharacterManager, character_name: str) -> Optional[str]:
+    """
+    キャラクターの LLM エンドポイントが遮断中なら表示用ステータス（OFFLINE/RECOVERING）、通常なら None。
+    毎ターン呼ばれるので LLM インスタンスは取得せず、作成済みのエンドポイントプールの状態だけを読む。
+    """
+    char_cfg = next((c for c in manager.list_characters() if c.get("display_name", c.get("name")) == character_name or c.get("name") == character_name), None)
+    if char_cfg is None:
+        return None
     try:
-        llm_cfg_path = os.path.join(_BASE_DIR, 'config.yaml')
-        with open(llm_cfg_path, 'r', encoding='utf-8') as f:
-            cfg = yaml.safe_load(f) or {}
-        kb_cfg = cfg.get('kb') or {}
-        enabled = bool(kb_cfg.get('ingest_mode', False))
-        db_path = kb_cfg.get('db_path')
-        if db_path:
-            if not os.path.isabs(db_path):
-                db_path = os.path.abspath(os.path.join(_BASE_DIR, '..', db_path))
-        else:
-            db_path = _resolve_kb_db_path_from_kb_config()
-        return enabled, db_path
+        return _CIRCUIT_STATUS.get(character_circuit_state(char_cfg))
     except Exception:
-        return False, _resolve_kb_db_path_from_kb_config()
+        return None
+
+
+async def _update_statuses_with_circuit(websocket: WebSocket, manager: CharacterManager, status: str, log_filename: str, operation_log_filename: str) -> None:
+    """全キャラクターを status にする。ただし LLM が遮断中のキャラクターはその状態を表示する。"""
+    for name in manager.get_character_names():
+        await update_status(websocket, name, _circuit_status(manager, name) or status, log_filename, operation_log_filename)
+
+
+class SpeculativeTurn:
+    """
+    次話者の先行生成。直前の発言で [Next: X] が解決した時点で X のプロンプトを組み立てて生成を始め、
+    差分はバッファしておく。ループ側で次話者が X に確定したら process_character_turn に渡して採用し、
+    変わった場合は cancel() で破棄する（上流の生成も止まる）。
+    """
+
+    def __init__(self, manager: CharacterManager, character_name: str, last_message: str, log_filename: str, global_rules: Dict, streaming: tuple):
+        started = time.perf_counter()
+        self.speaker = character_name
+        self.last_message = last_message
+        llm = manager.get_llm(character_name)
+        if llm is None:
+            raise ValueError(f"LLM not available for {character_name}")
+        self.final_prompt, self.static_prefix_len = _build_turn_prompt(manager, character_name, log_filename, global_rules)
+        stream_enabled, stop_at_budget = streaming
+        stop_policy = build_turn_stop_policy(max_sentences=2, max_chars=160) if stop_at_budget else None
+        self.streamed = bool(stream_enabled and hasattr(llm, "astream"))
+        if self.streamed:
+            factory = lambda: llm.astream(self.final_prompt, last_message, stop_policy, static_prefix_len=self.static_prefix_len)
+        else:
+            factory = lambda: invoke_once(lambda: llm.ainvoke(self.final_prompt, last_message, stop_policy, static_prefix_len=self.static_prefix_len))
+        self.prompt_ms = (time.perf_counter() - started) * 1000
+        # 先行生成のタスクにも（開始時点からの）持ち時間を引き継ぐ
+        with llm_deadline(deadline_settings()["turn_budget_sec"]):
+            self.stream = SpeculativeStream(factory)
+
+    def matches(self, character_name: str, last_message: str) -> bool:
+        return self.speaker == character_name and self.last_message == last_message
+
+    def cancel(self) -> None:
+        self.stream.cancel()
+
 
 async def process_character_turn(
     websocket: WebSocket,
@@ -484,46 +780,44 @@ async def process_character_turn(
     log_filename: str,
     operation_log_filename: str,
     global_rules: Dict,
-    info_search_mode: bool
+    info_search_mode: bool,
+    streaming: tuple = (False, True),
+    timing: bool = False,
+    pacer: Optional[TurnPacer] = None,
+    speculative: Optional[SpeculativeTurn] = None,
+    on_next_resolved: Optional[Callable[[str, str], None]] = None,
 ):
-    llm = manager.get_llm(character_name)
+    """
+    1キャラクター分の応答を生成・送信し、(次話者, 応答テキスト, メタ) を返す。
+    speculative: このターン用に先行生成済みのストリーム（あれば LLM を呼ばずにそれを再生する）
+    on_next_resolved: 次話者が解決した時点で (次話者, 応答テキスト) を通知する（送信や kbjson 処理より前）
+    """
+    # debug_timing 有効時のみ区間を計測し、ターン末尾で timing フレーム/構造化ログに出す
+    timer = TurnTimer(timing)
+    with timer.span("llm_lookup"):
+        llm = manager.get_llm(character_name)
     if not llm:
-        return None, ""
+        if speculative is not None:
+            speculative.cancel()
+        return None, "", {}
 
-    write_operation_log(operation_log_filename, "INFO", "ConversationLoop", f"Processing response for {character_name}.")
+    write_operation_log(operation_log_filename, "INFO", "ConversationLoop", "Processing response for %s.", character_name)
     print(f"[{datetime.now().strftime('%H:%M:%S')}] {character_name}の応答処理を開始")
-    await update_status(websocket, character_name, "THINKING", log_filename, operation_log_filename)
-
-    persona_prompt = manager.get_persona_prompt(character_name)
-    if not persona_prompt:
-        persona_prompt = "あなたはAIです。日本語で応答してください。"
-
-    conversation_log = get_formatted_conversation_history(log_filename)
-    other_characters_list = [name for name in manager.get_character_names() if name != character_name]
-    other_characters = ", ".join(other_characters_list)
-
-    prompt_template = global_rules.get("prompt_template", "{persona_prompt}")
-    response_constraints = safe_brace_format(global_rules.get("response_constraints", ""), character_name=character_name)
-    flow_rules = safe_brace_format(global_rules.get("flow_rules", ""), other_characters=other_characters)
-
-    final_prompt = safe_brace_format(
-        prompt_template,
-        character_name=character_name,
-        persona_prompt=persona_prompt,
-        response_constraints=response_constraints,
-        flow_rules=flow_rules,
-        other_characters=other_characters,
-        conversation_log=conversation_log,
-    )
-    
+    with timer.span("status"):
+        await update_status(websocket, character_name, "THINKING", log_filename, operation_log_filename)
+
+    if speculative is not None:
+        # 先行生成済み: プロンプトは開始時点（直前の発言をログに書いた直後）のものを使う
+        final_prompt, static_prefix_len = speculative.final_prompt, speculative.static_prefix_len
+        timer.add("prompt_build_speculative", speculative.prompt_ms)
+    else:
+        final_prompt, static_prefix_len = _build_turn_prompt(manager, character_name, log_filename, global_rules, timer)
+
     system_prompt = final_prompt
     user_message = last_message
 
     # 呼び出しメタ情報（モデル等）を特定
-    char_cfg = next((c for c in manager.list_characters() if c.get("display_name", c.get("name")) == character_name or c.get("name") == character_name), None)
-    provider = (char_cfg or {}).get("provider", "")
-    model = (char_cfg or {}).get("model", "")
-    base_url = (char_cfg or {}).get("base_url", "")
+    provider, model, base_url = _character_call_meta(manager, character_name)
 
     # 相関IDでリクエスト/レスポンスをひも付け
     req_id = uuid.uuid4().hex[:8]
@@ -531,16 +825,53 @@ async def process_character_turn(
         operation_log_filename,
         "INFO",
         "LLMCall",
-        f"REQ {req_id} -> speaker={character_name}, provider={provider}, model={model}, base_url={base_url}, system_len={len(final_prompt)}, user_len={len(last_message or '')}"
+        "REQ %s -> speaker=%s, provider=%s, model=%s, base_url=%s, system_len=%d, static_prefix_len=%d, user_len=%d",
+        req_id, character_name, provider, model, base_url, len(final_prompt), static_prefix_len, len(last_message or ''),
     )
     print(f"[{datetime.now().strftime('%H:%M:%S')}] {character_name}の応答を生成中... (req={req_id})")
 
     response_text = ""
     raw_response_text: Optional[str] = None
+    # 次話者の解決に使う本文（表示用に 2 文へ短縮する前。末尾の [Next:] を落とさない）
+    next_source_text = ""
     detected_meta: Dict = {}
+    stream_enabled, stop_at_budget = streaming
+    shaper = StreamingResponseShaper(max_sentences=2, max_chars=160)
+    # [Next:] 到達、または 2文/160字（shorten_text の上限）から指名待ちの猶予を読み切った時点で上流の生成を打ち切る
+    stop_policy = build_turn_stop_policy(max_sentences=2, max_chars=160) if stop_at_budget else None
+    streamed = speculative.streamed if speculative is not None else bool(stream_enabled and hasattr(llm, "astream"))
+    # クライアントが送信/初回トークン時刻やサーバ報告値を書き込む（構造化ログ用）。先行生成分はそのタスクで記録済み
+    call_stats: Dict = speculative.stream.stats if speculative is not None else {}
+    stats_token = llm_call_stats.set(call_stats)
+    call_status = "ok"
+    call_error: Optional[str] = None
+    # 直前の発言の表示時間（ペーシング）を確保してから送る。待つ間も生成は進める
+    paced_ms = [0.0]
+
+    async def _await_pacing() -> None:
+        if pacer is None:
+            return
+        started = time.perf_counter()
+        await pacer.wait_ready()
+        paced_ms[0] += (time.perf_counter() - started) * 1000
+
+    turn_budget = deadline_settings()["turn_budget_sec"]
+    call_started = time.perf_counter()
+    call_finished: Optional[float] = None
     try:
-        # 応答生成に上限時間を設け、ハング/長考を防ぐ
-        response_text = await asyncio.wait_for(llm.ainvoke(system_prompt, user_message), timeout=60.0)
+        # 応答生成に持ち時間を設け、ハング/長考を防ぐ（ペーシング待ちの分は上乗せ）。
+        # 期限はクライアントへも伝わり、HTTP タイムアウトとヘッジ（別エンドポイントへの複製）の判断に使われる
+        if streamed:
+            deltas = speculative.stream.consume() if speculative is not None else llm.astream(system_prompt, user_message, stop_policy, static_prefix_len=static_prefix_len)
+            response_text = await wait_with_deadline(
+                _stream_response(websocket, deltas, character_name, shaper, _await_pacing),
+                turn_budget + (pacer.max_wait_sec if pacer else 0.0),
+            )
+        elif speculative is not None:
+            response_text = await wait_with_deadline(speculative.stream.collect(), turn_budget)
+        else:
+            response_text = await wait_with_deadline(llm.ainvoke(system_prompt, user_message, stop_policy, static_prefix_len=static_prefix_len), turn_budget)
+        call_finished = time.perf_counter()
         response_text = str(response_text or "")
         raw_response_text = response_text
 
@@ -571,29 +902,89 @@ async def process_character_turn(
 
         # [Next: ...]タグを抽出する前に、<think>タグとその内容を削除
         response_text = re.sub(r'<think>.*?</think>', '', response_text, flags=re.DOTALL).strip()
+        next_source_text = response_text
         # 表示前に前置きを除去→短縮（未完了感の軽減と要点提示）
         response_text = remove_preamble(response_text)
         response_text = shorten_text(response_text, max_sentences=2, max_chars=160)
         response_text = ensure_sentence_complete(response_text)
         write_log(log_filename, character_name, response_text)
-        preview_text = (response_text or "")[:120].replace("\n", " ")
         write_operation_log(
             operation_log_filename,
             "INFO",
             "LLMCall",
-            f"RESP {req_id} <- speaker={character_name}, chars={len(response_text)}, preview={preview_text}"
+            "RESP %s <- speaker=%s, chars=%d, preview=%s",
+            req_id, character_name, len(response_text), _LogPreview(response_text, 120),
         )
         print(f"[{datetime.now().strftime('%H:%M:%S')}] {character_name}の応答を受け取りました: {response_text[:50]}...")
+    except CircuitOpenError as e:
+        # バックエンドが遮断中: 送信せずに即失敗させ、タイムアウトを待たない
+        call_status = "circuit_open"
+        call_error = str(e)
+        write_operation_log(operation_log_filename, "WARNING", "LLMCall", f"CIRCUIT_OPEN {req_id} speaker={character_name}: {e}")
+        response_text = "（LLMサーバに接続できないため応答できません）"
     except asyncio.TimeoutError:
-        write_operation_log(operation_log_filename, "WARNING", "LLMCall", f"TIMEOUT {req_id} speaker={character_name} after 60s")
+        call_status = "timeout"
+        write_operation_log(operation_log_filename, "WARNING", "LLMCall", f"TIMEOUT {req_id} speaker={character_name} after {turn_budget:g}s")
         print(f"[{datetime.now().strftime('%H:%M:%S')}] {character_name}の応答がタイムアウトしました (req={req_id})")
         response_text = "応答に時間がかかっています。"
     except Exception as e:
+        call_status = "error"
+        call_error = str(e)
         error_details = traceback.format_exc()
         write_operation_log(operation_log_filename, "ERROR", "LLMCall", f"ERROR {req_id} speaker={character_name}: {e}")
         write_operation_log(operation_log_filename, "ERROR", "ConversationLoop", f"Error invoking LLM for {character_name}: {e}\n{error_details}")
         print(f"[{datetime.now().strftime('%H:%M:%S')}] {character_name}の応答生成中にエラーが発生しました: {e} (req={req_id})")
         response_text = "応答生成中にエラーが発生しました。"
+    finally:
+        llm_call_stats.reset(stats_token)
+        if speculative is not None:
+            # タイムアウト等で途中終了した場合も先行生成タスクを止める
+            speculative.cancel()
+    llm_ended = call_finished or time.perf_counter()
+    # ストリーム中のペーシング待ちは LLM 区間から除いて pacing_wait として計上
+    timer.add("llm", (llm_ended - call_started) * 1000 - paced_ms[0])
+    call_timing = _call_timing_fields(call_stats, call_started, llm_ended)
+    if timer.enabled:
+        timer.llm = {k: call_timing[k] for k in ("ttft_ms", "queue_wait_ms", "scheduler_wait_ms", "gen_ms") if k in call_timing}
+        # 送信前の待ち（スケジューラ等のクライアント側キュー）
+        timer.llm["client_queue_ms"] = round(max(0.0, call_stats.get("sent_at", call_started) - call_started) * 1000, 1)
+        if speculative is not None:
+            timer.llm["speculative"] = True
+    if call_status == "ok":
+        metrics.LLM_CALL_SECONDS.observe(
+            ((call_finished or time.perf_counter()) - call_stats.get("sent_at", call_started)),
+            provider=provider, model=model, character=character_name,
+        )
+    else:
+        metrics.LLM_CALL_FAILURES.inc(provider=provider, model=model, character=character_name, reason=call_status)
+    write_structured_log(
+        operation_log_filename,
+        "llm_call",
+        req_id=req_id,
+        speaker=character_name,
+        provider=provider,
+        model=model,
+        # 複数エンドポイント構成では実際に応答したもの（フェイルオーバー後の最終エンドポイント）
+        base_url=call_stats.get("endpoint") or base_url,
+        status=call_status,
+        streamed=streamed,
+        prompt_chars=len(final_prompt),
+        static_prefix_chars=static_prefix_len,
+        user_chars=len(last_message or ""),
+        response_chars=len(response_text) if call_status == "ok" else None,
+        error=call_error,
+        speculative=True if speculative is not None else None,
+        **call_timing,
+    )
+
+    # 次話者解決: internal_id ベース。送信や kbjson 処理より先に解決し、先行生成を始められるようにする
+    with timer.span("next_speaker"):
+        next_display_name = _resolve_next_display_name(manager, character_name, next_source_text or response_text, operation_log_filename)
+    if on_next_resolved is not None and next_display_name and call_status == "ok" and response_text.strip():
+        try:
+            on_next_resolved(next_display_name, response_text)
+        except Exception as e:
+            write_operation_log(operation_log_filename, "WARNING", "ConversationLoop", f"Speculative start failed for {next_display_name}: {e}")
 
     # 表示用テキストから[Next: ...]タグと {"next":"..."} 片を削除
     display_text = re.sub(r'\[Next:.*?\]', '', response_text, flags=re.IGNORECASE)
@@ -601,34 +992,45 @@ async def process_character_turn(
 
     # 空応答でもUIに可視化するためプレースホルダを送る
     send_text = display_text if display_text else "（応答なし）"
-    try:
-        await websocket.send_json({
-            "type": "message",
-            "speaker": character_name,
-            "text": send_text
-        })
-        write_operation_log(operation_log_filename, "INFO", "ConversationLoop", f"Response sent for {character_name} (len={len(display_text)}).")
-        if not display_text:
-            write_operation_log(operation_log_filename, "INFO", "ConversationLoop", f"Displayed placeholder for empty response from {character_name}.")
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] {character_name}の応答を送信しました")
-    except Exception as e:
-        error_details = traceback.format_exc()
-        write_operation_log(operation_log_filename, "ERROR", "ConversationLoop", f"Error sending response for {character_name}: {e}\n{error_details}")
-        print(f"[{datetime.now().strftime('%H:%M:%S')}] {character_name}の応答送信中にエラーが発生しました: {e}")
-    
-    await update_status(websocket, character_name, "IDLE", log_filename, operation_log_filename)
-    await asyncio.sleep(1)
+    timer.add("postprocess", (time.perf_counter() - llm_ended) * 1000)
+    if not shaper.sent:
+        await _await_pacing()
+    if paced_ms[0]:
+        timer.add("pacing_wait", paced_ms[0])
+    with timer.span("send"):
+        try:
+            frame = _final_message_frame(shaper, character_name, send_text, bool(pacer is not None and pacer.wants_ack))
+            await websocket.send_json(frame)
+            if pacer is not None:
+                pacer.note_delivered(send_text)
+            write_operation_log(operation_log_filename, "INFO", "ConversationLoop", "Response sent for %s (len=%d).", character_name, len(display_text))
+            if not display_text:
+                write_operation_log(operation_log_filename, "INFO", "ConversationLoop", f"Displayed placeholder for empty response from {character_name}.")
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] {character_name}の応答を送信しました")
+        except Exception as e:
+            error_details = traceback.format_exc()
+            write_operation_log(operation_log_filename, "ERROR", "ConversationLoop", f"Error sending response for {character_name}: {e}\n{error_details}")
+            print(f"[{datetime.now().strftime('%H:%M:%S')}] {character_name}の応答送信中にエラーが発生しました: {e}")
+
+    with timer.span("status"):
+        # 失敗でサーキットが開いた場合は遮断中であることを表示する
+        status = (_circuit_status(manager, character_name) if call_status != "ok" else None) or "IDLE"
+        await update_status(websocket, character_name, status, log_filename, operation_log_filename)
 
     # ===== kbjson 自動取り込み（情報検索モードON時のみ） =====
     try:
-        ingest_enabled, kb_db_path = _load_kb_ingest_settings()
+        with timer.span("kb_settings_load"):
+            ingest_enabled, kb_db_path = _load_kb_ingest_settings()
+        kb_ingest_started = time.perf_counter()
         if info_search_mode and ingest_enabled and raw_response_text and _extract_kbjson and _normalize_kbjson and _kb_ingest_payload:
             data = _extract_kbjson(raw_response_text)
             if isinstance(data, dict):
                 payload = _normalize_kbjson(data)
                 if any(len(payload.get(k) or []) for k in ("persons", "works", "credits", "external_ids", "unified")):
                     try:
-                        _kb_ingest_payload(kb_db_path, payload)
+                        kb_rows = metrics.KbIngestRowTally()
+                        _kb_ingest_payload(kb_db_path, payload, kb_rows)
+                        kb_rows.commit()
                         write_operation_log(operation_log_filename, "INFO", "KBIngest", f"KB registered from response (persons={len(payload.get('persons') or [])}, works={len(payload.get('works') or [])}).")
                         try:
                             await websocket.send_json({"type": "message", "speaker": "System", "text": "KBに登録しました。"})
@@ -642,37 +1044,15 @@ async def process_character_turn(
                             pass
             else:
                 write_operation_log(operation_log_filename, "INFO", "KBIngest", "No kbjson detected in response.")
+        timer.add("kbjson_ingest", (time.perf_counter() - kb_ingest_started) * 1000)
     except Exception as e:
         write_operation_log(operation_log_filename, "WARNING", "KBIngest", f"kbjson handler error: {e}")
 
-    # 次話者解決: internal_id ベース
-    registry: List[TDict[str, str]] = []
-    for c in manager.list_characters():
-        registry.append({
-            "internal_id": c.get("name"),
-            "display_name": c.get("display_name", c.get("name")),
-            "short_name": c.get("short_name", ""),
-        })
+    if timer.enabled:
+        await _emit_turn_timing(websocket, timer, character_name, req_id, operation_log_filename)
 
-    # 現在の internal_id を display→internal 変換
-    current_internal_id = None
-    for c in registry:
-        if c["display_name"] == character_name:
-            current_internal_id = c["internal_id"]
-            break
-    if current_internal_id is None and registry:
-        current_internal_id = registry[0]["internal_id"]
-
-    policy = NextPolicy(allow_self_nomination=False, fallback="round_robin", fuzzy_threshold=0.85)
-    next_internal_id, reason, extracted, normalized = resolve_next_speaker(
-        response_text, current_internal_id, registry, policy, operation_log_filename
-    )
-
-    # internal_id → display_name へ戻す
-    if next_internal_id:
-        for c in registry:
-            if c["internal_id"] == next_internal_id:
-                return c["display_name"], response_text, detected_meta
+    if next_display_name:
+        return next_display_name, response_text, detected_meta
 
     write_operation_log(operation_log_filename, "INFO", "ConversationLoop", "No valid next speaker resolved. Autonomous loop ending.")
     return None, response_text, detected_meta
@@ -680,12 +1060,23 @@ async def process_character_turn(
 async def conversation_loop(websocket: WebSocket, manager: CharacterManager, log_filename: str, operation_log_filename: str):
     from initial_status_setter import set_initial_statuses
     
+    # このセッションの LLM 呼び出しは公平キュー上で会話ログ単位にまとめる
+    session_token = llm_session_var.set(log_filename)
     global_rules = load_global_rules()
+    streaming = _load_streaming_settings()
+    debug_timing = _load_debug_timing_setting()
+    pacer = TurnPacer(websocket, _load_pacing_settings())
+    speculative_enabled = _load_speculative_setting()
+    # 次話者の先行生成（採用されなければ破棄）
+    speculative: Optional[SpeculativeTurn] = None
     # 既定はグローバルルール、優先は config.yaml の conversation.auto_loops
     max_turns = global_rules.get("max_autonomous_turns", 3)
     max_turns = _load_auto_loops_from_config(max_turns)
 
     await set_initial_statuses(websocket, manager, log_filename, operation_log_filename)
+    # 履歴の復元（ログのフラッシュ待ちとファイル読み込み）はここで別スレッドで済ませ、
+    # ターンごとのプロンプト組み立てではメモリ上の履歴だけを読む
+    await aload_conversation_history(log_filename)
     # セッション内フラグ: 情報検索モード
     info_search_mode: bool = False
     # 特殊捜査: 深掘りフォールバックで外部IDを確実取得（夜間のみ稼働）
@@ -702,7 +1093,9 @@ async def conversation_loop(websocket: WebSocket, manager: CharacterManager, log
             write_operation_log(operation_log_filename, "INFO", "ConversationLoop", "Waiting for user input.")
             print(f"[{datetime.now().strftime('%H:%M:%S')}] ユーザー入力を待機中...")
             
-            user_query = await websocket.receive_text()
+            # ack 待ち中に届いた入力があればそれを先に処理する
+            user_query = await pacer.receive_text()
+            pacer.reset()
             write_log(log_filename, "USER", user_query)
             write_operation_log(operation_log_filename, "INFO", "ConversationLoop", f"User input received: {user_query}")
             print(f"[{datetime.now().strftime('%H:%M:%S')}] ユーザー入力を受け取りました: {user_query}")
@@ -936,7 +1329,8 @@ async def conversation_loop(websocket: WebSocket, manager: CharacterManager, log
                                 await websocket.send_json({"type": "message", "speaker": "サーチャー", "text": f"特殊捜査: 『{q}』を検索開始します。"})
                             except Exception:
                                 pass
-                            res = await _kb_run_ingest(q, "映画", 1, db_path, True, False, None, None, kind, 3, True)  # type: ignore
+                            with llm_priority("special"):
+                                res = await _kb_run_ingest(q, "映画", 1, db_path, True, False, None, None, kind, 3, True)  # type: ignore
                             pn = len(res.get("persons") or [])
                             wn = len(res.get("works") or [])
                             write_operation_log(operation_log_filename, "INFO", "KBSpecial", f"query='{q}' result persons={pn} works={wn}")
@@ -1140,7 +1534,8 @@ async def conversation_loop(websocket: WebSocket, manager: CharacterManager, log
                         try:
                             # 補完は登録まで実施
                             write_operation_log(operation_log_filename, "INFO", "KBComplete", f"query='{query}' starting")
-                            res = await _kb_run_ingest(query, "映画", 1, db_path, True, False, None, None, kind, 3, True)  # type: ignore
+                            with llm_priority("kbcomplete"):
+                                res = await _kb_run_ingest(query, "映画", 1, db_path, True, False, None, None, kind, 3, True)  # type: ignore
                             pn = len(res.get("persons") or [])
                             wn = len(res.get("works") or [])
                             write_operation_log(operation_log_filename, "INFO", "KBComplete", f"query='{query}' result persons={pn} works={wn}")
@@ -1423,7 +1818,8 @@ async def conversation_loop(websocket: WebSocket, manager: CharacterManager, log
                         db_path = _resolve_kb_db_path_from_kb_config()
                         # register は info_search_mode に連動
                         write_operation_log(operation_log_filename, "INFO", "Searcher", f"query='{topic}' starting register={info_search_mode}")
-                        res = await _kb_run_ingest(topic, "映画", 1, db_path, True, False, None, None, "unknown", 3, info_search_mode)  # type: ignore
+                        with llm_priority("kbcomplete"):
+                            res = await _kb_run_ingest(topic, "映画", 1, db_path, True, False, None, None, "unknown", 3, info_search_mode)  # type: ignore
                         persons = len(res.get("persons") or [])
                         works = len(res.get("works") or [])
                         write_operation_log(operation_log_filename, "INFO", "Searcher", f"query='{topic}' result persons={persons} works={works}")
@@ -1460,14 +1856,52 @@ async def conversation_loop(websocket: WebSocket, manager: CharacterManager, log
                     "short_name": c.get("short_name", ""),
                 })
             
+            turns_done = 0
+
+            def _start_speculative(next_name: str, message: str) -> None:
+                # 最終ターン、または既に話した相手（ループ側でラウンドロビンに差し替わる）なら先行しない
+                nonlocal speculative
+                if not speculative_enabled or turn + 1 >= desired_turns or next_name in spoken:
+                    return
+                speculative = SpeculativeTurn(manager, next_name, message, log_filename, global_rules, streaming)
+                write_operation_log(operation_log_filename, "INFO", "ConversationLoop", "Speculative generation started for %s.", next_name)
+
             for turn in range(desired_turns):
                 # 1巡終わったら spoken をリセットして次の巡回へ
                 if len(spoken) >= num_chars:
                     spoken.clear()
                 spoken.add(current_speaker)
+                adopted = None
+                if speculative is not None:
+                    if speculative.matches(current_speaker, last_message):
+                        adopted = speculative
+                    else:
+                        # 次話者が変わった: 先行生成を破棄（ロールバック）
+                        speculative.cancel()
+                        write_operation_log(operation_log_filename, "INFO", "ConversationLoop", "Speculative generation for %s discarded (next=%s).", speculative.speaker, current_speaker)
+                    speculative = None
+                # LLM が遮断中の話者は飛ばす（全員遮断中なら自動会話を打ち切り、タイムアウト待ちを繰り返さない）
+                circuit = _circuit_status(manager, current_speaker)
+                if circuit == "OFFLINE":
+                    await update_status(websocket, current_speaker, circuit, log_filename, operation_log_filename)
+                    idx = character_names.index(current_speaker) if current_speaker in character_names else -1
+                    rotation = character_names[idx + 1:] + character_names[:max(idx, 0)]
+                    reachable = [n for n in rotation if _circuit_status(manager, n) != "OFFLINE"]
+                    if not reachable:
+                        write_operation_log(operation_log_filename, "WARNING", "ConversationLoop", "Autonomous loop stopped: all LLM backends are unavailable.")
+                        await websocket.send_json({"type": "message", "speaker": "System", "text": "LLMサーバに接続できないため、自動会話を中断しました。"})
+                        break
+                    if adopted is not None:
+                        adopted.cancel()
+                        adopted = None
+                    write_operation_log(operation_log_filename, "INFO", "ConversationLoop", "Skipping %s (LLM backend unavailable).", current_speaker)
+                    current_speaker = reachable[0]
+                    spoken.add(current_speaker)
                 next_speaker, response_text, meta = await process_character_turn(
-                    websocket, manager, current_speaker, last_message, log_filename, operation_log_filename, global_rules, info_search_mode
+                    websocket, manager, current_speaker, last_message, log_filename, operation_log_filename, global_rules, info_search_mode, streaming, debug_timing, pacer,
+                    speculative=adopted, on_next_resolved=_start_speculative,
                 )
+                turns_done += 1
                 
                 last_message = response_text
 
@@ -1521,7 +1955,8 @@ async def conversation_loop(websocket: WebSocket, manager: CharacterManager, log
                         import asyncio as _aio
                         await _aio.sleep(0.6)
                         try:
-                            res = await _kb_run_ingest(kb_query, "映画", 1, db_path, True, False, None, None, entity if entity in ("person","work") else "unknown", 3, info_search_mode)  # type: ignore
+                            with llm_priority("kbcomplete"):
+                                res = await _kb_run_ingest(kb_query, "映画", 1, db_path, True, False, None, None, entity if entity in ("person","work") else "unknown", 3, info_search_mode)  # type: ignore
                             pn = len(res.get("persons") or [])
                             wn = len(res.get("works") or [])
                             msg = (f"KB登録完了。人物 {pn} / 作品 {wn} 件。" if info_search_mode else f"検索完了。KB登録はOFFです。人物 {pn} / 作品 {wn} 件を把握。")
@@ -1582,8 +2017,12 @@ async def conversation_loop(websocket: WebSocket, manager: CharacterManager, log
                 current_speaker = next_speaker
             else:
                 write_operation_log(operation_log_filename, "INFO", "ConversationLoop", f"Autonomous loop ended: Reached max turns ({max_turns}).")
+            metrics.TURNS_PER_USER_MESSAGE.observe(turns_done)
+            if speculative is not None:
+                speculative.cancel()
+                speculative = None
 
-            await update_all_statuses(websocket, manager.get_character_names(), "ACTIVE", log_filename, operation_log_filename)
+            await _update_statuses_with_circuit(websocket, manager, "ACTIVE", log_filename, operation_log_filename)
 
             # 会話サイクル（ユーザー1入力→自律ループ）終了時に短期要約を永続化
             try:
@@ -1596,4 +2035,9 @@ async def conversation_loop(websocket: WebSocket, manager: CharacterManager, log
         write_operation_log(operation_log_filename, "ERROR", "ConversationLoop", f"Error in conversation loop: {e}\n{error_details}")
         print(f"会話ループ中にエラーが発生しました: {e} (ログファイル: {log_filename})")
     finally:
+        if speculative is not None:
+            speculative.cancel()
+        release_conversation_history(log_filename)
+        close_log_file(log_filename)
+        llm_session_var.reset(session_token)
         write_operation_log(operation_log_filename, "INFO", "ConversationLoop", "Conversation loop ended.")
\ No newline at end of file
@@ -0,0 +1,58 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Dict, Iterator, Optional
+
+from config_service import get_config
+
+
+# LLM 呼び出しの期限（time.monotonic() 基準の絶対時刻）。呼び出し元が持ち時間を設定し、
+# クライアントは残り時間を HTTP タイムアウトやヘッジ判定に使う。入れ子にした場合は短い方が有効。
+llm_deadline_var: ContextVar[Optional[float]] = ContextVar("llm_deadline", default=None)
+
+DEFAULT_DEADLINE_SETTINGS: Dict[str, Any] = {
+    "turn_budget_sec": 60.0,       # 会話 1 ターンの応答生成の持ち時間
+    "ingest_extract_sec": 60.0,    # 取り込み: 抽出プロンプト 1 回の持ち時間
+    "ingest_repair_sec": 45.0,     # 取り込み: JSON 修復プロンプト 1 回の持ち時間
+    "request_timeout_sec": 70.0,   # 期限が設定されていない呼び出しの HTTP タイムアウト
+}
+
+
+def deadline_settings() -> Dict[str, Any]:
+    settings = dict(DEFAULT_DEADLINE_SETTINGS)
+    try:
+        cfg = get_config().app.raw.get("llm_deadline") or {}
+        settings.update({k: float(v) for k, v in cfg.items() if k in DEFAULT_DEADLINE_SETTINGS})
+    except Exception:
+        pass
+    return settings
+
+
+@contextmanager
+def llm_deadline(budget_sec: float) -> Iterator[float]:
+    """この範囲の LLM 呼び出しに持ち時間を設定する。as で（外側の期限も考慮した）残り秒数を受け取れる。"""
+    at = time.monotonic() + max(0.0, float(budget_sec))
+    current = llm_deadline_var.get()
+    if current is not None:
+        at = min(at, current)
+    token = llm_deadline_var.set(at)
+    try:
+        yield max(0.0, at - time.monotonic())
+    finally:
+        llm_deadline_var.reset(token)
+
+
+def remaining_time(default: Optional[float] = None) -> Optional[float]:
+    """期限までの残り秒数（期限なしなら default）。default を渡すとその値を上限とする。"""
+    at = llm_deadline_var.get()
+    if at is None:
+        return default
+    left = max(0.0, at - time.monotonic())
+    return left if default is None else min(left, default)
+
+
+async def wait_with_deadline(aw: Awaitable[Any], budget_sec: float) -> Any:
+    """持ち時間を設定したうえで aw を待つ（超過時は asyncio.TimeoutError）。"""
+    with llm_deadline(budget_sec) as left:
+        return await asyncio.wait_for(aw, timeout=left)
@@ -0,0 +1,346 @@
+import asyncio
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import metrics
+from config_service import get_config
+from log_manager import write_operation_log
+from readiness_checker import ensure_ollama_model_ready_sync
+
+
+# 同じモデルを提供する複数の Ollama エンドポイントへの振り分けと、障害時の切り離し。
+# - least_outstanding: 処理中（待ち含む）の件数が最も少ないエンドポイント
+# - ewma: 応答開始までの時間の指数移動平均 ×（処理中件数 + 1）が最小のエンドポイント
+# 接続エラー/タイムアウト/5xx が連続するとサーキットを開いて選択対象から外し（全滅なら要求を送らず即失敗）、
+# 遮断時間の経過後に ensure_ollama_model_ready_sync で復帰を確認する。遮断時間は失敗が続くほど延びる。
+# 直近のレイテンシ分布も保持し、p95 などを超えても応答が無い要求は別エンドポイントへ複製（ヘッジ）できる。
+
+BALANCE_STRATEGIES = ("least_outstanding", "ewma")
+DEFAULT_OLLAMA_URL = "http://localhost:11434"
+# レイテンシ分位点の計算に使う直近サンプル数（種類ごと）
+_LATENCY_WINDOW = 200
+
+CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN, CIRCUIT_OPEN = "closed", "half_open", "open"
+_STATE_VALUE = {CIRCUIT_CLOSED: 0, CIRCUIT_HALF_OPEN: 1, CIRCUIT_OPEN: 2}
+
+DEFAULT_BREAKER_SETTINGS: Dict[str, Any] = {
+    "failure_threshold": 3,   # 連続失敗がこの回数に達したら open
+    "open_sec": 5.0,          # 最初の遮断時間（開くたびに倍）
+    "max_open_sec": 120.0,    # 遮断時間の上限
+}
+
+DEFAULT_HEDGE_SETTINGS: Dict[str, Any] = {
+    "enabled": True,
+    "quantile": 0.95,      # このレイテンシ分位点を過ぎても応答が無ければ複製を送る
+    "min_samples": 20,     # 分位点を信用する最小サンプル数（未満ならヘッジしない）
+    "min_delay_sec": 0.5,  # 複製を送るまでの最短待ち時間
+}
+
+LLM_CIRCUIT_STATE = metrics.REGISTRY.gauge(
+    "llm_circuit_state", "Circuit breaker state per LLM endpoint (0=closed, 1=half_open, 2=open).", ("endpoint",),
+)
+LLM_CIRCUIT_OPENS = metrics.REGISTRY.counter(
+    "llm_circuit_opens_total", "Times an LLM endpoint circuit breaker opened.", ("endpoint",),
+)
+LLM_ENDPOINT_FAILOVERS = metrics.REGISTRY.counter(
+    "llm_endpoint_failovers_total", "LLM requests retried on another endpoint after an error.", ("endpoint",),
+)
+LLM_HEDGED_REQUESTS = metrics.REGISTRY.counter(
+    "llm_hedged_requests_total", "Duplicate LLM requests sent after the primary exceeded its latency quantile.", ("winner",),
+)
+
+
+def breaker_settings() -> Dict[str, Any]:
+    settings = dict(DEFAULT_BREAKER_SETTINGS)
+    try:
+        cfg = get_config().app.raw.get("llm_circuit_breaker") or {}
+        settings.update({k: v for k, v in cfg.items() if k in DEFAULT_BREAKER_SETTINGS})
+    except Exception:
+        pass
+    return settings
+
+
+def hedge_settings() -> Dict[str, Any]:
+    settings = dict(DEFAULT_HEDGE_SETTINGS)
+    try:
+        cfg = get_config().app.raw.get("llm_hedging") or {}
+        settings.update({k: v for k, v in cfg.items() if k in DEFAULT_HEDGE_SETTINGS})
+    except Exception:
+        pass
+    return settings
+
+
+def character_endpoints(char_cfg: Mapping[str, Any], default: Optional[str] = None) -> Tuple[str, ...]:
+    """
+    キャラクター定義からエンドポイント一覧を返す。
+    base_url は文字列でもリストでもよく、base_urls（リスト）があればそちらを優先する。
+    """
+    urls = char_cfg.get("base_urls") or char_cfg.get("base_url") or default
+    if not urls:
+        return ()
+    if isinstance(urls, str):
+        urls = [urls]
+    out: List[str] = []
+    for u in urls:
+        u = str(u or "").strip().rstrip("/")
+        if u and u not in out:
+            out.append(u)
+    return tuple(out)
+
+
+class CircuitOpenError(RuntimeError):
+    """全エンドポイントのサーキットが開いていて、要求を送らずに失敗させたことを表す。"""
+
+    def __init__(self, urls: Sequence[str]):
+        super().__init__(f"circuit open for {', '.join(urls)}")
+        self.urls = tuple(urls)
+
+
+class Endpoint:
+    """
+    1 エンドポイント分の状態。サーキットブレーカーの状態は closed（通常）/ open（遮断中）/ half_open（復帰確認中）。
+    同じ URL は全プールで同じインスタンスを共有する（get_endpoint_pool 経由の場合）。
+    """
+
+    __slots__ = ("url", "outstanding", "ewma_ms", "state", "open_until", "consecutive_failures", "open_count", "probing", "samples")
+
+    def __init__(self, url: str):
+        self.url = url
+        self.outstanding = 0
+        self.ewma_ms: Optional[float] = None
+        self.state = CIRCUIT_CLOSED
+        self.open_until = 0.0
+        self.consecutive_failures = 0
+        # 連続して open になった回数（遮断時間の指数バックオフに使う）
+        self.open_count = 0
+        self.probing = False
+        # 種類（invoke: 応答完了まで / ttft: 最初のトークンまで）ごとの直近レイテンシ（秒）
+        self.samples: Dict[str, Deque[float]] = {}
+
+    @property
+    def healthy(self) -> bool:
+        return self.state == CIRCUIT_CLOSED
+
+    def available(self, now: float) -> bool:
+        if self.state == CIRCUIT_CLOSED:
+            return True
+        # 遮断時間が明けても復帰確認（プローブ）が動いていなければ、実際の要求を 1 回通して確かめる
+        return self.state == CIRCUIT_OPEN and now >= self.open_until and not self.probing
+
+
+# エンドポイントの状態はプール間で共有するので、ロックもモジュールで 1 つ
+_state_lock = threading.RLock()
+
+
+class EndpointPool:
+    def __init__(self, urls: Sequence[str], ewma_alpha: float = 0.3, endpoints: Optional[Sequence[Endpoint]] = None):
+        if not urls:
+            raise ValueError("EndpointPool needs at least one URL")
+        self.endpoints: List[Endpoint] = list(endpoints) if endpoints is not None else [Endpoint(u) for u in urls]
+        self.ewma_alpha = ewma_alpha
+        for ep in self.endpoints:
+            LLM_CIRCUIT_STATE.set(_STATE_VALUE[ep.state], endpoint=ep.url)
+
+    def __len__(self) -> int:
+        return len(self.endpoints)
+
+    def get(self, url: str) -> Optional[Endpoint]:
+        return next((ep for ep in self.endpoints if ep.url == url), None)
+
+    def circuit_state(self) -> str:
+        """プール全体の状態。1 つでも closed なら closed、復帰確認中があれば half_open、それ以外は open。"""
+        states = {ep.state for ep in self.endpoints}
+        for state in (CIRCUIT_CLOSED, CIRCUIT_HALF_OPEN):
+            if state in states:
+                return state
+        return CIRCUIT_OPEN
+
+    def pick(self, strategy: str = "least_outstanding", exclude: Iterable[str] = (), strict: bool = False) -> Optional[Endpoint]:
+        """
+        候補から 1 つ選ぶ（直近で失敗したものは後回し）。
+        選べるものが無ければ CircuitOpenError（要求は送らずに即失敗）。strict=True なら None を返す（ヘッジ先の選択用）。
+        """
+        excluded = set(exclude)
+        now = time.monotonic()
+        with _state_lock:
+            candidates = [ep for ep in self.endpoints if ep.url not in excluded and ep.available(now)]
+            if not candidates:
+                if strict:
+                    return None
+                raise CircuitOpenError([ep.url for ep in self.endpoints])
+            if strategy == "ewma":
+                # 未計測のエンドポイントは 0 とみなして優先的に試す
+                chosen = min(candidates, key=lambda ep: (ep.consecutive_failures, (ep.ewma_ms or 0.0) * (ep.outstanding + 1), ep.outstanding))
+            else:
+                chosen = min(candidates, key=lambda ep: (ep.consecutive_failures, ep.outstanding, ep.ewma_ms or 0.0))
+            if chosen.state == CIRCUIT_OPEN:
+                # 遮断時間明けの試行（これが失敗すればより長く遮断する）
+                self._set_state(chosen, CIRCUIT_HALF_OPEN)
+            chosen.outstanding += 1
+        return chosen
+
+    def release(self, ep: Endpoint) -> None:
+        with _state_lock:
+            ep.outstanding = max(0, ep.outstanding - 1)
+            if ep.state == CIRCUIT_HALF_OPEN and not ep.probing:
+                # 試行が成否を記録せずに終わった（キャンセル/4xx など）: open に戻して次の要求で再試行させる
+                self._set_state(ep, CIRCUIT_OPEN)
+
+    def record_success(self, ep: Endpoint, latency_sec: Optional[float] = None, kind: str = "invoke") -> None:
+        with _state_lock:
+            if latency_sec is not None:
+                ep.samples.setdefault(kind, deque(maxlen=_LATENCY_WINDOW)).append(latency_sec)
+                ms = latency_sec * 1000
+                ep.ewma_ms = ms if ep.ewma_ms is None else (self.ewma_alpha * ms + (1 - self.ewma_alpha) * ep.ewma_ms)
+            self._close(ep)
+
+    def latency_quantile(self, ep: Endpoint, kind: str, q: float, min_samples: int = 1) -> Optional[float]:
+        """直近レイテンシの分位点（秒）。サンプルが min_samples 未満なら None。"""
+        with _state_lock:
+            values = sorted(ep.samples.get(kind, ()))
+        if not values or len(values) < max(1, min_samples):
+            return None
+        idx = min(len(values) - 1, max(0, int(round(q * (len(values) - 1)))))
+        return values[idx]
+
+    def record_failure(self, ep: Endpoint) -> None:
+        """失敗を数え、連続 failure_threshold 回（復帰確認中なら 1 回）で open にする。"""
+        settings = breaker_settings()
+        with _state_lock:
+            ep.consecutive_failures += 1
+            if ep.state == CIRCUIT_HALF_OPEN or ep.consecutive_failures >= int(settings["failure_threshold"]):
+                self._open(ep, settings)
+
+    def set_healthy(self, url: str, healthy: bool) -> None:
+        """状態を外部から直接決める（手動の切り替え用。readiness チェックの結果は record_readiness で反映する）。"""
+        ep = self.get(url)
+        if ep is None:
+            return
+        with _state_lock:
+            if healthy:
+                self._close(ep)
+            else:
+                self._open(ep, breaker_settings())
+
+    def record_readiness(self, url: str, ready: bool) -> None:
+        """
+        起動時などの readiness チェックの結果を反映する。応答すれば closed に戻し、
+        応答しなければ（モデルのロード待ちでタイムアウトしただけの場合もあるので）失敗 1 回として数える。
+        遮断するのは通常の要求と同じく連続 failure_threshold 回に達したときだけ。
+        """
+        ep = self.get(url)
+        if ep is None:
+            return
+        if ready:
+            with _state_lock:
+                self._close(ep)
+        elif ep.state != CIRCUIT_OPEN:
+            # すでに遮断中なら数え直さない（再接続のたびに遮断時間が延びないように）。復帰はプローブが確かめる
+            self.record_failure(ep)
+
+    def _open(self, ep: Endpoint, settings: Mapping[str, Any]) -> None:
+        # 開くたびに遮断時間を倍にする（上限 max_open_sec）。復帰すれば open_sec に戻る
+        ep.open_count += 1
+        duration = min(float(settings["max_open_sec"]), float(settings["open_sec"]) * (2 ** (ep.open_count - 1)))
+        ep.open_until = time.monotonic() + duration
+        if ep.state != CIRCUIT_OPEN:
+            LLM_CIRCUIT_OPENS.inc(endpoint=ep.url)
+        self._set_state(ep, CIRCUIT_OPEN)
+
+    def _close(self, ep: Endpoint) -> None:
+        ep.consecutive_failures = 0
+        ep.open_count = 0
+        self._set_state(ep, CIRCUIT_CLOSED)
+
+    @staticmethod
+    def _set_state(ep: Endpoint, state: str) -> None:
+        ep.state = state
+        LLM_CIRCUIT_STATE.set(_STATE_VALUE[state], endpoint=ep.url)
+
+    def schedule_probe(self, ep: Endpoint, model: str, operation_log_filename: Optional[str] = None) -> None:
+        """
+        open になったエンドポイントの復帰確認を裏で行う。遮断時間が明けるたびに half_open にして
+        readiness_checker（/api/tags → /api/show → /api/ps）で確かめ、応答すれば closed、だめなら遮断時間を延ばして再度待つ。
+        """
+        if ep.probing or ep.state != CIRCUIT_OPEN:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return
+        ep.probing = True
+
+        async def _probe() -> None:
+            try:
+                while ep.state == CIRCUIT_OPEN:
+                    await asyncio.sleep(max(0.0, ep.open_until - time.monotonic()))
+                    with _state_lock:
+                        if ep.state != CIRCUIT_OPEN:
+                            break
+                        self._set_state(ep, CIRCUIT_HALF_OPEN)
+                    try:
+                        ok = await loop.run_in_executor(None, ensure_ollama_model_ready_sync, ep.url, model, operation_log_filename)
+                    except Exception:
+                        ok = False
+                    with _state_lock:
+                        if ok:
+                            self._close(ep)
+                        elif ep.state == CIRCUIT_HALF_OPEN:
+                            self._open(ep, breaker_settings())
+                    if operation_log_filename:
+                        write_operation_log(operation_log_filename, "INFO", "EndpointPool", f"Circuit probe for {ep.url}: {'closed' if ok else 'still open'}.")
+            finally:
+                ep.probing = False
+
+        loop.create_task(_probe())
+
+
+_pools: Dict[Tuple[str, ...], EndpointPool] = {}
+_endpoints: Dict[str, Endpoint] = {}
+_pools_lock = threading.Lock()
+
+
+def get_endpoint_pool(urls: Sequence[str]) -> EndpointPool:
+    """
+    URL の組ごとにプロセス共通の EndpointPool を返す。
+    エンドポイント（処理中件数/レイテンシ/サーキット状態）は URL 単位で全プールが共有する。
+    """
+    key = tuple(urls)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                endpoints = [_endpoints.setdefault(u, Endpoint(u)) for u in key]
+                pool = EndpointPool(key, endpoints=endpoints)
+                _pools[key] = pool
+    return pool
+
+
+def find_endpoint_pool(urls: Sequence[str]) -> Optional[EndpointPool]:
+    """URL の組に対応する作成済みのプール（無ければ None。新しくは作らない）。"""
+    return _pools.get(tuple(urls))
+
+
+def character_circuit_state(char_cfg: Mapping[str, Any]) -> Optional[str]:
+    """キャラクターのエンドポイントのサーキット状態（プール未作成なら None）。LLM インスタンスは取得しない。"""
+    pool = find_endpoint_pool(character_endpoints(char_cfg, DEFAULT_OLLAMA_URL))
+    return pool.circuit_state() if pool is not None else None
+
+
+def ensure_character_endpoints_ready_sync(char_cfg: Mapping[str, Any], operation_log_filename: Optional[str] = None) -> bool:
+    """
+    キャラクターの全エンドポイントで readiness チェックを行い、結果をプールのヘルス状態に反映する（同期）。
+    1 つでも準備できていれば True。
+    """
+    urls = character_endpoints(char_cfg, DEFAULT_OLLAMA_URL)
+    pool = get_endpoint_pool(urls)
+    model = char_cfg.get("model")
+    any_ready = False
+    for url in urls:
+        ready = ensure_ollama_model_ready_sync(url, model, operation_log_filename)
+        pool.record_readiness(url, ready)
+        any_ready = any_ready or ready
+    return any_ready
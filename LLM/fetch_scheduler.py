@@ -0,0 +1,185 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+import metrics
+from config_service import get_config
+
+
+# 取り込みのページ取得（一覧の巡回、eiga.com サイト内検索、精読）で共有する取得スケジューラ。
+# ホストごとに
+#   - トークンバケット（rate_per_sec で補充、burst まで貯まる）で送信間隔をならす
+#   - 同時取得数を max_in_flight までに抑える
+#   - 429/503 の Retry-After（なければ揺らぎ付き指数バックオフ）の間、そのホストへの送信をまとめて止める
+# 接続エラー/5xx もバックオフを挟んで max_retries 回まで再試行する。
+
+DEFAULT_FETCH_SCHEDULER_SETTINGS: Dict[str, Any] = {
+    "rate_per_sec": 2.0,          # 1 ホストあたりの平均送信数（0 以下で無制限）
+    "burst": 4,                   # 連続で送れる数
+    "max_in_flight": 4,           # 1 ホストあたりの同時取得数
+    "max_retries": 2,             # 再試行の回数（初回を含めず）
+    "backoff_base_sec": 1.0,      # バックオフの基準（試行ごとに倍、0〜その値で揺らぐ）
+    "backoff_max_sec": 30.0,
+    "max_retry_after_sec": 120.0, # Retry-After がこれより長ければ待たずに諦める
+}
+
+_THROTTLE_STATUSES = (429, 503)
+
+INGEST_FETCH_RETRIES = metrics.REGISTRY.counter(
+    "ingest_fetch_retries_total", "Ingest page fetch retries.", ("reason",),
+)
+
+
+def fetch_scheduler_settings(host: str = "") -> Dict[str, Any]:
+    """fetch_scheduler ブロックを読む。hosts: {<host>: {...}} があればそのホストだけ上書きする。"""
+    settings = dict(DEFAULT_FETCH_SCHEDULER_SETTINGS)
+    try:
+        cfg = get_config().app.raw.get("fetch_scheduler") or {}
+        settings.update({k: v for k, v in cfg.items() if k in DEFAULT_FETCH_SCHEDULER_SETTINGS})
+        override = (cfg.get("hosts") or {}).get(host) or {}
+        settings.update({k: v for k, v in override.items() if k in DEFAULT_FETCH_SCHEDULER_SETTINGS})
+    except Exception:
+        pass
+    return settings
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Retry-After（秒数または HTTP 日付）を待ち秒数にする。解釈できなければ None。"""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except Exception:
+        return None
+
+
+def backoff_delay(attempt: int, settings: Dict[str, Any]) -> float:
+    """揺らぎ付き指数バックオフ（0〜base*2^attempt、backoff_max_sec が上限）。"""
+    cap = min(float(settings["backoff_max_sec"]), float(settings["backoff_base_sec"]) * (2 ** attempt))
+    return random.uniform(0.0, max(0.0, cap))
+
+
+class HostThrottle:
+    """1 ホスト分のトークンバケット・同時取得数・送信停止期限。"""
+
+    def __init__(self, settings: Dict[str, Any]):
+        self.rate = float(settings["rate_per_sec"])
+        self.burst = max(1.0, float(settings["burst"]))
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.in_flight = asyncio.Semaphore(max(1, int(settings["max_in_flight"])))
+        self._lock = asyncio.Lock()  # トークン待ちを到着順に並べる
+
+    def defer(self, delay: float) -> None:
+        """delay 秒間、このホストへの送信を止める（すでに長く止めていればそのまま）。"""
+        self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+
+    async def take(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                wait = self.blocked_until - now
+                if wait <= 0:
+                    if self.rate <= 0:
+                        return
+                    self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+                    self.updated = now
+                    if self.tokens >= 1.0:
+                        self.tokens -= 1.0
+                        return
+                    wait = (1.0 - self.tokens) / self.rate
+                await asyncio.sleep(wait)
+
+
+class FetchScheduler:
+    def __init__(self):
+        # host -> (HostThrottle, 作成時のイベントループ)
+        self._hosts: Dict[str, Tuple[HostThrottle, asyncio.AbstractEventLoop]] = {}
+
+    def throttle(self, url: str) -> HostThrottle:
+        host = urlparse(url).netloc.lower()
+        loop = asyncio.get_running_loop()
+        entry = self._hosts.get(host)
+        if entry is None or entry[1] is not loop:
+            entry = (HostThrottle(fetch_scheduler_settings(host)), loop)
+            self._hosts[host] = entry
+        return entry[0]
+
+    async def get(
+        self,
+        client: httpx.AsyncClient,
+        url: str,
+        read: Optional[Callable[[httpx.Response], Awaitable[Any]]] = None,
+        **kwargs: Any,
+    ) -> Any:
+        """
+        ホストの制限に従って GET する。429/503・5xx・接続エラーは再試行し、
+        最後の試行の応答（エラー応答を含む）を返すか、最後の例外を送出する。
+        read を渡すと本文を読まずにストリームで受け、最後の応答を read(応答) で読んだ結果を返す
+        （本文の読み取りまで同時取得数の枠に含める。読み終えたら応答は閉じる）。
+        """
+        settings = fetch_scheduler_settings(urlparse(url).netloc.lower())
+        attempts = int(settings["max_retries"]) + 1
+        for attempt in range(attempts):
+            throttle = self.throttle(url)
+            last = attempt + 1 >= attempts
+            try:
+                async with throttle.in_flight:
+                    await throttle.take()
+                    if read is None:
+                        r = await client.get(url, **kwargs)
+                    else:
+                        request = client.build_request("GET", url, **{k: v for k, v in kwargs.items() if k != "follow_redirects"})
+                        r = await client.send(request, stream=True, follow_redirects=kwargs.get("follow_redirects", False))
+                    try:
+                        delay = self._retry_delay(r, attempt, last, settings)
+                        if delay is None:
+                            return r if read is None else await read(r)
+                    finally:
+                        if read is not None:
+                            await r.aclose()
+            except httpx.TransportError:
+                if last:
+                    raise
+                INGEST_FETCH_RETRIES.inc(reason="error")
+                await asyncio.sleep(backoff_delay(attempt, settings))
+                continue
+            INGEST_FETCH_RETRIES.inc(reason=str(r.status_code) if r.status_code in _THROTTLE_STATUSES else "5xx")
+            if r.status_code in _THROTTLE_STATUSES:
+                # 後続の取得も含めてホスト全体を止める（次の take() が期限まで待つ）
+                throttle.defer(delay)
+            else:
+                await asyncio.sleep(delay)
+        raise RuntimeError("unreachable")
+
+    @staticmethod
+    def _retry_delay(r: httpx.Response, attempt: int, last: bool, settings: Dict[str, Any]) -> Optional[float]:
+        """再試行するなら待ち秒数、しないなら None。"""
+        if last:
+            return None
+        if r.status_code in _THROTTLE_STATUSES:
+            delay = parse_retry_after(r.headers.get("Retry-After"))
+            if delay is None:
+                delay = backoff_delay(attempt, settings)
+            return delay if delay <= float(settings["max_retry_after_sec"]) else None
+        if r.status_code >= 500:
+            return backoff_delay(attempt, settings)
+        return None
+
+
+_scheduler = FetchScheduler()
+
+
+def get_fetch_scheduler() -> FetchScheduler:
+    return _scheduler
@@ -0,0 +1,102 @@
+import argparse
+import glob
+import os
+import sqlite3
+import statistics
+import sys
+import time
+import zlib
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+
+# 保存済みページで取り込みの HTML 抽出を計測するマイクロベンチマーク
+# 例: python LLM/html_bench.py --cache LLM/cache/pages.db
+#     python LLM/html_bench.py saved_pages/ --repeat 20
+
+_HERE = os.path.dirname(os.path.abspath(__file__))
+_KB_DIR = os.path.join(_HERE, "..", "KB")
+if _KB_DIR not in sys.path:
+    sys.path.append(_KB_DIR)
+
+import ingest_mode  # noqa: E402
+from html_scan import scan_html  # noqa: E402
+
+
+def load_pages(paths: Sequence[str], cache_path: Optional[str], limit: int) -> List[Tuple[str, str]]:
+    """(名前, HTML) の一覧。ファイル/ディレクトリ/glob と、ページキャッシュ（pages.db）から読む。"""
+    pages: List[Tuple[str, str]] = []
+    for p in paths:
+        if os.path.isdir(p):
+            files = sorted(glob.glob(os.path.join(p, "*.html")))
+        elif any(ch in p for ch in "*?["):
+            files = sorted(glob.glob(p))
+        else:
+            files = [p]
+        for path in files:
+            with open(path, "r", encoding="utf-8", errors="ignore") as f:
+                pages.append((os.path.basename(path), f.read()))
+    if cache_path:
+        conn = sqlite3.connect(cache_path)
+        try:
+            for url, body in conn.execute("SELECT url, body FROM pages ORDER BY last_access DESC"):
+                pages.append((url, zlib.decompress(body).decode("utf-8", errors="ignore")))
+        finally:
+            conn.close()
+    return pages[:limit] if limit > 0 else pages
+
+
+def _extract_all(html: str) -> None:
+    # 取り込みで 1 ページに対して走る抽出をひととおり
+    ingest_mode.deep_extract_from_page("", html)
+    ingest_mode._extract_person_profile(html)
+    ingest_mode._extract_movie_entries_from_person_movie_html(html)
+    ingest_mode._extract_movie_titles_from_person_movie_html(html)
+    ingest_mode._extract_drama_titles_from_person_drama_html(html)
+
+
+def _time_ms(fn: Callable[[str], object], html: str, repeat: int) -> float:
+    """走査結果のメモを毎回消して計測した中央値（ミリ秒）。"""
+    samples = []
+    for _ in range(repeat):
+        scan_html.cache_clear()
+        started = time.perf_counter()
+        fn(html)
+        samples.append((time.perf_counter() - started) * 1000.0)
+    return statistics.median(samples)
+
+
+def run(pages: List[Tuple[str, str]], repeat: int) -> List[Dict[str, object]]:
+    rows = []
+    for name, html in pages:
+        rows.append({
+            "page": name,
+            "kb": len(html.encode("utf-8")) / 1024.0,
+            "scan_ms": _time_ms(scan_html, html, repeat),
+            "extract_ms": _time_ms(_extract_all, html, repeat),
+        })
+    return rows
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="保存済みページでの HTML 抽出時間（ページごと）")
+    ap.add_argument("paths", nargs="*", help="*.html / ディレクトリ / glob")
+    ap.add_argument("--cache", default=None, help="ページキャッシュの SQLite（例: LLM/cache/pages.db）")
+    ap.add_argument("--limit", type=int, default=0, help="計測するページ数の上限（0 で全件）")
+    ap.add_argument("--repeat", type=int, default=10, help="1 ページあたりの計測回数（中央値を表示）")
+    args = ap.parse_args(argv)
+
+    pages = load_pages(args.paths, args.cache, args.limit)
+    if not pages:
+        ap.error("計測するページがありません（paths か --cache を指定）")
+    rows = run(pages, max(1, args.repeat))
+    print(f"{'KB':>8} {'scan ms':>9} {'extract ms':>11}  page")
+    for r in rows:
+        print(f"{r['kb']:8.1f} {r['scan_ms']:9.2f} {r['extract_ms']:11.2f}  {r['page']}")
+    scan = [r["scan_ms"] for r in rows]
+    extract = [r["extract_ms"] for r in rows]
+    print(f"pages={len(rows)} scan_ms median={statistics.median(scan):.2f} max={max(scan):.2f} "
+          f"extract_ms median={statistics.median(extract):.2f} max={max(extract):.2f}")
+
+
+if __name__ == "__main__":
+    main()
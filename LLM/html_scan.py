@@ -0,0 +1,183 @@
+import functools
+import html as html_lib
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+
+# 取り込みで読むページ HTML を 1 回の走査でまとめて分解する。
+# 抽出処理（作品/人物の詳細、一覧のリンク、ページャ、JSON-LD、本文段落）はこの結果を共有し、
+# 同じ HTML に何度も正規表現をかけない。同じ HTML 文字列の走査結果は直近分をメモしておく。
+
+_WS_RE = re.compile(r"\s+")
+
+
+def _collapse(text: str) -> str:
+    return _WS_RE.sub(" ", text).strip()
+
+
+@dataclass(frozen=True)
+class Anchor:
+    href: str   # 属性値そのまま（相対パスのことが多い）
+    text: str   # 内側のテキスト（タグ除去・空白圧縮済み）
+
+
+@dataclass(frozen=True)
+class ScannedPage:
+    text: str                      # script/style を除いた本文テキスト（空白圧縮済み）
+    title: str                     # <title> のテキスト
+    meta: Dict[str, str]           # <meta> の property/name（小文字）→ content（最初の出現）
+    anchors: Tuple[Anchor, ...]    # <a href> を出現順に
+    json_ld: Tuple[str, ...]       # <script type="application/ld+json"> の中身（未解析）
+    paragraphs: Tuple[str, ...]    # <p> ごとのテキスト
+
+    def anchors_matching(self, pattern: "re.Pattern[str]") -> List[Tuple[Anchor, "re.Match[str]"]]:
+        """href 全体が pattern に一致するリンクと一致結果。"""
+        out = []
+        for a in self.anchors:
+            m = pattern.fullmatch(a.href)
+            if m:
+                out.append((a, m))
+        return out
+
+
+# タグの属性部分。引用符が区切りになるのは attr= の直後だけで（html.parser と同じ）、
+# それ以外の位置の ' や "（alt=it's や本文中の引用符など）は名前/値の一部として扱う。
+# 各部分の区切り方が 1 通りになるよう先読みで固定し、閉じ > が無いときも後戻りが膨らまないようにしている。
+# 名前と引用符なしの値には < を含めない（閉じ > の無いタグが続いても、次の < で諦めて本文として扱う）
+_ATTRS_PART = (
+    r"(?:[\s/]"                                   # 区切り（1 文字ずつ）
+    r"|[^\s/>=<]+(?![^\s/>=<])"                   # 属性名
+    r"(?:\s*=(?:\s*(?:\"[^\"]*\"|'[^']*'"          # 引用符付きの値（中の > も値の一部）
+    r"|(?![\"'])[^\s><]+(?![^\s><]))"              # 引用符なしの値
+    r"|(?=\s*>)))?"                               # 値が空（attr=>）
+    r")*"
+)
+# タグとコメント/宣言。テキストはタグの間の部分
+_TOKEN_RE = re.compile(
+    r"<!--[\s\S]*?-->|<![^>]*>|<\?[^>]*>"
+    r"|<(/?)([A-Za-z][A-Za-z0-9:-]*)(?![A-Za-z0-9:-])(" + _ATTRS_PART + r")>"
+)
+_ATTR_RE = re.compile(r"([^\s=/>]+)(?:\s*=\s*(?:\"([^\"]*)\"|'([^']*)'|([^\s>]+)))?")
+_RAW_END_RE = {
+    "script": re.compile(r"</script\s*>", re.IGNORECASE),
+    "style": re.compile(r"</style\s*>", re.IGNORECASE),
+}
+
+
+def _attrs(raw: str) -> Dict[str, str]:
+    out: Dict[str, str] = {}
+    for m in _ATTR_RE.finditer(raw):
+        key = m.group(1).lower()
+        if key not in out:
+            val = m.group(2) if m.group(2) is not None else (m.group(3) if m.group(3) is not None else (m.group(4) or ""))
+            out[key] = html_lib.unescape(val) if "&" in val else val
+    return out
+
+
+class _Scanner:
+    """タグ列を先頭から 1 回だけ走査し、必要な要素を集める（イベント駆動。html.parser と同じ要領）。"""
+
+    def __init__(self):
+        self.text_parts: List[str] = []
+        self.title_parts: List[str] = []
+        self.meta: Dict[str, str] = {}
+        self.anchors: List[Anchor] = []
+        self.json_ld: List[str] = []
+        self.paragraphs: List[str] = []
+        self._anchor: Optional[Tuple[str, List[str]]] = None
+        self._para: Optional[List[str]] = None
+        self._in_title = False
+
+    def feed(self, html: str) -> None:
+        pos = 0
+        n = len(html)
+        while pos < n:
+            m = _TOKEN_RE.search(html, pos)
+            if m is None:
+                self.handle_data(html[pos:])
+                break
+            if m.start() > pos:
+                self.handle_data(html[pos:m.start()])
+            pos = m.end()
+            tag = m.group(2)
+            if tag is None:
+                continue  # コメント/宣言
+            tag = tag.lower()
+            if m.group(1):
+                self.handle_endtag(tag)
+                continue
+            attrs = m.group(3)
+            self.handle_starttag(tag, attrs)
+            if tag in _RAW_END_RE:
+                # script/style の中身はタグとして解釈しない
+                end = _RAW_END_RE[tag].search(html, pos)
+                raw_end = end.start() if end else n
+                if tag == "script" and "ld+json" in attrs.lower() and \
+                        (_attrs(attrs).get("type") or "").strip().lower() == "application/ld+json":
+                    self.json_ld.append(html[pos:raw_end])
+                pos = end.end() if end else n
+                self._boundary()
+
+    def _boundary(self) -> None:
+        # タグの境目は空白として扱う（隣り合う要素のテキストがくっつかないように）
+        self.text_parts.append(" ")
+        if self._anchor is not None:
+            self._anchor[1].append(" ")
+        if self._para is not None:
+            self._para.append(" ")
+
+    def handle_starttag(self, tag: str, raw_attrs: str) -> None:
+        self._boundary()
+        if tag == "a":
+            self._anchor = (_attrs(raw_attrs).get("href") or "", [])
+        elif tag == "p":
+            self._para = []
+        elif tag == "meta":
+            a = _attrs(raw_attrs)
+            key = (a.get("property") or a.get("name") or "").strip().lower()
+            if key and a.get("content") is not None and key not in self.meta:
+                self.meta[key] = a["content"]
+        elif tag == "title":
+            self._in_title = True
+
+    def handle_endtag(self, tag: str) -> None:
+        self._boundary()
+        if tag == "a" and self._anchor is not None:
+            self.anchors.append(Anchor(self._anchor[0], _collapse("".join(self._anchor[1]))))
+            self._anchor = None
+        elif tag == "p" and self._para is not None:
+            self.paragraphs.append(_collapse("".join(self._para)))
+            self._para = None
+        elif tag == "title":
+            self._in_title = False
+
+    def handle_data(self, data: str) -> None:
+        if "&" in data:
+            data = html_lib.unescape(data)
+        self.text_parts.append(data)
+        if self._anchor is not None:
+            self._anchor[1].append(data)
+        if self._para is not None:
+            self._para.append(data)
+        if self._in_title:
+            self.title_parts.append(data)
+
+
+@functools.lru_cache(maxsize=32)
+def scan_html(html: str) -> ScannedPage:
+    """HTML を 1 回走査して ScannedPage を返す（同じ文字列なら前回の結果）。"""
+    scanner = _Scanner()
+    try:
+        scanner.feed(html or "")
+    except Exception:
+        # 壊れた HTML でもそこまでの結果は使う
+        pass
+    return ScannedPage(
+        text=_collapse("".join(scanner.text_parts)),
+        title=_collapse("".join(scanner.title_parts)),
+        meta=scanner.meta,
+        anchors=tuple(scanner.anchors),
+        json_ld=tuple(scanner.json_ld),
+        paragraphs=tuple(scanner.paragraphs),
+    )
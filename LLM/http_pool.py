@@ -0,0 +1,115 @@
+import asyncio
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+import httpx
+
+from config_service import get_config
+
+
+# 既定のプール設定（config.yaml の http_pool で上書き可能）
+DEFAULT_POOL_SETTINGS: Dict[str, Any] = {
+    "max_connections": 20,
+    "max_keepalive_connections": 10,
+    "keepalive_expiry": 60.0,
+    "http2": True,
+}
+
+_pool_settings: Optional[Dict[str, Any]] = None
+# origin(scheme://host:port) -> (client, 生成時のイベントループ)
+_clients: Dict[str, Tuple[httpx.AsyncClient, asyncio.AbstractEventLoop]] = {}
+
+
+def _load_pool_settings() -> Dict[str, Any]:
+    """LLM/config.yaml の http_pool セクションを読み込む（存在しなければ既定値）。"""
+    settings = dict(DEFAULT_POOL_SETTINGS)
+    try:
+        pool_cfg = get_config().app.http_pool
+        settings.update({k: v for k, v in pool_cfg.items() if k in DEFAULT_POOL_SETTINGS})
+    except Exception:
+        pass
+    return settings
+
+
+def configure_http_pool(settings: Optional[Dict[str, Any]] = None) -> None:
+    """プール設定を明示的に差し替える（以降に生成されるクライアントへ反映）。"""
+    global _pool_settings
+    merged = dict(DEFAULT_POOL_SETTINGS)
+    merged.update(settings or {})
+    _pool_settings = merged
+
+
+def _get_pool_settings() -> Dict[str, Any]:
+    global _pool_settings
+    if _pool_settings is None:
+        _pool_settings = _load_pool_settings()
+    return _pool_settings
+
+
+def _http2_available() -> bool:
+    try:
+        import h2  # type: ignore  # noqa: F401
+        return True
+    except Exception:
+        return False
+
+
+def _origin(url: str) -> str:
+    pr = urlparse(url)
+    if not pr.scheme or not pr.netloc:
+        return url.rstrip("/")
+    return f"{pr.scheme}://{pr.netloc}".lower()
+
+
+def _build_client() -> httpx.AsyncClient:
+    s = _get_pool_settings()
+    limits = httpx.Limits(
+        max_connections=int(s.get("max_connections") or 20),
+        max_keepalive_connections=int(s.get("max_keepalive_connections") or 10),
+        keepalive_expiry=float(s.get("keepalive_expiry") or 60.0),
+    )
+    return httpx.AsyncClient(
+        limits=limits,
+        http2=bool(s.get("http2")) and _http2_available(),
+        timeout=httpx.Timeout(70.0),
+    )
+
+
+def get_http_client(url: str) -> httpx.AsyncClient:
+    """
+    URL の origin ごとに共有される httpx.AsyncClient を返す。
+    - 同一 origin への呼び出しは keep-alive 接続を再利用する
+    - タイムアウト/ヘッダ/リダイレクトは呼び出し側でリクエスト単位に指定する
+    - イベントループが変わった場合（CLI の asyncio.run 等）は作り直す
+    """
+    key = _origin(url)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None  # type: ignore[assignment]
+    entry = _clients.get(key)
+    if entry:
+        client, owner_loop = entry
+        if not client.is_closed and (loop is None or owner_loop is loop) and not owner_loop.is_closed():
+            return client
+    client = _build_client()
+    _clients[key] = (client, loop)  # type: ignore[assignment]
+    return client
+
+
+async def aclose_http_clients() -> None:
+    """共有クライアントをすべて閉じる（アプリ/CLI の終了時に呼ぶ）。"""
+    entries = list(_clients.items())
+    _clients.clear()
+    try:
+        current = asyncio.get_running_loop()
+    except RuntimeError:
+        current = None
+    for _key, (client, owner_loop) in entries:
+        # 別ループで生成されたクライアントはそのループ上でしか安全に閉じられないため破棄のみ
+        if owner_loop is not None and owner_loop is not current:
+            continue
+        try:
+            await client.aclose()
+        except Exception:
+            pass
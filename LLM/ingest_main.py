@@ -3,9 +3,17 @@ import asyncio
 import json
 import os
 
+from http_pool import aclose_http_clients
 from ingest_mode import run_ingest_mode
 
 
+async def _run(topic: str, domain: str, rounds: int, db: str | None) -> dict:
+    try:
+        return await run_ingest_mode(topic, domain, rounds, db)
+    finally:
+        await aclose_http_clients()
+
+
 def main() -> None:
     ap = argparse.ArgumentParser(description="KB ingest mode")
     ap.add_argument("topic", help="収集対象トピック（例: 吉沢亮 国宝）")
@@ -15,7 +23,7 @@ def main() -> None:
     ap.add_argument("--db", default=None, help="DBパス（省略時はKB/config.yamlのdb_path）")
     args = ap.parse_args()
 
-    merged = asyncio.run(run_ingest_mode(args.topic, args.domain, args.rounds, args.db))
+    merged = asyncio.run(_run(args.topic, args.domain, args.rounds, args.db))
     print(json.dumps(merged, ensure_ascii=False, indent=2))
 
 
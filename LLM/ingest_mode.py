@@ -3,16 +3,29 @@ from datetime import datetime
 import json
 import re
 import asyncio
+import codecs
+import functools
 import httpx
 import sqlite3
-from typing import Any, Dict, List, Optional, Callable
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Deque, Dict, List, Optional, Callable, Tuple
 from urllib.parse import urlparse
 
 from character_manager import CharacterManager
+from deadline import deadline_settings, wait_with_deadline
+from endpoint_pool import ensure_character_endpoints_ready_sync
+from http_pool import get_http_client
 from llm_factory import LLMFactory
 from llm_instance_manager import LLMInstanceManager
+from llm_scheduler import llm_priority
 from log_manager import write_operation_log
-from readiness_checker import ensure_ollama_model_ready_sync
+import metrics
+from fetch_scheduler import get_fetch_scheduler
+from html_scan import scan_html
+from page_cache import INGEST_PAGE_CACHE, get_page_cache, page_cache_settings
+from stop_policy import StopPolicy
 from web_search import search_text
 from normalize import normalize_title as nz_title, normalize_person_name as nz_person, looks_like_role_list_plus_name as nz_rolelist
 
@@ -85,6 +98,10 @@ def build_extractor_prompt(domain: str) -> str:
 """
     return template.replace("{DOMAIN}", str(domain))
 
+# 抽出JSONの終端マーカーで生成を止める（以降の余計な説明文に num_predict を使わせない）
+EXTRACTOR_STOP_POLICY = StopPolicy(stop_sequences=("<<<JSON_END>>>",))
+
+
 def build_repair_prompt(domain: str) -> str:
     return (
         "以下の入力テキストを、指定スキーマに合致する有効なJSONに修復してください。\n"
@@ -112,7 +129,8 @@ def extract_json(text: str) -> Optional[Dict[str, Any]]:
     # まずはマーカー優先
     start_tag = "<<<JSON_START>>>"
     end_tag = "<<<JSON_END>>>"
-    if start_tag in s and end_tag in s:
+    # 終了マーカーは停止文字列としてサーバ側で消費されるため、開始マーカーのみでも受け付ける
+    if start_tag in s:
         try:
             frag = s.split(start_tag, 1)[1].split(end_tag, 1)[0]
             parsed = _try_parse_relaxed(frag)
@@ -190,6 +208,52 @@ MAX_HITS_TOTAL = 8          # まとめて採用する最大件数（従来: 8
 MAX_DEEP_FETCH = 6          # 精読する最大件数
 FETCH_TIMEOUT_SEC = 20.0
 FETCH_BYTES_LIMIT = 100000  # 過大ページの取り過ぎ防止（詳細抽出向けに拡大）
+SEARCH_CONCURRENCY = 3      # 検索計画を先読みで並行実行するクエリ数（DDG への同時接続数の上限）
+
+# search_text は同期 API なので専用スレッドで実行し、イベントループを止めない
+_SEARCH_EXECUTOR = ThreadPoolExecutor(max_workers=SEARCH_CONCURRENCY, thread_name_prefix="ingest-search")
+
+
+async def _iter_search_plan(
+    plan: List[str],
+    max_results: int,
+    tolerant: bool = False,
+    on_issue: Optional[Callable[[str], None]] = None,
+) -> AsyncIterator[Tuple[str, List[Dict[str, Any]]]]:
+    """
+    検索計画を計画順に (クエリ, 結果) で返す。先の SEARCH_CONCURRENCY 件までを並行実行しておき、
+    呼び出し側が反復をやめたら未着手の検索は取り消す（aclosing で使う）。
+    tolerant=True なら失敗したクエリは空の結果として扱う。on_issue はクエリを実際に投げるときに呼ぶ。
+    """
+    loop = asyncio.get_running_loop()
+    queries = iter(plan)
+    pending: Deque[Tuple[str, asyncio.Future]] = deque()
+
+    def _fill() -> None:
+        while len(pending) < SEARCH_CONCURRENCY:
+            q = next(queries, None)
+            if q is None:
+                return
+            call = functools.partial(search_text, q, region="jp-jp", max_results=max_results, safesearch="moderate")
+            if on_issue is not None:
+                on_issue(q)
+            pending.append((q, loop.run_in_executor(_SEARCH_EXECUTOR, call)))
+
+    try:
+        _fill()
+        while pending:
+            q, fut = pending.popleft()
+            try:
+                results = await fut
+            except Exception:
+                if not tolerant:
+                    raise
+                results = []
+            _fill()
+            yield q, results
+    finally:
+        for _, fut in pending:
+            fut.cancel()
 
 ROLE_KEYWORDS = {
     "監督": "director",
@@ -406,16 +470,8 @@ def _dedupe_preserve_order(items: List[str]) -> List[str]:
     return out
 
 def _strip_html(html: str) -> str:
-    s = html
-    # 取り回し簡易のため、ごく簡単にタグ除去
-    s = re.sub(r"<script[\s\S]*?</script>", " ", s, flags=re.IGNORECASE)
-    s = re.sub(r"<style[\s\S]*?</style>", " ", s, flags=re.IGNORECASE)
-    s = s.replace("<br>", "\n").replace("<br/>", "\n").replace("<br />", "\n")
-    s = re.sub(r"</p>", "\n", s, flags=re.IGNORECASE)
-    s = re.sub(r"<[^>]+>", " ", s)
-    s = re.sub(r"\u00A0", " ", s)  # nbsp
-    s = re.sub(r"\s+", " ", s)
-    return s.strip()
+    """タグと script/style を除いた本文テキスト（空白は 1 つに圧縮）。"""
+    return scan_html(html).text
 
 
 def _jp_text_score(s: str) -> int:
@@ -431,11 +487,9 @@ def _jp_text_score(s: str) -> int:
 def _extract_long_paragraph_from_html(html: str) -> Optional[str]:
     """<p>～</p> から本文っぽい長文段落を抽出（日本語スコアと長さで選択）。"""
     try:
-        paras = re.findall(r"<p[^>]*>([\s\S]*?)</p>", html, re.IGNORECASE)
         best: Optional[str] = None
         best_score = -1
-        for inner in paras:
-            txt = _strip_html(inner)
+        for txt in scan_html(html).paragraphs:
             if len(txt) < 60 or "。" not in txt:
                 continue
             score = _jp_text_score(txt) + len(txt) // 10
@@ -497,51 +551,120 @@ def _jp_text_score(s: str) -> int:
     return score
 
 
-async def _fetch_text(url: str) -> str:
+def _page_decoder(url: str, r: httpx.Response) -> codecs.IncrementalDecoder:
+    # eiga.com は UTF-8 固定でデコード（誤判定時の文字化けを防止）
+    try:
+        host = urlparse(url).netloc.lower()
+    except Exception:
+        host = ""
+    if "eiga.com" in host:
+        return codecs.getincrementaldecoder("utf-8")(errors="ignore")
+    # それ以外は Content-Type の charset（なければ UTF-8）
+    try:
+        return codecs.getincrementaldecoder(r.charset_encoding or "utf-8")(errors="replace")
+    except LookupError:
+        return codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+
+async def _read_page(url: str, r: httpx.Response, stop_at: Optional[re.Pattern] = None) -> Tuple[httpx.Response, str, bool]:
+    """
+    本文をストリームで受けながら逐次デコードし、FETCH_BYTES_LIMIT 文字に達したら読むのをやめる。
+    stop_at を渡すと、それに一致した時点でも打ち切る（必要な部分だけ読めばよいページ向け）。
+    戻り値: (応答, 本文, stop_at で打ち切ったか)。2xx 以外は本文を読まない。
+    """
+    if r.status_code == 304:
+        # 未変更: 本文は無く、呼び出し側が保存分を使う
+        return r, "", False
+    if not r.is_success:
+        # エラー応答の本文は使わない（呼び出し側で raise_for_status する）
+        return r, "", False
+    decoder = _page_decoder(url, r)
+    parts: List[str] = []
+    size = 0
+    received = 0
+    stopped = False
+    async for chunk in r.aiter_bytes():
+        received += len(chunk)
+        text = decoder.decode(chunk)
+        if stop_at is not None and text:
+            # 前のチャンクとの境界をまたぐ一致も拾えるよう、直前の末尾も含めて探す
+            tail = parts[-1][-256:] if parts else ""
+            if stop_at.search(tail + text):
+                stopped = True
+        parts.append(text)
+        size += len(text)
+        if stopped or size >= FETCH_BYTES_LIMIT:
+            break
+    else:
+        parts.append(decoder.decode(b"", final=True))
+    metrics.INGEST_BYTES_FETCHED.inc(received)
+    return r, "".join(parts)[:FETCH_BYTES_LIMIT], stopped
+
+
+async def _fetch_text(url: str, stop_at: Optional[re.Pattern] = None) -> str:
+    """
+    ページ本文（先頭 FETCH_BYTES_LIMIT 文字まで）を取得する。
+    stop_at に一致した時点で読むのをやめた本文は不完全なのでページキャッシュには保存しない。
+    """
+    cache = get_page_cache()
+    cache_cfg = page_cache_settings()
+    cached = await cache.aget(url) if cache is not None else None
+    if cached is not None and (cache_cfg.get("offline") or cached.is_fresh(float(cache_cfg["fresh_sec"]))):
+        INGEST_PAGE_CACHE.inc(result="hit")
+        return cached.text[:FETCH_BYTES_LIMIT]
+    if cache_cfg.get("offline"):
+        INGEST_PAGE_CACHE.inc(result="offline_miss")
+        raise RuntimeError(f"page not cached (offline): {url}")
     headers = {"User-Agent": "Mozilla/5.0 (IngestBot/1.0)"}
-    last_exc: Optional[Exception] = None
-    for attempt in range(2):  # 1回リトライ
-        try:
-            async with httpx.AsyncClient(follow_redirects=True, timeout=FETCH_TIMEOUT_SEC, headers=headers) as client:
-                r = await client.get(url)
-                r.raise_for_status()
-                # eiga.com は UTF-8 固定でデコード（誤判定時の文字化けを防止）
-                try:
-                    host = urlparse(url).netloc.lower()
-                except Exception:
-                    host = ""
-                if "eiga.com" in host:
-                    content = r.content.decode("utf-8", errors="ignore")
-                else:
-                    # httpx の推定に委ねる
-                    content = r.text
-                if len(content) > FETCH_BYTES_LIMIT:
-                    content = content[:FETCH_BYTES_LIMIT]
-                return content
-        except Exception as e:
-            last_exc = e
-            if attempt == 0:
-                continue
-            raise
-    if last_exc:
-        raise last_exc
-    return ""
+    if cached is not None:
+        headers.update(cached.validators())
+    try:
+        # 会話側と同じ共有プールを利用（同一ホストの連続取得で接続を再利用）。
+        # 送信間隔・同時取得数・Retry-After/再試行はホストごとに取得スケジューラが管理する
+        client = get_http_client(url)
+        r, content, stopped = await get_fetch_scheduler().get(
+            client, url, read=functools.partial(_read_page, url, stop_at=stop_at),
+            headers=headers, follow_redirects=True, timeout=FETCH_TIMEOUT_SEC,
+        )
+        if r.status_code == 304 and cached is not None:
+            # 未変更: 保存分を返す
+            await cache.atouch(url)
+            INGEST_PAGE_CACHE.inc(result="revalidated")
+            metrics.INGEST_PAGES_FETCHED.inc(result="not_modified")
+            return cached.text[:FETCH_BYTES_LIMIT]
+        r.raise_for_status()
+    except Exception as e:
+        metrics.INGEST_PAGES_FETCHED.inc(result="error")
+        if cached is not None and _is_transient_fetch_error(e) and \
+                cached.is_usable_stale(float(cache_cfg.get("max_stale_sec") or 0.0)):
+            # 接続エラー/5xx で再検証できなければ、古すぎない保存分で代用する（404/410 などは代用しない）
+            INGEST_PAGE_CACHE.inc(result="stale")
+            return cached.text[:FETCH_BYTES_LIMIT]
+        raise
+    metrics.INGEST_PAGES_FETCHED.inc(result="ok")
+    if cache is not None and not stopped:
+        INGEST_PAGE_CACHE.inc(result="miss" if cached is None else "changed")
+        await cache.aput(url, content, r.headers.get("ETag"), r.headers.get("Last-Modified"))
+    return content
+
+
+def _is_transient_fetch_error(e: Exception) -> bool:
+    """接続/タイムアウト等の通信エラーか 5xx 応答なら True（保存分で代用してよい失敗）。"""
+    if isinstance(e, httpx.TransportError):
+        return True
+    return isinstance(e, httpx.HTTPStatusError) and e.response.status_code >= 500
 
 
 def _extract_meta_title(html: str) -> str:
-    m = re.search(r"<meta[^>]*property=\"og:title\"[^>]*content=\"([^\"]+)\"", html, re.IGNORECASE)
-    if m:
-        return m.group(1).strip()
-    m2 = re.search(r"<title>([^<]+)</title>", html, re.IGNORECASE)
-    return m2.group(1).strip() if m2 else ""
+    page = scan_html(html)
+    return (page.meta.get("og:title") or "").strip() or page.title
 
 
 def _iter_json_ld(html: str) -> List[Dict[str, Any]]:
     """<script type="application/ld+json"> ... を列挙してJSONを返す（壊れに強く）。"""
     objs: List[Dict[str, Any]] = []
     try:
-        blocks = re.findall(r"<script[^>]*type=\"application/ld\+json\"[^>]*>([\s\S]*?)</script>", html, re.IGNORECASE)
-        for b in blocks:
+        for b in scan_html(html).json_ld:
             txt = b.strip()
             # JSONの前後にHTMLコメントや余計なテキストが混ざる場合があるので緩く整形
             try:
@@ -573,8 +696,14 @@ def _iter_json_ld(html: str) -> List[Dict[str, Any]]:
     return objs
 
 
+_PERSON_HREF_RE = re.compile(r"/person/(\d+)/")
+_MOVIE_HREF_RE = re.compile(r"/movie/(\d+)/")
+_DRAMA_HREF_RE = re.compile(r"/drama/\d+/|/tv/[^\"]+/")
+
+
 def deep_extract_from_page(url: str, html: str) -> Dict[str, Any]:
     result: Dict[str, Any] = {"director": [], "actor": [], "voice": [], "screenplay": [], "author": [], "composer": [], "year": [], "work": [], "synopsis": "", "title": "", "cast_pairs": []}
+    page = scan_html(html)
     meta_title = _extract_meta_title(html)
     if meta_title:
         wt = sanitize_query(meta_title)
@@ -659,21 +788,17 @@ def deep_extract_from_page(url: str, html: str) -> Dict[str, Any]:
             result["actor"].append(n)
     # og:description を synopsis として補完
     try:
-        mdesc = re.search(r"<meta[^>]*name=\"description\"[^>]*content=\"([^\"]*)\"", html, re.IGNORECASE)
-        if mdesc:
-            d = mdesc.group(1).strip()
-            if d and len(d) > len(result.get("synopsis") or ""):
-                result["synopsis"] = d
+        d = (page.meta.get("description") or "").strip()
+        if d and len(d) > len(result.get("synopsis") or ""):
+            result["synopsis"] = d
     except Exception:
         pass
     # personリンクを cast_pairs として収集（/person/NNNN/ の aタグテキスト）
     try:
-        for a, href in re.findall(r"<a[^>]*href=\"(/person/\d+/)\"[^>]*>([\s\S]*?)</a>", html, re.IGNORECASE):
-            name = sanitize_query(_strip_html(href))
+        for a, m in page.anchors_matching(_PERSON_HREF_RE):
+            name = sanitize_query(a.text)
             if name and len(name) <= 40:
-                pid = _parse_eiga_person_id(a)
-                if pid:
-                    result.setdefault("cast_pairs", []).append({"name": name, "person_id": pid})
+                result.setdefault("cast_pairs", []).append({"name": name, "person_id": m.group(1)})
     except Exception:
         pass
     return result
@@ -774,6 +899,9 @@ def _select_person_base_url(hits: List[Dict[str, Any]]) -> Optional[str]:
     return None
 
 
+_PERSON_LINK_RE = re.compile(r"href=\"(/person/(\d+)/?)\"")
+
+
 async def _search_eiga_person_url(query: str, log: Optional[Callable[[str], None]] = None) -> Optional[str]:
     """eiga.com のサイト内検索を直接叩き、/person/<id>/ を一件返すフォールバック。"""
     try:
@@ -788,9 +916,9 @@ async def _search_eiga_person_url(query: str, log: Optional[Callable[[str], None
         for url in variants:
             if log:
                 log(f"Person direct search (eiga.com): {url}")
-            html = await _fetch_text(url)
-            # 最初に出現する /person/<id>/ を採用
-            m = re.search(r"href=\"(/person/(\d+)/?)\"", html)
+            # 最初に出現する /person/<id>/ を採用（見つかった時点で残りの本文は読まない）
+            html = await _fetch_text(url, stop_at=_PERSON_LINK_RE)
+            m = _PERSON_LINK_RE.search(html)
             if m:
                 pid = m.group(2)
                 pb = f"https://eiga.com/person/{pid}/"
@@ -835,38 +963,39 @@ async def perform_web_search_and_hints(current_query: str, domain: str) -> tuple
     merged_hits: List[Dict[str, Any]] = []
     per_query_results: List[Dict[str, Any]] = []
     seen_urls = set()
-    for q in search_plan:
-        if len(merged_hits) >= MAX_HITS_TOTAL:
-            break
-        partial = search_text(q, region="jp-jp", max_results=MAX_RESULTS_PER_QUERY, safesearch="moderate")
-        # クエリごとの生結果を保持（search_textの戻り値を「そのまま」保存）
-        try:
-            per_query_results.append({
-                "plan_query": q,
-                "results": partial,
-            })
-        except Exception:
-            pass
-        for h in partial:
-            url = (h.get("url") or h.get("href") or "").strip()
-            if not url:
-                continue
-            if url in seen_urls:
-                continue
-            host = urlparse(url).netloc.lower()
-            if host in deny_hosts:
-                continue
-            if "映画" in dom:
-                if host in allowed_hosts:
-                    seen_urls.add(url)
-                    merged_hits.append(h)
-                else:
-                    if q.endswith("site:.jp") and host.endswith(".jp"):
+    # 計画は並行に実行し、統合は計画順（上位クエリのヒットを優先）。MAX_HITS_TOTAL に達したら残りは取り消す
+    async with aclosing(_iter_search_plan(search_plan, MAX_RESULTS_PER_QUERY)) as plan_results:
+        async for q, partial in plan_results:
+            # クエリごとの生結果を保持（search_textの戻り値を「そのまま」保存）
+            try:
+                per_query_results.append({
+                    "plan_query": q,
+                    "results": partial,
+                })
+            except Exception:
+                pass
+            for h in partial:
+                url = (h.get("url") or h.get("href") or "").strip()
+                if not url:
+                    continue
+                if url in seen_urls:
+                    continue
+                host = urlparse(url).netloc.lower()
+                if host in deny_hosts:
+                    continue
+                if "映画" in dom:
+                    if host in allowed_hosts:
                         seen_urls.add(url)
                         merged_hits.append(h)
-            else:
-                seen_urls.add(url)
-                merged_hits.append(h)
+                    else:
+                        if q.endswith("site:.jp") and host.endswith(".jp"):
+                            seen_urls.add(url)
+                            merged_hits.append(h)
+                else:
+                    seen_urls.add(url)
+                    merged_hits.append(h)
+                if len(merged_hits) >= MAX_HITS_TOTAL:
+                    break
             if len(merged_hits) >= MAX_HITS_TOTAL:
                 break
 
@@ -916,25 +1045,23 @@ async def resolve_person_base_url_from_hits(current_query: str, merged_hits: Lis
         f'"{current_query}" site:eiga.com/person',
     ]
     fallback_hits: List[Dict[str, Any]] = []
-    for fbq in fb_queries:
-        try:
-            logf(f"Person fallback search: {fbq}")
-            partial = search_text(fbq, region="jp-jp", max_results=12, safesearch="moderate")
-        except Exception:
-            partial = []
-        if partial:
-            logf("Person fallback hints begin")
+    # 各クエリは実際に投げた時点でログに出す
+    fb_plan = _iter_search_plan(fb_queries, 12, tolerant=True, on_issue=lambda q: logf(f"Person fallback search: {q}"))
+    async with aclosing(fb_plan) as fb_results:
+        async for fbq, partial in fb_results:
+            if partial:
+                logf("Person fallback hints begin")
+                for h in partial:
+                    logf(f"- {h.get('title')} :: {h.get('url') or h.get('href')} :: {h.get('snippet')}")
+                logf("Person fallback hints end")
             for h in partial:
-                logf(f"- {h.get('title')} :: {h.get('url') or h.get('href')} :: {h.get('snippet')}")
-            logf("Person fallback hints end")
-        for h in partial:
-            url = (h.get("url") or h.get("href") or "").strip()
-            if not url:
-                continue
-            host = urlparse(url).netloc.lower()
-            if host != "eiga.com":
-                continue
-            fallback_hits.append(h)
+                url = (h.get("url") or h.get("href") or "").strip()
+                if not url:
+                    continue
+                host = urlparse(url).netloc.lower()
+                if host != "eiga.com":
+                    continue
+                fallback_hits.append(h)
     if fallback_hits:
         pb = _select_person_base_url(fallback_hits)
         if pb:
@@ -983,6 +1110,62 @@ def log_hints_and_build_block(logf: Callable[[str], None], hints_list: str, stru
     return hint_block
 
 
+def _pager_last_page(html: str, first_url: str) -> int:
+    """一覧HTMLのページャ（<base>/2/, <base>/3/ ...）に現れる最大のページ番号（無ければ 1）。"""
+    base_path = urlparse(first_url).path.rstrip("/") + "/"
+    page_re = re.compile(re.escape(base_path) + r"(\d+)/")
+    nums = [int(m.group(1)) for a in scan_html(html).anchors for m in page_re.finditer(a.href)]
+    return max(nums, default=1)
+
+
+async def _crawl_listing_pages(page_urls: List[str], page_keys: Callable[[str], List[Any]]) -> List[str]:
+    """
+    一覧ページ群（page_urls[0] が 1 ページ目）の HTML をページ順に返す。
+    1 ページ目のページャから総ページ数を読み、残りは並行に取得する（ホストごとの流量は取得スケジューラが制御）
+    （ページャが途中までしか出ない場合は、取得した最後のページのページャから続きを読む）。
+    ページャが見つからなければ従来どおり 1 ページずつ辿る。
+    いずれも取得に失敗したページ、または新しい項目（page_keys）が無いページの手前で打ち切る。
+    """
+    if not page_urls:
+        return []
+    try:
+        first = await _fetch_text(page_urls[0])
+    except Exception:
+        return []
+    htmls = [first]
+    seen = set(page_keys(first))
+    if not seen:
+        return htmls
+    known_last = min(len(page_urls), _pager_last_page(first, page_urls[0]))
+    has_pager = known_last > 1
+    next_index = 1
+    while next_index < len(page_urls):
+        if has_pager and known_last <= next_index:
+            break
+        if known_last > next_index:
+            # ページャで存在がわかっている範囲をまとめて並行取得
+            batch = page_urls[next_index:known_last]
+            results = await asyncio.gather(*(_fetch_text(u) for u in batch), return_exceptions=True)
+        else:
+            # ページャ無し（または読み取れない）: 次の 1 ページだけ試す
+            batch = page_urls[next_index:next_index + 1]
+            try:
+                results = [await _fetch_text(batch[0])]
+            except Exception as e:
+                results = [e]
+        for html in results:
+            if isinstance(html, BaseException):
+                return htmls
+            keys = page_keys(html)
+            if not any(k not in seen for k in keys):
+                return htmls
+            seen.update(keys)
+            htmls.append(html)
+        next_index += len(batch)
+        known_last = max(known_last, min(len(page_urls), _pager_last_page(htmls[-1], page_urls[0])))
+    return htmls
+
+
 def _person_movie_page_urls(person_base_url: str, max_pages: int = 20) -> List[str]:
     """person/<id>/movie/ のページURL群を生成（1,2,3...）。"""
     urls = [person_base_url.rstrip('/') + '/movie/']
@@ -996,9 +1179,11 @@ def _extract_movie_titles_from_person_movie_html(html: str) -> List[str]:
     ネストしたタグにも対応するため、a要素の内側HTMLをstripしてテキスト化してから抽出する。
     """
     titles: List[str] = []
-    for inner in re.findall(r"<a[^>]+href=\"/movie/\d+/\"[^>]*>([\s\S]*?)</a>", html, re.IGNORECASE):
-        text = sanitize_query(_strip_html(inner))
-        if text and text not in titles:
+    seen = set()
+    for a, _m in scan_html(html).anchors_matching(_MOVIE_HREF_RE):
+        text = sanitize_query(a.text)
+        if text and text not in seen:
+            seen.add(text)
             titles.append(text)
     return titles
 
@@ -1007,9 +1192,9 @@ def _extract_movie_entries_from_person_movie_html(html: str) -> List[Dict[str, A
     """人物の映画一覧HTMLから (title, movie_id) のエントリを抽出する。"""
     entries: List[Dict[str, Any]] = []
     seen = set()
-    for href, mid, inner in re.findall(r"<a[^>]+href=\"(/movie/(\d+)/)\"[^>]*>([\s\S]*?)</a>", html, re.IGNORECASE):
-        movie_id = mid
-        title = sanitize_query(_strip_html(inner))
+    for a, m in scan_html(html).anchors_matching(_MOVIE_HREF_RE):
+        movie_id = m.group(1)
+        title = sanitize_query(a.text)
         key = (title, movie_id)
         if title and key not in seen:
             seen.add(key)
@@ -1017,52 +1202,28 @@ def _extract_movie_entries_from_person_movie_html(html: str) -> List[Dict[str, A
     return entries
 
 
-async def _fetch_person_all_movies(person_base_url: str) -> tuple[List[str], int]:
+async def _fetch_person_movies(person_base_url: str) -> tuple[List[Dict[str, Any]], List[str], int]:
+    """人物の映画一覧を 1 回の巡回で取得し、(エントリ[(title, movie_id)], 作品名, ページ数) を返す。"""
+    entries: List[Dict[str, Any]] = []
     titles: List[str] = []
-    seen = set()
-    pages = 0
-    for url in _person_movie_page_urls(person_base_url):
-        try:
-            html = await _fetch_text(url)
-        except Exception:
-            break
-        page_titles = _extract_movie_titles_from_person_movie_html(html)
-        pages += 1
-        new_any = False
-        for t in page_titles:
-            if t not in seen:
-                seen.add(t)
+    seen_entries = set()
+    seen_titles = set()
+
+    def _page_keys(html: str) -> List[Any]:
+        return [(e.get("title"), e.get("movie_id")) for e in _extract_movie_entries_from_person_movie_html(html)]
+
+    htmls = await _crawl_listing_pages(_person_movie_page_urls(person_base_url), _page_keys)
+    for html in htmls:
+        for e in _extract_movie_entries_from_person_movie_html(html):
+            key = (e.get("title"), e.get("movie_id"))
+            if e.get("title") and key not in seen_entries:
+                seen_entries.add(key)
+                entries.append({"title": e.get("title"), "movie_id": e.get("movie_id")})
+        for t in _extract_movie_titles_from_person_movie_html(html):
+            if t not in seen_titles:
+                seen_titles.add(t)
                 titles.append(t)
-                new_any = True
-        # 新規が無ければ以降は打ち切り
-        if not new_any:
-            break
-    return titles, pages
-
-
-async def _fetch_person_all_movie_entries(person_base_url: str) -> tuple[List[Dict[str, Any]], int]:
-    entries: List[Dict[str, Any]] = []
-    seen = set()
-    pages = 0
-    for url in _person_movie_page_urls(person_base_url):
-        try:
-            html = await _fetch_text(url)
-        except Exception:
-            break
-        page_entries = _extract_movie_entries_from_person_movie_html(html)
-        pages += 1
-        new_any = False
-        for e in page_entries:
-            title = e.get("title")
-            mid = e.get("movie_id")
-            key = (title, mid)
-            if title and key not in seen:
-                seen.add(key)
-                entries.append({"title": title, "movie_id": mid})
-                new_any = True
-        if not new_any:
-            break
-    return entries, pages
+    return entries, titles, len(htmls)
 
 
 def _person_drama_page_urls(person_base_url: str, max_pages: int = 20) -> List[str]:
@@ -1078,10 +1239,12 @@ def _extract_drama_titles_from_person_drama_html(html: str) -> List[str]:
     eiga.comのドラマ詳細リンクは将来構造変更の可能性があるため、/drama/ または /tv/ を含む a のテキストを候補とする。
     """
     titles: List[str] = []
+    seen = set()
     # /drama/<id>/ または /tv/... を持つリンクのテキストを抽出
-    for inner in re.findall(r"<a[^>]+href=\"(?:/drama/\d+/|/tv/[^\"]+/)\"[^>]*>([\s\S]*?)</a>", html, re.IGNORECASE):
-        text = sanitize_query(_strip_html(inner))
-        if text and text not in titles:
+    for a, _m in scan_html(html).anchors_matching(_DRAMA_HREF_RE):
+        text = sanitize_query(a.text)
+        if text and text not in seen:
+            seen.add(text)
             titles.append(text)
     return titles
 
@@ -1089,23 +1252,13 @@ def _extract_drama_titles_from_person_drama_html(html: str) -> List[str]:
 async def _fetch_person_all_dramas(person_base_url: str) -> tuple[List[str], int]:
     titles: List[str] = []
     seen = set()
-    pages = 0
-    for url in _person_drama_page_urls(person_base_url):
-        try:
-            html = await _fetch_text(url)
-        except Exception:
-            break
-        page_titles = _extract_drama_titles_from_person_drama_html(html)
-        pages += 1
-        new_any = False
-        for t in page_titles:
+    htmls = await _crawl_listing_pages(_person_drama_page_urls(person_base_url), _extract_drama_titles_from_person_drama_html)
+    for html in htmls:
+        for t in _extract_drama_titles_from_person_drama_html(html):
             if t not in seen:
                 seen.add(t)
                 titles.append(t)
-                new_any = True
-        if not new_any:
-            break
-    return titles, pages
+    return titles, len(htmls)
 
 
 def _clean_note_text(raw: str) -> Optional[str]:
@@ -1601,6 +1754,26 @@ async def run_ingest_mode(
     topic_type: str = "unknown",
     auto_next_max: int = 3,
     register: bool = True,
+) -> Dict[str, Any]:
+    # 呼び出し元が LLM の優先度クラスを指定していなければ一括取り込み（最下位）として扱う
+    with llm_priority("ingest", only_if_unset=True):
+        return await _run_ingest_mode(
+            topic, domain, rounds, db_path, expand, strict, log_callback, cancel_check, topic_type, auto_next_max, register,
+        )
+
+
+async def _run_ingest_mode(
+    topic: str,
+    domain: str,
+    rounds: int,
+    db_path: str,
+    expand: bool,
+    strict: bool,
+    log_callback: Optional[Callable[[str], None]],
+    cancel_check: Optional[Callable[[], bool]],
+    topic_type: str,
+    auto_next_max: int,
+    register: bool,
 ) -> Dict[str, Any]:
     ensure_dirs()
     root_logs = os.path.abspath(os.path.join(BASE_DIR, "..", "logs"))
@@ -1613,9 +1786,7 @@ async def run_ingest_mode(
     try:
         for c in manager.list_characters():
             if str(c.get("provider", "")).lower() == "ollama":
-                base_url = c.get("base_url", "http://localhost:11434")
-                model = c.get("model")
-                ensure_ollama_model_ready_sync(base_url, model, operation_log_filename)
+                ensure_character_endpoints_ready_sync(c, operation_log_filename)
     except Exception:
         pass
 
@@ -1641,6 +1812,16 @@ async def run_ingest_mode(
     _log(f"Start ingest: topic='{topic}', domain='{domain}', rounds={rounds}, strict={strict}")
     iter_max = max(1, rounds)
     auto_budget = max(0, int(auto_next_max))
+    # 人物の映画一覧は 1 回の巡回結果をエントリ（ペイロード用）と作品名（次候補用）の両方に使う
+    person_movies_cache: Dict[str, tuple] = {}
+
+    async def _person_movies(url: str) -> tuple:
+        if url not in person_movies_cache:
+            person_movies_cache[url] = await _fetch_person_movies(url)
+        return person_movies_cache[url]
+
+    # 抽出/修復プロンプト 1 回あたりの持ち時間（期限はクライアントの HTTP タイムアウトにも反映される）
+    budgets = deadline_settings()
     r = 0
     while r < iter_max:
         # STOPボタン/外部キャンセルの確認
@@ -1659,6 +1840,7 @@ async def run_ingest_mode(
             current_query = sanitize_query(topic)
         executed_queries.add(current_query)
         _log(f"Search query: {current_query}")
+        metrics.INGEST_ROUNDS.inc()
         # 現在のクエリのタイプ（人物/作品）を推定/保持
         def _infer_type(q: str) -> str:
             t = base_type
@@ -1724,7 +1906,7 @@ async def run_ingest_mode(
                         # 映画一覧の取得とログ・ペイロード化（タイトルとURLを正規化して登録）
                         normalized_movies: List[Dict[str, Any]] = []
                         try:
-                            movie_entries, movie_pages = await _fetch_person_all_movie_entries(person_base_url)
+                            movie_entries, _movie_titles, movie_pages = await _person_movies(person_base_url)
                             if movie_entries:
                                 _log("Movie list (from person page):")
                                 for ent in movie_entries[:50]:
@@ -1843,7 +2025,7 @@ async def run_ingest_mode(
                 continue
             try:
                 # 検索ヒントを常に併用して1回で応答を取得
-                resp = await asyncio.wait_for(llm.ainvoke(system_prompt, f"収集対象: {current_query}{hint_block}"), timeout=60.0)
+                resp = await wait_with_deadline(llm.ainvoke(system_prompt, f"収集対象: {current_query}{hint_block}", EXTRACTOR_STOP_POLICY), budgets["ingest_extract_sec"])
                 data = extract_json(resp)
                 if isinstance(data, dict):
                     data = _normalize_extracted_payload(data)
@@ -1851,7 +2033,7 @@ async def run_ingest_mode(
                     if _is_effectively_empty_payload(data):
                         try:
                             repair_prompt = build_repair_prompt(domain)
-                            rep = await asyncio.wait_for(llm.ainvoke(repair_prompt, resp), timeout=45.0)
+                            rep = await wait_with_deadline(llm.ainvoke(repair_prompt, resp, EXTRACTOR_STOP_POLICY), budgets["ingest_repair_sec"])
                             fixed = extract_json(rep)
                             if isinstance(fixed, dict):
                                 fixed = _normalize_extracted_payload(fixed)
@@ -1899,7 +2081,7 @@ async def run_ingest_mode(
                     # リトライ（STRICT再試行）
                     if not strict:
                         sp = f"{persona}\n\n## 収集モード(STRICT-RETRY)\n{extractor}\n\nJSONのみを返してください。先頭から {{ と }} までの有効JSONのみ。"
-                        resp2 = await asyncio.wait_for(llm.ainvoke(sp, f"収集対象: {current_query}{hint_block}"), timeout=60.0)
+                        resp2 = await wait_with_deadline(llm.ainvoke(sp, f"収集対象: {current_query}{hint_block}", EXTRACTOR_STOP_POLICY), budgets["ingest_extract_sec"])
                         data2 = extract_json(resp2)
                         if isinstance(data2, dict):
                             data2 = _normalize_extracted_payload(data2)
@@ -1987,7 +2169,7 @@ async def run_ingest_mode(
             # 人物ページ由来の全作品名を優先してnextに反映（存在チェックは後段で実施）
             if person_base_url:
                 try:
-                    all_titles, _pg = await _fetch_person_all_movies(person_base_url)
+                    _entries, all_titles, _pg = await _person_movies(person_base_url)
                     for t in all_titles:
                         st = sanitize_query(t)
                         if st and st not in next_candidates_round:
@@ -2081,7 +2263,9 @@ async def run_ingest_mode(
                 _log(f"DEBUG: DB path abs={db_abs} exists={os.path.exists(db_abs)}")
             except Exception:
                 pass
-            ingest_payload(db_abs, merged)
+            kb_rows = metrics.KbIngestRowTally()
+            ingest_payload(db_abs, merged, kb_rows)
+            kb_rows.commit()
             write_operation_log(operation_log_filename, "INFO", "IngestMode", f"Registered to DB: {db_path}")
             _log("Registered to DB")
             # 追加要素のサマリをログ出力
@@ -3,7 +3,7 @@ from fastapi import WebSocket
 from character_manager import CharacterManager
 from status_manager import update_all_statuses, update_status
 from log_manager import write_operation_log
-from readiness_checker import ensure_ollama_model_ready_sync
+from endpoint_pool import CIRCUIT_OPEN, character_circuit_state, ensure_character_endpoints_ready_sync
 
 async def set_initial_statuses(websocket: WebSocket, manager: CharacterManager, log_filename: str, operation_log_filename: str):
     write_operation_log(operation_log_filename, "INFO", "InitialStatusSetter", "Setting initial statuses for characters.")
@@ -16,10 +16,14 @@ async def set_initial_statuses(websocket: WebSocket, manager: CharacterManager,
         provider = char.get("provider", "").lower()
         display_name = char.get("display_name", char.get("name"))
         if provider == "ollama":
-            base_url = char.get("base_url", "http://localhost:11434")
-            model = char.get("model")
-            ready = ensure_ollama_model_ready_sync(base_url, model, operation_log_filename)
-            status = "ACTIVE" if ready else "IDLE"
+            # 複数エンドポイントなら全て確認し、1 つでも応答すれば ACTIVE（応答しないものは失敗として数える）
+            ready = ensure_character_endpoints_ready_sync(char, operation_log_filename)
+            # 応答しないだけ（ロード待ちのタイムアウトなど）なら従来通り IDLE。
+            # 連続失敗でサーキットが開いている場合だけ、会話から外れていることを OFFLINE で表示する
+            if ready:
+                status = "ACTIVE"
+            else:
+                status = "OFFLINE" if character_circuit_state(char) == CIRCUIT_OPEN else "IDLE"
             await update_status(websocket, display_name, status, log_filename, operation_log_filename)
         else:
             # それ以外のプロバイダは従来通り ACTIVE
@@ -1,56 +1,442 @@
 import asyncio
-from typing import Optional, Any, Dict
+import json
+import time
+from contextvars import ContextVar
+from typing import Optional, Any, AsyncIterator, Awaitable, Callable, Dict, List, Mapping, Sequence, Tuple, Union
 
 import httpx
 from openai import AsyncOpenAI
 
+from deadline import deadline_settings, remaining_time
+from endpoint_pool import BALANCE_STRATEGIES, LLM_ENDPOINT_FAILOVERS, LLM_HEDGED_REQUESTS, Endpoint, get_endpoint_pool, hedge_settings
+from http_pool import get_http_client
+from llm_scheduler import backend_slot, current_priority
 from log_manager import write_operation_log
+from stop_policy import StopPolicy
+
+
+# 呼び出し単位の計測値の書き込み先。呼び出し側が dict を set しておくと、クライアントが
+# 送信/初回トークン/完了の時刻（perf_counter）と、サーバ報告の所要時間（Ollama の *_duration）を記録する
+llm_call_stats: ContextVar[Optional[Dict[str, Any]]] = ContextVar("llm_call_stats", default=None)
+
+_OLLAMA_DURATION_FIELDS = ("total_duration", "load_duration", "prompt_eval_duration", "eval_duration")
+_OLLAMA_COUNT_FIELDS = ("prompt_eval_count", "eval_count")
+
+
+def _mark_call(key: str) -> None:
+    stats = llm_call_stats.get()
+    if stats is not None and key not in stats:
+        stats[key] = time.perf_counter()
+
+
+def _record_scheduler_wait(waited_sec: float) -> None:
+    """バックエンドの空き枠を待った時間を記録する（llm_scheduler.backend_slot）。"""
+    stats = llm_call_stats.get()
+    if stats is not None:
+        stats["scheduler_wait_ms"] = stats.get("scheduler_wait_ms", 0.0) + waited_sec * 1000
+        stats.setdefault("priority", current_priority())
+
+
+def _record_endpoint(url: str) -> None:
+    """実際に応答したエンドポイント（フェイルオーバー時は最後に試したもの）を記録する。"""
+    stats = llm_call_stats.get()
+    if stats is not None:
+        stats["endpoint"] = url
+
+
+def _record_ollama_done(data: Dict[str, Any]) -> None:
+    """Ollama の完了レスポンスに含まれる所要時間(ns)/トークン数を ms 単位で記録する。"""
+    stats = llm_call_stats.get()
+    if stats is None:
+        return
+    stats.setdefault("done_at", time.perf_counter())
+    for key in _OLLAMA_DURATION_FIELDS:
+        value = data.get(key)
+        if isinstance(value, (int, float)):
+            stats[key.replace("_duration", "_ms")] = value / 1e6
+    for key in _OLLAMA_COUNT_FIELDS:
+        value = data.get(key)
+        if isinstance(value, int):
+            stats[key] = value
+
+
+OLLAMA_APIS = ("generate", "chat")
+# 静的プレフィックスごとの context（carry_context 用）を保持する上限
+_MAX_PREFIX_CONTEXTS = 16
 
 
 class AsyncOllamaClient:
+    """
+    Ollama クライアント。
+    - api="generate": /api/generate に system と user を連結した prompt を送る（従来方式）
+    - api="chat": /api/chat に messages を送る。system にはプロンプトの静的プレフィックス（ターン間で同一）だけを置き、
+      会話履歴などの可変部は user 側へ回すので、先頭が毎回一致してサーバのプロンプトキャッシュが効く
+    keep_alive はモデルをメモリに保持する時間（例: "30m", -1 で無期限。None ならサーバ既定）。
+    carry_context=True（generate のみ）のときは静的プレフィックスを一度だけ評価させて返る context を保持し、
+    以降は context + 可変部だけを送る。
+    base_url に複数の URL（同じモデルを提供するサーバ群）を渡すと、balance の方式でリクエストごとに振り分け、
+    接続エラー/5xx のときは別のエンドポイントで再試行する（ストリームは最初のトークンを返す前まで）。
+    失敗が続いたエンドポイントはサーキットブレーカーで遮断され、全滅中の呼び出しは CircuitOpenError で即座に失敗する。
+    """
+
     def __init__(
         self,
-        base_url: str,
+        base_url: Union[str, Sequence[str]],
         model: str,
         temperature: float = 0.2,
         top_p: float = 0.9,
         repeat_penalty: float = 1.1,
         num_predict: int = 160,
         operation_log_filename: Optional[str] = None,
+        api: str = "generate",
+        keep_alive: Optional[Any] = None,
+        carry_context: bool = False,
+        balance: str = "least_outstanding",
     ) -> None:
-        self.base_url = base_url.rstrip("/")
+        urls = [base_url] if isinstance(base_url, str) else list(base_url)
+        self.endpoints: Tuple[str, ...] = tuple(dict.fromkeys(u.rstrip("/") for u in urls if u))
+        if not self.endpoints:
+            raise ValueError("AsyncOllamaClient needs at least one base_url")
+        self.base_url = self.endpoints[0]
+        self.balance = balance if balance in BALANCE_STRATEGIES else BALANCE_STRATEGIES[0]
+        # 同じ URL 組を使う他キャラクターと処理中件数/レイテンシを共有する
+        self.pool = get_endpoint_pool(self.endpoints)
         self.model = model
         self.temperature = temperature
         self.top_p = top_p
         self.repeat_penalty = repeat_penalty
         self.num_predict = num_predict
         self.operation_log_filename = operation_log_filename
+        self.api = api if api in OLLAMA_APIS else "generate"
+        self.keep_alive = keep_alive
+        self.carry_context = carry_context and self.api == "generate"
+        # 静的プレフィックス → /api/generate が返した context（トークン列）
+        self._prefix_contexts: Dict[str, list] = {}
+
+    @property
+    def _url(self) -> str:
+        return self._url_for(self.base_url)
+
+    def _url_for(self, base_url: str) -> str:
+        return f"{base_url}/api/{self.api}"
+
+    def _options(self, stop_policy: Optional[StopPolicy]) -> Dict[str, Any]:
+        options: Dict[str, Any] = {
+            "temperature": self.temperature,
+            "top_p": self.top_p,
+            "repeat_penalty": self.repeat_penalty,
+            "num_predict": self.num_predict,
+        }
+        # 停止文字列はサーバ側へ押し下げる（該当時点で生成そのものが止まる）
+        if stop_policy and stop_policy.server_stop():
+            options["stop"] = stop_policy.server_stop()
+        return options
+
+    @staticmethod
+    def _split_prompt(system_prompt: str, static_prefix_len: int) -> Tuple[str, str]:
+        """システムプロンプトを (静的プレフィックス, 可変部) に分ける（長さ不明なら全体を静的とみなす）。"""
+        if 0 < static_prefix_len < len(system_prompt):
+            return system_prompt[:static_prefix_len], system_prompt[static_prefix_len:]
+        return system_prompt, ""
 
-    async def ainvoke(self, system_prompt: str, user_message: str) -> str:
-        prompt = f"{system_prompt}\n\n{user_message}".strip()
+    def _build_payload(
+        self,
+        system_prompt: str,
+        user_message: str,
+        stream: bool,
+        stop_policy: Optional[StopPolicy],
+        static_prefix_len: int = 0,
+        context: Optional[list] = None,
+    ) -> Dict[str, Any]:
         payload: Dict[str, Any] = {
             "model": self.model,
-            "prompt": prompt,
-            "stream": False,
-            "options": {
-                "temperature": self.temperature,
-                "top_p": self.top_p,
-                "repeat_penalty": self.repeat_penalty,
-                "num_predict": self.num_predict,
-            },
+            "stream": stream,
+            "options": self._options(stop_policy),
         }
-        url = f"{self.base_url}/api/generate"
-        async with httpx.AsyncClient(timeout=httpx.Timeout(70.0)) as client:
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        if self.api == "chat":
+            system, dynamic = self._split_prompt(system_prompt or "", static_prefix_len)
+            user = f"{dynamic.strip()}\n\n{user_message or ''}".strip() if dynamic else (user_message or "")
+            payload["messages"] = [
+                {"role": "system", "content": system},
+                {"role": "user", "content": user},
+            ]
+        elif context is not None:
+            # プレフィックスは context として評価済みなので、可変部とユーザー発言だけを送る
+            _, dynamic = self._split_prompt(system_prompt or "", static_prefix_len)
+            payload["prompt"] = f"{dynamic}\n\n{user_message}".strip()
+            payload["context"] = context
+        else:
+            payload["prompt"] = f"{system_prompt}\n\n{user_message}".strip()
+        return payload
+
+    async def _prefix_context(
+        self, client: httpx.AsyncClient, system_prompt: str, static_prefix_len: int, base_url: Optional[str] = None
+    ) -> Optional[list]:
+        """
+        carry_context 用に、静的プレフィックスを評価させた context を返す（初回のみサーバへ問い合わせる）。
+        context はトークン列なので、同じモデルを提供する別エンドポイントでもそのまま使える。
+        """
+        if not self.carry_context or not (0 < static_prefix_len < len(system_prompt or "")):
+            return None
+        prefix = system_prompt[:static_prefix_len]
+        context = self._prefix_contexts.get(prefix)
+        if context is not None:
+            return context
+        payload: Dict[str, Any] = {"model": self.model, "prompt": prefix, "stream": False, "options": {"num_predict": 0}}
+        if self.keep_alive is not None:
+            payload["keep_alive"] = self.keep_alive
+        try:
+            resp = await client.post(f"{base_url or self.base_url}/api/generate", json=payload, timeout=self._request_timeout())
+            resp.raise_for_status()
+            context = resp.json().get("context")
+        except Exception as e:
+            if self.operation_log_filename:
+                write_operation_log(self.operation_log_filename, "WARNING", "OllamaClient", f"Prefix context priming failed: {e}")
+            return None
+        if not isinstance(context, list):
+            return None
+        if len(self._prefix_contexts) >= _MAX_PREFIX_CONTEXTS:
+            self._prefix_contexts.clear()
+        self._prefix_contexts[prefix] = context
+        return context
+
+    @staticmethod
+    def _response_text(data: Dict[str, Any]) -> str:
+        # /api/chat は message.content、/api/generate は response
+        message = data.get("message")
+        if isinstance(message, dict):
+            return str(message.get("content") or "")
+        return str(data.get("response") or "")
+
+    def _request_timeout(self) -> httpx.Timeout:
+        """呼び出し元の期限（llm_deadline）までの残り時間を HTTP タイムアウトにする（期限なしなら既定値）。"""
+        return httpx.Timeout(max(0.1, remaining_time(deadline_settings()["request_timeout_sec"])))
+
+    @staticmethod
+    def _is_retryable(error: BaseException) -> bool:
+        if isinstance(error, httpx.HTTPStatusError):
+            return error.response.status_code >= 500
+        return isinstance(error, httpx.TransportError)
+
+    def _note_failure(self, ep: Endpoint, error: BaseException, tried: List[str]) -> None:
+        """接続エラー/タイムアウト/5xx ならサーキットブレーカーに失敗を数え、試行済みに加える。"""
+        if not self._is_retryable(error):
+            return
+        self.pool.record_failure(ep)
+        if ep.url not in tried:
+            tried.append(ep.url)
+        # サーキットが開いたら、遮断時間明けの復帰確認は readiness_checker に任せる
+        self.pool.schedule_probe(ep, self.model, self.operation_log_filename)
+
+    def _should_failover(self, error: Exception, tried: List[str]) -> bool:
+        """再試行できる失敗で、未試行のエンドポイントが残っていれば True。"""
+        if not self._is_retryable(error) or not tried or len(tried) >= len(self.pool):
+            return False
+        LLM_ENDPOINT_FAILOVERS.inc(endpoint=tried[-1])
+        if self.operation_log_filename:
+            write_operation_log(self.operation_log_filename, "WARNING", "OllamaClient", f"Endpoint {tried[-1]} failed ({error!r}); failing over.")
+        return True
+
+    def _hedge_delay(self, ep: Endpoint, kind: str) -> Optional[float]:
+        """ep の応答がこの秒数を過ぎても来なければ別エンドポイントへ複製を送る（ヘッジしないなら None）。"""
+        if len(self.pool) < 2:
+            return None
+        hs = hedge_settings()
+        if not hs["enabled"]:
+            return None
+        q = self.pool.latency_quantile(ep, kind, float(hs["quantile"]), int(hs["min_samples"]))
+        if q is None:
+            return None
+        delay = max(float(hs["min_delay_sec"]), q)
+        left = remaining_time()
+        # 期限までに複製の応答が返る見込みが無ければ送らない
+        if left is not None and left <= delay:
+            return None
+        return delay
+
+    async def _race(
+        self,
+        tried: List[str],
+        kind: str,
+        start: Callable[[Endpoint], Awaitable[Any]],
+        discard: Optional[Callable[[Any], Awaitable[None]]] = None,
+    ) -> Tuple[Endpoint, Any]:
+        """
+        振り分け先で start(ep) を実行し、その分位点レイテンシを過ぎても終わらなければ別エンドポイントでも実行して、
+        先に成功した方を (エンドポイント, 結果) で返す。負けた方はキャンセルし、成功済みの結果は discard に渡す。
+        勝者以外のエンドポイントの処理中件数はここで戻す（勝者分は呼び出し側が pool.release する）。
+        """
+        primary = self.pool.pick(self.balance, exclude=tried)
+        _record_endpoint(primary.url)
+        tasks: Dict[asyncio.Future, Endpoint] = {asyncio.ensure_future(start(primary)): primary}
+        winner: Optional[asyncio.Future] = None
+        first_error: Optional[BaseException] = None
+        try:
+            delay = self._hedge_delay(primary, kind)
+            if delay is not None:
+                done, _ = await asyncio.wait(set(tasks), timeout=delay)
+                if not done:
+                    backup = self.pool.pick(self.balance, exclude=[*tried, primary.url], strict=True)
+                    if backup is not None:
+                        stats = llm_call_stats.get()
+                        if stats is not None:
+                            stats["hedged"] = True
+                        tasks[asyncio.ensure_future(start(backup))] = backup
+            pending = set(tasks)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled():
+                        continue
+                    error = task.exception()
+                    if error is None:
+                        winner = task
+                        break
+                    self._note_failure(tasks[task], error, tried)
+                    first_error = first_error or error
+                if winner is not None:
+                    break
+            if winner is None:
+                raise first_error or RuntimeError("no endpoint attempted")
+            ep = tasks[winner]
+            _record_endpoint(ep.url)
+            if len(tasks) > 1:
+                LLM_HEDGED_REQUESTS.inc(winner="primary" if ep is primary else "backup")
+            return ep, winner.result()
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            for task, ep in tasks.items():
+                if task is winner:
+                    continue
+                self.pool.release(ep)
+                if discard is not None and not task.cancelled() and task.exception() is None:
+                    await discard(task.result())
+
+    async def _invoke_at(self, ep: Endpoint, system_prompt: str, user_message: str, stop_policy: Optional[StopPolicy], static_prefix_len: int) -> str:
+        # プロセス共通の接続プールを使い、ターンごとのTCPハンドシェイクを避ける
+        client = get_http_client(ep.url)
+        # バックエンドごとの同時実行枠を優先度順に確保してから送る
+        async with backend_slot(ep.url) as waited:
+            _record_scheduler_wait(waited)
+            context = await self._prefix_context(client, system_prompt, static_prefix_len, ep.url)
+            payload = self._build_payload(system_prompt, user_message, False, stop_policy, static_prefix_len, context)
+            _mark_call("sent_at")
+            started = time.perf_counter()
+            resp = await client.post(self._url_for(ep.url), json=payload, timeout=self._request_timeout())
+            resp.raise_for_status()
+            data = resp.json()
+            self.pool.record_success(ep, time.perf_counter() - started, "invoke")
+            _record_ollama_done(data)
+            return self._response_text(data).strip()
+
+    async def ainvoke(self, system_prompt: str, user_message: str, stop_policy: Optional[StopPolicy] = None, static_prefix_len: int = 0) -> str:
+        # 文数/文字数などクライアント側判定が必要な場合はストリームで受け、条件成立時に打ち切る
+        if stop_policy and stop_policy.needs_client_side:
+            parts = [delta async for delta in self.astream(system_prompt, user_message, stop_policy, static_prefix_len)]
+            return "".join(parts).strip()
+        tried: List[str] = []
+        while True:
             try:
-                resp = await client.post(url, json=payload)
-                resp.raise_for_status()
-                data = resp.json()
-                return str(data.get("response", "")).strip()
+                ep, text = await self._race(
+                    tried, "invoke", lambda e: self._invoke_at(e, system_prompt, user_message, stop_policy, static_prefix_len)
+                )
+                self.pool.release(ep)
+                return text
             except Exception as e:
+                if self._should_failover(e, tried):
+                    continue
                 if self.operation_log_filename:
                     write_operation_log(self.operation_log_filename, "ERROR", "OllamaClient", f"Invocation failed: {e}")
                 raise
 
+    async def _stream_at(self, ep: Endpoint, system_prompt: str, user_message: str, stop_policy: Optional[StopPolicy], static_prefix_len: int) -> AsyncIterator[str]:
+        client = get_http_client(ep.url)
+        text = ""
+        # 枠は応答を読み終える（または打ち切られる）まで保持する
+        async with backend_slot(ep.url) as waited:
+            _record_scheduler_wait(waited)
+            context = await self._prefix_context(client, system_prompt, static_prefix_len, ep.url)
+            payload = self._build_payload(system_prompt, user_message, True, stop_policy, static_prefix_len, context)
+            _mark_call("sent_at")
+            started = time.perf_counter()
+            async with client.stream("POST", self._url_for(ep.url), json=payload, timeout=self._request_timeout()) as resp:
+                resp.raise_for_status()
+                async for line in resp.aiter_lines():
+                    if not line.strip():
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise RuntimeError(str(data.get("error")))
+                    delta = self._response_text(data)
+                    if delta:
+                        _mark_call("first_token_at")
+                        if not text:
+                            # ストリームは最初のトークンまでの時間で振り分け/ヘッジを判断する
+                            self.pool.record_success(ep, time.perf_counter() - started, "ttft")
+                        yield delta
+                        text += delta
+                        if stop_policy and stop_policy.needs_client_side and stop_policy.is_satisfied(text):
+                            break
+                    if data.get("done"):
+                        _record_ollama_done(data)
+                        break
+
+    async def _open_stream(self, ep: Endpoint, *args: Any) -> Tuple[AsyncIterator[str], Optional[str]]:
+        """ストリームを開き、最初の差分まで読み進めて (ストリーム, 最初の差分) を返す（空応答なら None）。"""
+        stream = self._stream_at(ep, *args)
+        try:
+            return stream, await stream.__anext__()
+        except StopAsyncIteration:
+            return stream, None
+        except BaseException:
+            await stream.aclose()
+            raise
+
+    @staticmethod
+    async def _close_opened(opened: Tuple[AsyncIterator[str], Optional[str]]) -> None:
+        await opened[0].aclose()
+
+    async def astream(self, system_prompt: str, user_message: str, stop_policy: Optional[StopPolicy] = None, static_prefix_len: int = 0) -> AsyncIterator[str]:
+        """
+        /api/generate（または /api/chat）を stream=True で呼び、トークン差分を逐次 yield する。
+        stop_policy の条件を満たすか、呼び出し側が途中で反復をやめる（aclose）とレスポンスが閉じられ、
+        サーバ側の生成も打ち切られる。最初のトークンを返す前の失敗だけは別エンドポイントで再試行し、
+        最初のトークンが分位点レイテンシを過ぎても来なければ別エンドポイントへも送って早い方を使う。
+        """
+        tried: List[str] = []
+        while True:
+            try:
+                ep, (stream, first) = await self._race(
+                    tried, "ttft",
+                    lambda e: self._open_stream(e, system_prompt, user_message, stop_policy, static_prefix_len),
+                    self._close_opened,
+                )
+            except Exception as e:
+                if self._should_failover(e, tried):
+                    continue
+                if self.operation_log_filename:
+                    write_operation_log(self.operation_log_filename, "ERROR", "OllamaClient", f"Streaming failed: {e}")
+                raise
+            try:
+                if first is not None:
+                    yield first
+                    async for delta in stream:
+                        yield delta
+                return
+            except Exception as e:
+                self._note_failure(ep, e, tried)
+                if self.operation_log_filename:
+                    write_operation_log(self.operation_log_filename, "ERROR", "OllamaClient", f"Streaming failed: {e}")
+                raise
+            finally:
+                await stream.aclose()
+                self.pool.release(ep)
+
 
 class AsyncOpenAIChatClient:
     def __init__(
@@ -65,8 +451,19 @@ class AsyncOpenAIChatClient:
         self.temperature = temperature
         self.operation_log_filename = operation_log_filename
 
-    async def ainvoke(self, system_prompt: str, user_message: str) -> str:
+    def _stop_kwargs(self, stop_policy: Optional[StopPolicy]) -> Dict[str, Any]:
+        # Chat Completions の stop は最大4件
+        if stop_policy and stop_policy.server_stop():
+            return {"stop": stop_policy.server_stop(4)}
+        return {}
+
+    async def ainvoke(self, system_prompt: str, user_message: str, stop_policy: Optional[StopPolicy] = None, static_prefix_len: int = 0) -> str:
+        # static_prefix_len は受け付けるだけ（OpenAI はプレフィックスの一致を自動でキャッシュする）
+        if stop_policy and stop_policy.needs_client_side:
+            parts = [delta async for delta in self.astream(system_prompt, user_message, stop_policy)]
+            return "".join(parts).strip()
         try:
+            _mark_call("sent_at")
             resp = await self.client.chat.completions.create(
                 model=self.model,
                 temperature=self.temperature,
@@ -74,6 +471,7 @@ class AsyncOpenAIChatClient:
                     {"role": "system", "content": system_prompt or ""},
                     {"role": "user", "content": user_message or ""},
                 ],
+                **self._stop_kwargs(stop_policy),
             )
             content = (resp.choices[0].message.content or "").strip()
             return content
@@ -82,6 +480,44 @@ class AsyncOpenAIChatClient:
                 write_operation_log(self.operation_log_filename, "ERROR", "OpenAIClient", f"Invocation failed: {e}")
             raise
 
+    async def astream(self, system_prompt: str, user_message: str, stop_policy: Optional[StopPolicy] = None, static_prefix_len: int = 0) -> AsyncIterator[str]:
+        """Chat Completions を stream=True で呼び、content の差分を逐次 yield する（stop_policy 成立で打ち切り）。"""
+        stream = None
+        text = ""
+        try:
+            _mark_call("sent_at")
+            stream = await self.client.chat.completions.create(
+                model=self.model,
+                temperature=self.temperature,
+                messages=[
+                    {"role": "system", "content": system_prompt or ""},
+                    {"role": "user", "content": user_message or ""},
+                ],
+                stream=True,
+                **self._stop_kwargs(stop_policy),
+            )
+            async for chunk in stream:
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content or ""
+                if delta:
+                    _mark_call("first_token_at")
+                    yield delta
+                    text += delta
+                    if stop_policy and stop_policy.needs_client_side and stop_policy.is_satisfied(text):
+                        break
+        except Exception as e:
+            if self.operation_log_filename:
+                write_operation_log(self.operation_log_filename, "ERROR", "OpenAIClient", f"Streaming failed: {e}")
+            raise
+        finally:
+            # 途中終了時もHTTPレスポンスを閉じて上流の生成を止める
+            if stream is not None:
+                try:
+                    await stream.close()
+                except Exception:
+                    pass
+
 
 class LLMFactory:
     def __init__(self, log_filename: str, operation_log_filename: str):
@@ -89,7 +525,14 @@ class LLMFactory:
         self.operation_log_filename = operation_log_filename
         write_operation_log(self.operation_log_filename, "INFO", "LLMFactory", "Initializing LLMFactory.")
 
-    def create_llm(self, provider: str, model: str, base_url: Optional[str] = None, gen_params: Optional[Dict[str, object]] = None):
+    def create_llm(
+        self,
+        provider: str,
+        model: str,
+        base_url: Optional[Union[str, Sequence[str]]] = None,
+        gen_params: Optional[Dict[str, object]] = None,
+        client_options: Optional[Mapping[str, Any]] = None,
+    ):
         write_operation_log(self.operation_log_filename, "INFO", "LLMFactory", f"Creating LLM with provider: {provider}, model: {model}")
         try:
             provider_l = (provider or "").lower()
@@ -106,9 +549,16 @@ class LLMFactory:
                     repeat_penalty=repeat_penalty,
                     num_predict=num_predict,
                     operation_log_filename=self.operation_log_filename,
+                    api=str((client_options or {}).get("api", "generate")).lower(),
+                    keep_alive=(client_options or {}).get("keep_alive"),
+                    carry_context=bool((client_options or {}).get("carry_context", False)),
+                    balance=str((client_options or {}).get("balance", "least_outstanding")).lower(),
                 )
             elif provider_l == "openai":
                 temperature = float((gen_params or {}).get("temperature", 0.7))
+                # OpenAI 互換 API は単一エンドポイントのみ（複数指定時は先頭を使う）
+                if base_url and not isinstance(base_url, str):
+                    base_url = next(iter(base_url), None)
                 return AsyncOpenAIChatClient(
                     model=model,
                     base_url=base_url,
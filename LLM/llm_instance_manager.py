@@ -1,22 +1,87 @@
-from typing import Dict, Optional
+import threading
+from typing import Any, Dict, Mapping, Optional, Sequence, Tuple, Union
 
 from llm_factory import LLMFactory
 from log_manager import write_operation_log
+from response_cache import CachedLLM, get_response_cache
+
+
+# プロセス共通の LLM クライアント。キー: (provider, model, base_url, 生成パラメータ, クライアント設定, 運用ログ, 応答キャッシュ有無)
+# 同じキーなら全セッションで同じインスタンス（と内部の接続プール）を使い回す。
+# 設定のホットリロードでキャラクター定義が変わるとキーも変わり、新しいインスタンスが作られる。
+_shared_instances: Dict[Tuple, Any] = {}
+_shared_lock = threading.Lock()
+
+
+def _frozen_items(values: Optional[Mapping[str, object]]) -> Tuple:
+    return tuple(sorted((str(k), repr(v)) for k, v in (values or {}).items()))
+
+
+def _instance_key(
+    provider: str,
+    model: str,
+    base_url: Optional[Union[str, Sequence[str]]],
+    gen_params: Optional[Mapping[str, object]],
+    operation_log_filename: str,
+    client_options: Optional[Mapping[str, object]] = None,
+    response_cache: bool = False,
+) -> Tuple:
+    endpoints = (base_url,) if isinstance(base_url, str) and base_url else tuple(base_url or ())
+    key = ((provider or "").lower(), model, endpoints, _frozen_items(gen_params), _frozen_items(client_options), operation_log_filename)
+    return key + ("cached",) if response_cache else key
+
+
+def shared_llm_count() -> int:
+    return len(_shared_instances)
+
+
+async def aclose_shared_llms() -> None:
+    """共有インスタンスが持つ独自クライアント（AsyncOpenAI など）を閉じる。アプリ終了時に呼ぶ。"""
+    with _shared_lock:
+        instances = list(_shared_instances.values())
+        _shared_instances.clear()
+    for llm in instances:
+        client = getattr(llm, "client", None)
+        close = getattr(client, "close", None)
+        if close is None:
+            continue
+        try:
+            await close()
+        except Exception:
+            pass
+
 
 class LLMInstanceManager:
     def __init__(self, log_filename: str, operation_log_filename: str):
         self.log_filename = log_filename
         self.operation_log_filename = operation_log_filename
-        self.llm_instances: Dict[str, any] = {}
         write_operation_log(self.operation_log_filename, "INFO", "LLMInstanceManager", "Initializing LLMInstanceManager.")
 
-    def get_llm(self, character_name: str, provider: str, model: str, llm_factory: LLMFactory, base_url: Optional[str] = None, gen_params: Optional[Dict[str, object]] = None):
-        if character_name not in self.llm_instances:
-            write_operation_log(self.operation_log_filename, "INFO", "LLMInstanceManager", f"Creating new LLM instance for {character_name}.")
-            llm = llm_factory.create_llm(provider, model, base_url, gen_params or {})
-            if llm:
-                self.llm_instances[character_name] = llm
-            else:
-                write_operation_log(self.operation_log_filename, "ERROR", "LLMInstanceManager", f"Failed to create LLM instance for {character_name}.")
-                return None
-        return self.llm_instances[character_name]
+    def get_llm(
+        self,
+        character_name: str,
+        provider: str,
+        model: str,
+        llm_factory: LLMFactory,
+        base_url: Optional[Union[str, Sequence[str]]] = None,
+        gen_params: Optional[Dict[str, object]] = None,
+        client_options: Optional[Mapping[str, object]] = None,
+        response_cache: bool = False,
+    ):
+        key = _instance_key(provider, model, base_url, gen_params, llm_factory.operation_log_filename, client_options, response_cache)
+        llm = _shared_instances.get(key)
+        if llm is not None:
+            return llm
+        with _shared_lock:
+            llm = _shared_instances.get(key)
+            if llm is None:
+                write_operation_log(self.operation_log_filename, "INFO", "LLMInstanceManager", f"Creating new LLM instance for {character_name}.")
+                llm = llm_factory.create_llm(provider, model, base_url, gen_params or {}, client_options)
+                if not llm:
+                    write_operation_log(self.operation_log_filename, "ERROR", "LLMInstanceManager", f"Failed to create LLM instance for {character_name}.")
+                    return None
+                if response_cache:
+                    # 決定的な呼び出しの応答をディスクから再利用する
+                    llm = CachedLLM(llm, get_response_cache(), provider, model, gen_params, client_options)
+                _shared_instances[key] = llm
+        return llm
@@ -0,0 +1,192 @@
+import asyncio
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional, Tuple
+
+import metrics
+from config_service import get_config
+from http_pool import _origin
+
+
+# LLM バックエンド（base_url の origin）ごとの同時実行数制御と優先度付きの公平キュー。
+# 優先度クラスは左ほど高い。同じクラスの中ではセッション（会話ログ等）ごとにラウンドロビンで割り当てる。
+PRIORITIES: Tuple[str, ...] = ("interactive", "kbcomplete", "special", "ingest")
+_RANK = {name: i for i, name in enumerate(PRIORITIES)}
+
+DEFAULT_SCHEDULER_SETTINGS: Dict[str, Any] = {
+    "max_concurrency": 2,       # バックエンドあたりの同時リクエスト数
+    "interactive_reserve": 1,   # interactive 専用に空けておく枠（バックグラウンドは max_concurrency - reserve まで）
+}
+
+# 呼び出し元が設定する優先度クラスとセッションキー（未設定なら interactive / "default"）
+llm_priority_var: ContextVar[Optional[str]] = ContextVar("llm_priority", default=None)
+llm_session_var: ContextVar[str] = ContextVar("llm_session", default="default")
+
+LLM_QUEUE_WAIT_SECONDS = metrics.REGISTRY.histogram(
+    "llm_queue_wait_seconds", "Time an LLM request waited for a backend slot.", ("backend", "priority"),
+)
+LLM_QUEUE_DEPTH = metrics.REGISTRY.gauge(
+    "llm_queue_depth", "LLM requests waiting for a backend slot.", ("backend", "priority"),
+)
+LLM_INFLIGHT = metrics.REGISTRY.gauge("llm_inflight_requests", "LLM requests holding a backend slot.", ("backend",))
+
+
+@contextmanager
+def llm_priority(name: str, only_if_unset: bool = False) -> Iterator[None]:
+    """この範囲で行う LLM 呼び出しの優先度クラスを設定する（only_if_unset なら呼び出し元の指定を優先）。"""
+    if name not in _RANK:
+        raise ValueError(f"unknown LLM priority: {name}")
+    if only_if_unset and llm_priority_var.get() is not None:
+        yield
+        return
+    token = llm_priority_var.set(name)
+    try:
+        yield
+    finally:
+        llm_priority_var.reset(token)
+
+
+@contextmanager
+def llm_session(key: str) -> Iterator[None]:
+    """この範囲で行う LLM 呼び出しを、公平キュー上のセッション key として扱う。"""
+    token = llm_session_var.set(key)
+    try:
+        yield
+    finally:
+        llm_session_var.reset(token)
+
+
+def current_priority() -> str:
+    return llm_priority_var.get() or PRIORITIES[0]
+
+
+class BackendScheduler:
+    """
+    1 バックエンド分のスロット管理。
+    空きが出たら「最上位の待ちクラス」→「そのクラスで次の順番のセッション」→「そのセッションの先頭」の順に割り当てる。
+    interactive 以外は interactive_reserve 分の枠を残して待つので、バックグラウンドが詰まっていても会話の待ちは増えない。
+    """
+
+    def __init__(self, backend: str, max_concurrency: int = 2, interactive_reserve: int = 1):
+        self.backend = backend
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.interactive_reserve = min(max(0, int(interactive_reserve)), self.max_concurrency - 1)
+        self.inflight = 0
+        # priority -> session -> 待ちの Future（OrderedDict の順がラウンドロビンの順）
+        self._waiters: Dict[str, "OrderedDict[str, Deque[asyncio.Future]]"] = {p: OrderedDict() for p in PRIORITIES}
+
+    def _limit_for(self, priority: str) -> int:
+        return self.max_concurrency if priority == PRIORITIES[0] else self.max_concurrency - self.interactive_reserve
+
+    def waiting(self, priority: Optional[str] = None) -> int:
+        classes = [priority] if priority else PRIORITIES
+        return sum(len(q) for p in classes for q in self._waiters[p].values())
+
+    def _has_higher_waiters(self, priority: str) -> bool:
+        return any(self._waiters[p] for p in PRIORITIES[:_RANK[priority]])
+
+    async def acquire(self, priority: str, session: str) -> None:
+        if priority not in _RANK:
+            priority = PRIORITIES[-1]
+        if self.inflight < self._limit_for(priority) and not self._has_higher_waiters(priority) and not self._waiters[priority]:
+            self.inflight += 1
+            LLM_INFLIGHT.set(self.inflight, backend=self.backend)
+            return
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        self._waiters[priority].setdefault(session, deque()).append(fut)
+        LLM_QUEUE_DEPTH.inc(backend=self.backend, priority=priority)
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # 割り当て済みだった枠は次の待ちへ回す
+                self.release()
+            else:
+                self._discard(priority, session, fut)
+            raise
+        finally:
+            LLM_QUEUE_DEPTH.dec(backend=self.backend, priority=priority)
+
+    def _discard(self, priority: str, session: str, fut: asyncio.Future) -> None:
+        queue = self._waiters[priority].get(session)
+        if queue is None:
+            return
+        try:
+            queue.remove(fut)
+        except ValueError:
+            pass
+        if not queue:
+            self._waiters[priority].pop(session, None)
+
+    def release(self) -> None:
+        self.inflight = max(0, self.inflight - 1)
+        self._dispatch()
+        LLM_INFLIGHT.set(self.inflight, backend=self.backend)
+
+    def _dispatch(self) -> None:
+        for priority in PRIORITIES:
+            sessions = self._waiters[priority]
+            while sessions and self.inflight < self._limit_for(priority):
+                session, queue = next(iter(sessions.items()))
+                fut = queue.popleft()
+                # 割り当てたセッションは末尾へ（同クラス内のラウンドロビン）
+                if queue:
+                    sessions.move_to_end(session)
+                else:
+                    del sessions[session]
+                if fut.done():
+                    continue
+                fut.set_result(None)
+                self.inflight += 1
+            if sessions:
+                # 上位クラスが待っている間は下位クラスへ割り当てない
+                return
+
+
+_schedulers: Dict[str, Tuple[BackendScheduler, Optional[asyncio.AbstractEventLoop]]] = {}
+
+
+def _scheduler_settings() -> Dict[str, Any]:
+    settings = dict(DEFAULT_SCHEDULER_SETTINGS)
+    try:
+        cfg = get_config().app.raw.get("llm_scheduler") or {}
+        settings.update({k: v for k, v in cfg.items() if k in DEFAULT_SCHEDULER_SETTINGS})
+    except Exception:
+        pass
+    return settings
+
+
+def get_scheduler(base_url: str) -> BackendScheduler:
+    """base_url の origin ごとの共有スケジューラ（イベントループが変わったら作り直す）。"""
+    key = _origin(base_url)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    entry = _schedulers.get(key)
+    if entry and (loop is None or entry[1] is loop):
+        return entry[0]
+    s = _scheduler_settings()
+    scheduler = BackendScheduler(key, s["max_concurrency"], s["interactive_reserve"])
+    _schedulers[key] = (scheduler, loop)
+    return scheduler
+
+
+@asynccontextmanager
+async def backend_slot(base_url: str) -> AsyncIterator[float]:
+    """
+    バックエンドの枠を確保してから本体を実行する。as で待ち時間（秒）を受け取れる（メトリクスにも記録）。
+    ストリーミングでは枠は応答を読み終える（または打ち切る）まで保持される。
+    """
+    scheduler = get_scheduler(base_url)
+    priority = current_priority()
+    started = time.perf_counter()
+    await scheduler.acquire(priority, llm_session_var.get())
+    waited = time.perf_counter() - started
+    LLM_QUEUE_WAIT_SECONDS.observe(waited, backend=scheduler.backend, priority=priority)
+    try:
+        yield waited
+    finally:
+        scheduler.release()
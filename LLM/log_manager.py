@@ -1,7 +1,15 @@
+import asyncio
+import atexit
+import json
+from collections import OrderedDict, deque
 from datetime import datetime
 import os
+import queue
 import re
-from typing import Optional
+import sys
+import threading
+import time
+from typing import Deque, Dict, List, Optional, TextIO, Tuple
 
 # 既定ディレクトリ
 DEFAULT_CONVERSATION_LOG_DIR = os.path.join("LLM", "logs")
@@ -25,45 +33,397 @@ def create_operation_log_filename(op_dir: Optional[str] = None) -> str:
     timestamp = datetime.now().strftime('%Y%m%d-%H%M%S')
     return os.path.join(target_dir, f"operation_{timestamp}.log")
 
+# USER/キャラクターの発言行のみを捕捉し、[System] 行は除外する
+_LOG_LINE_PATTERN = re.compile(r"\[.*?\] \[(?!System)(.*?)\] (.*)")
+_TAIL_BLOCK_SIZE = 8192
+
+
+class ConversationHistory:
+    """
+    1セッション分の会話履歴をメモリ上に保持する（ログファイルは追記専用の永続先）。
+    ログの物理行単位で直近 max_lines 行を保持し、従来の「ファイル末尾 max_lines 行を正規表現で解析」と同じ結果を返す。
+    """
+
+    def __init__(self, max_lines: int = 50) -> None:
+        # 各要素は (speaker, message)。発言として解釈できない行（[System] や継続行）は None
+        self._lines: Deque[Optional[Tuple[str, str]]] = deque(maxlen=max_lines)
+
+    def _ingest_line(self, line: str) -> None:
+        match = _LOG_LINE_PATTERN.match(line)
+        if match:
+            speaker, message = match.groups()
+            self._lines.append((speaker, message.strip()))
+        else:
+            self._lines.append(None)
+
+    def append_entry(self, entry: str) -> None:
+        """write_log が書き出した1件分（複数行になり得る）を取り込む。"""
+        for line in entry.splitlines():
+            self._ingest_line(line)
+
+    def records(self, max_lines: Optional[int] = None) -> List[Tuple[str, str]]:
+        lines = list(self._lines)
+        if max_lines is not None:
+            lines = lines[-max_lines:] if max_lines > 0 else []
+        return [rec for rec in lines if rec]
+
+    def format(self, max_lines: Optional[int] = None) -> str:
+        return "\n".join(f"{speaker}: {message}" for speaker, message in self.records(max_lines))
+
+    def reload_from_tail(self, filename: str) -> None:
+        """
+        クラッシュ復旧用: ファイル末尾からブロック単位で遡り、直近 max_lines 行だけを読み直す。
+        ファイル全体は読み込まない。
+        """
+        self._lines.clear()
+        max_lines = self._lines.maxlen or 0
+        flush_logs()
+        try:
+            with open(filename, 'rb') as f:
+                f.seek(0, os.SEEK_END)
+                pos = f.tell()
+                buf = b""
+                # 末尾の改行を除き、max_lines 行ぶんの区切りが見つかるまで遡る
+                while pos > 0 and buf.rstrip(b"\n").count(b"\n") < max_lines:
+                    step = min(_TAIL_BLOCK_SIZE, pos)
+                    pos -= step
+                    f.seek(pos)
+                    buf = f.read(step) + buf
+        except FileNotFoundError:
+            return
+        lines = buf.decode('utf-8', errors='ignore').splitlines()
+        if pos > 0 and lines:
+            # 先頭行はブロック境界で欠けている可能性があるため捨てる
+            lines = lines[1:]
+        for line in lines[-max_lines:] if max_lines else []:
+            self._ingest_line(line)
+
+
+_HISTORIES: Dict[str, ConversationHistory] = {}
+
+
+def get_conversation_history(filename: str, max_lines: int = 50) -> ConversationHistory:
+    """ログファイルに対応する履歴を返す。未生成ならファイル末尾から復元する。"""
+    history = _HISTORIES.get(filename)
+    if history is None:
+        history = ConversationHistory(max_lines)
+        history.reload_from_tail(filename)
+        _HISTORIES[filename] = history
+    return history
+
+
+async def aload_conversation_history(filename: str, max_lines: int = 50) -> ConversationHistory:
+    """
+    get_conversation_history の非同期版。未生成のときの復元（キューのフラッシュ待ちとファイル読み込み）を
+    別スレッドで行い、イベントループを止めない。セッション開始時に呼んでおけば以降の参照はメモリだけで済む。
+    """
+    history = _HISTORIES.get(filename)
+    if history is not None:
+        return history
+    return await asyncio.to_thread(get_conversation_history, filename, max_lines)
+
+
+def release_conversation_history(filename: str) -> None:
+    """セッション終了時に履歴をメモリから解放する。"""
+    _HISTORIES.pop(filename, None)
+
+
+# ---- バッファ付き非同期ライタ ----
+# ログ行はキューに積むだけで返し、専用スレッドがファイルごとに 1 ハンドルを保持してまとめ書きする。
+# フラッシュはサイズ/時間のしきい値で行い、終了時（shutdown_logging / atexit）にキューを排出する。
+
+_LEVELS: Dict[str, int] = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40, "CRITICAL": 50}
+
+DEFAULT_FLUSH_INTERVAL_SEC = 0.5
+DEFAULT_FLUSH_BYTES = 64 * 1024
+DEFAULT_MAX_OPEN_FILES = 32
+_MAX_BATCH = 512
+
+_operation_level = _LEVELS["INFO"]
+
+
+class _BufferedLogWriter:
+    """ログ行をバックグラウンドスレッドで書き出す。書き込み順はキュー投入順（= 呼び出し順）を保つ。"""
+
+    def __init__(
+        self,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL_SEC,
+        flush_bytes: int = DEFAULT_FLUSH_BYTES,
+        max_open_files: int = DEFAULT_MAX_OPEN_FILES,
+    ):
+        self.flush_interval = flush_interval
+        self.flush_bytes = flush_bytes
+        self.max_open_files = max_open_files
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+        self._stopped = False
+        # 以下はライタスレッドのみが触る
+        self._files: "OrderedDict[str, TextIO]" = OrderedDict()
+        self._pending_bytes = 0
+        self._last_flush = time.monotonic()
+        self._reported_errors: set = set()
+
+    # ---- 呼び出し側 API ----
+    def submit(self, filename: str, line: str) -> None:
+        if self._stopped:
+            _write_direct(filename, line)
+            return
+        self._ensure_started()
+        self._queue.put(("write", filename, line))
+
+    def flush(self, timeout: float = 5.0) -> None:
+        """投入済みの行をすべてディスクへ書き出すまで待つ。"""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(("flush", None, done))
+        done.wait(timeout)
+
+    def close_file(self, filename: str) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(("close", filename, None))
+
+    def shutdown(self, timeout: float = 5.0) -> None:
+        """キューを排出してハンドルを閉じ、スレッドを止める。以降の書き込みは同期書き込みになる。"""
+        with self._start_lock:
+            self._stopped = True
+            thread = self._thread
+        if thread is None or not thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(("stop", None, done))
+        done.wait(timeout)
+        thread.join(timeout)
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._stopped or (self._thread is not None and self._thread.is_alive()):
+                return
+            self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self._thread.start()
+
+    # ---- ライタスレッド ----
+    def _run(self) -> None:
+        while True:
+            wait = max(0.0, self.flush_interval - (time.monotonic() - self._last_flush))
+            try:
+                item = self._queue.get(timeout=wait if self._pending_bytes else None)
+            except queue.Empty:
+                self._flush_all()
+                continue
+            batch = [item]
+            while len(batch) < _MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stop_event = None
+            for op, filename, payload in batch:
+                if op == "write":
+                    self._write(filename, payload)
+                elif op == "flush":
+                    self._flush_all()
+                    payload.set()
+                elif op == "close":
+                    self._close(filename)
+                elif op == "stop":
+                    stop_event = payload
+            if stop_event is not None:
+                # stop 以降に積まれた行も取りこぼさない
+                while True:
+                    try:
+                        op, filename, payload = self._queue.get_nowait()
+                    except queue.Empty:
+                        break
+                    if op == "write":
+                        self._write(filename, payload)
+                    elif op in ("flush", "stop"):
+                        payload.set()
+                for name in list(self._files):
+                    self._close(name)
+                stop_event.set()
+                return
+            if (self._pending_bytes >= self.flush_bytes
+                    or time.monotonic() - self._last_flush >= self.flush_interval):
+                self._flush_all()
+
+    def _handle(self, filename: str) -> Optional[TextIO]:
+        f = self._files.get(filename)
+        if f is not None:
+            self._files.move_to_end(filename)
+            return f
+        try:
+            f = open(filename, 'a', encoding='utf-8')
+        except OSError as e:
+            if filename not in self._reported_errors:
+                self._reported_errors.add(filename)
+                print(f"[log_manager] cannot open log file {filename}: {e}", file=sys.stderr)
+            return None
+        self._files[filename] = f
+        while len(self._files) > self.max_open_files:
+            oldest = next(iter(self._files))
+            self._close(oldest)
+        return f
+
+    def _write(self, filename: str, line: str) -> None:
+        f = self._handle(filename)
+        if f is None:
+            return
+        try:
+            f.write(line)
+            self._pending_bytes += len(line)
+        except OSError:
+            self._close(filename)
+
+    def _flush_all(self) -> None:
+        for f in self._files.values():
+            try:
+                f.flush()
+            except OSError:
+                pass
+        self._pending_bytes = 0
+        self._last_flush = time.monotonic()
+
+    def _close(self, filename: str) -> None:
+        f = self._files.pop(filename, None)
+        if f is not None:
+            try:
+                f.close()
+            except OSError:
+                pass
+
+
+def _write_direct(filename: str, line: str) -> None:
+    with open(filename, 'a', encoding='utf-8') as f:
+        f.write(line)
+
+
+_writer = _BufferedLogWriter()
+
+
+def configure_logging(
+    operation_level: Optional[str] = None,
+    flush_interval_sec: Optional[float] = None,
+    flush_bytes: Optional[int] = None,
+) -> None:
+    """config.yaml の logs セクション相当の値でロガーを設定する（未指定の項目は変更しない）。"""
+    global _operation_level
+    if operation_level:
+        _operation_level = _LEVELS.get(str(operation_level).upper(), _operation_level)
+    if flush_interval_sec is not None:
+        _writer.flush_interval = max(0.0, float(flush_interval_sec))
+    if flush_bytes is not None:
+        _writer.flush_bytes = max(0, int(flush_bytes))
+
+
+def is_operation_level_enabled(level: str) -> bool:
+    return _LEVELS.get(level, _LEVELS["INFO"]) >= _operation_level
+
+
+def flush_logs(timeout: float = 5.0) -> None:
+    """キュー済みのログ行をファイルへ書き出すまで待つ（ファイルを読む前に呼ぶ）。"""
+    _writer.flush(timeout)
+
+
+async def aflush_logs(timeout: float = 5.0) -> None:
+    """flush_logs の非同期版（書き出し待ちは別スレッドで行い、イベントループを止めない）。"""
+    await asyncio.to_thread(flush_logs, timeout)
+
+
+def close_log_file(filename: str) -> None:
+    """セッション終了時などに、ライタが保持しているファイルハンドルを閉じる。"""
+    _writer.close_file(filename)
+
+
+def shutdown_logging(timeout: float = 5.0) -> None:
+    """キューを排出してライタを停止する。アプリ終了時に呼ぶ（atexit にも登録済み）。"""
+    _writer.shutdown(timeout)
+
+
+atexit.register(shutdown_logging)
+
+
 def write_log(filename, speaker, message):
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(filename, 'a', encoding='utf-8') as f:
-        f.write(f"[{timestamp}] [{speaker}] {message}\n")
+    entry = f"[{timestamp}] [{speaker}] {message}"
+    _writer.submit(filename, entry + "\n")
+    history = _HISTORIES.get(filename)
+    if history is not None:
+        history.append_entry(entry)
 
-def write_operation_log(filename, level, module, message):
+def write_operation_log(filename, level, module, message, *args):
+    """
+    運用ログを 1 行キューに積む。
+    レベル判定を整形より先に行うため、無効なレベルの呼び出しは %-引数の整形も行わない。
+    """
+    if _LEVELS.get(level, _LEVELS["INFO"]) < _operation_level:
+        return
+    if args:
+        message = message % args
     timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    with open(filename, 'a', encoding='utf-8') as f:
-        f.write(f"[{timestamp}] [{level}] [{module}] {message}\n")
+    _writer.submit(filename, f"[{timestamp}] [{level}] [{module}] {message}\n")
+
+# ---- 構造化ログ（JSONL） ----
+# 運用ログファイル名をキーに、隣接する .jsonl へ 1 イベント 1 行で書き出す（有効化したときのみ）。
+_STRUCTURED_SINKS: Dict[str, str] = {}
+
+
+def structured_log_filename(operation_log_filename: str) -> str:
+    root, _ext = os.path.splitext(operation_log_filename)
+    return root + ".jsonl"
+
+
+def enable_structured_log(operation_log_filename: str, path: Optional[str] = None) -> str:
+    """operation_log_filename に対応する JSONL シンクを有効化し、その出力先を返す。"""
+    target = path or structured_log_filename(operation_log_filename)
+    _STRUCTURED_SINKS[operation_log_filename] = target
+    return target
+
+
+def disable_structured_log(operation_log_filename: str) -> None:
+    target = _STRUCTURED_SINKS.pop(operation_log_filename, None)
+    if target:
+        close_log_file(target)
+
+
+def is_structured_log_enabled(operation_log_filename: Optional[str]) -> bool:
+    return bool(operation_log_filename) and operation_log_filename in _STRUCTURED_SINKS
+
+
+def write_structured_log(operation_log_filename, event, **fields):
+    """
+    構造化イベントを JSONL シンクへ積む（未有効化なら何もしない）。
+    None のフィールドは出力しない。ts はローカル時刻の ISO 形式、epoch は UNIX 秒。
+    """
+    target = _STRUCTURED_SINKS.get(operation_log_filename)
+    if target is None:
+        return
+    now = time.time()
+    record = {
+        "ts": datetime.fromtimestamp(now).isoformat(timespec="milliseconds"),
+        "epoch": round(now, 3),
+        "event": event,
+    }
+    record.update({k: v for k, v in fields.items() if v is not None})
+    _writer.submit(target, json.dumps(record, ensure_ascii=False, default=str) + "\n")
 
 def get_formatted_conversation_history(filename, max_lines=50):
-    """Reads the log file and returns a clean, formatted conversation history for the LLM."""
-    try:
-        with open(filename, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        
-        # Keep only the most recent lines
-        recent_lines = lines[-max_lines:]
-        
-        formatted_history = []
-        # Regex to capture only USER or character messages, ignoring [System]
-        log_pattern = re.compile(r"\[.*?\] \[(?!System)(.*?)\] (.*)")
-        
-        for line in recent_lines:
-            match = log_pattern.match(line)
-            if match:
-                speaker, message = match.groups()
-                # Simple format: Speaker: Message
-                formatted_history.append(f"{speaker}: {message.strip()}")
-        
-        return "\n".join(formatted_history)
-        
-    except FileNotFoundError:
-        return ""
+    """Returns a clean, formatted conversation history for the LLM from the in-memory session history."""
+    return get_conversation_history(filename, max_lines).format(max_lines)
 
 # Keep the old read_log for other purposes if needed, or remove if unused.
 def read_log(filename):
+    flush_logs()
     try:
         with open(filename, 'r', encoding='utf-8') as f:
             return f.read()
     except FileNotFoundError:
         return ""
+
+
+async def aread_log(filename):
+    """read_log の非同期版（フラッシュ待ちと読み込みを別スレッドで行う）。"""
+    return await asyncio.to_thread(read_log, filename)
@@ -5,7 +5,8 @@ import sys
 import sqlite3
 import importlib
 from typing import List, Optional
-from fastapi import FastAPI, WebSocket, Body, Query, Path
+import time
+from fastapi import FastAPI, WebSocket, Body, Query, Path, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import RedirectResponse, FileResponse, Response
@@ -15,12 +16,14 @@ sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 import character_manager as cm
 import websocket_manager as wm
 import log_manager as lm
-import yaml
-from readiness_checker import ensure_ollama_model_ready_sync
+from config_service import get_config
+from endpoint_pool import ensure_character_endpoints_ready_sync
+from http_pool import aclose_http_clients
+from llm_instance_manager import aclose_shared_llms
+import metrics
 from ingest_mode import run_ingest_mode  # type: ignore
 import json
 from web_search import search_text
-import yaml
 import sqlite3
 
 app = FastAPI()
@@ -53,6 +56,23 @@ operation_log_dir = None
 _last_ingest_result_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "logs", "last_ingest.json")
 _stop_flags: dict[str, bool] = {}
 
+# ---- KB API のレイテンシ計測（/api/db/* のみ。ラベルはルートのパステンプレート） ----
+@app.middleware("http")
+async def kb_query_metrics_middleware(request: Request, call_next):
+    if not request.url.path.startswith("/api/db/"):
+        return await call_next(request)
+    started = time.perf_counter()
+    try:
+        return await call_next(request)
+    finally:
+        route = request.scope.get("route")
+        endpoint = getattr(route, "path", None) or request.url.path
+        metrics.KB_QUERY_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    return Response(content=metrics.render_metrics(), media_type=metrics.CONTENT_TYPE)
+
 # ---- Favicon handler to avoid 404 spam ----
 @app.get("/favicon.ico")
 async def favicon_handler():
@@ -63,24 +83,9 @@ async def favicon_handler():
     return Response(status_code=204)
 
 def _resolve_kb_db_path() -> str:
-    try:
-        kb_cfg_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'KB', 'config.yaml')
-        root_dir = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
-        kb_dir = os.path.join(root_dir, 'KB')
-        with open(kb_cfg_path, 'r', encoding='utf-8') as f:
-            kb_cfg = yaml.safe_load(f) or {}
-        db_path = kb_cfg.get('db_path') or 'media.db'
-        if not os.path.isabs(db_path):
-            # ルール: サブディレクトリを含む場合はプロジェクトルート基準、
-            # 単純ファイル名の場合は KB ディレクトリ基準
-            if ("/" in db_path) or ("\\" in db_path):
-                db_path = os.path.abspath(os.path.join(root_dir, db_path))
-            else:
-                db_path = os.path.abspath(os.path.join(kb_dir, db_path))
-        return db_path
-    except Exception:
-        # フォールバック: 既定の KB/DB/media.db（絶対化）
-        return os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'KB', 'DB', 'media.db'))
+    # KB/config.yaml の db_path（設定サービスで絶対パスに解決済み）
+    return get_config().kb.db_path
+
 
 @app.get("/api/db/path")
 async def api_db_path():
@@ -100,32 +105,34 @@ async def startup_event():
     global operation_log_filename, conversation_log_dir, operation_log_dir
 
     # 設定からログ出力先を読み込み（存在しなければ既定値）
+    cfg = get_config()
+    logs_cfg = cfg.app.logs
+    conversation_log_dir = logs_cfg.conversation_dir
+    operation_log_dir = logs_cfg.operation_dir
+    structured_log = logs_cfg.structured
     try:
-        config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.yaml')
-        with open(config_path, 'r', encoding='utf-8') as f:
-            cfg = yaml.safe_load(f) or {}
-        logs_cfg = cfg.get('logs', {}) if isinstance(cfg, dict) else {}
-        conversation_log_dir = logs_cfg.get('conversation_dir')
-        operation_log_dir = logs_cfg.get('operation_dir')
-    except Exception:
-        conversation_log_dir = None
-        operation_log_dir = None
+        lm.configure_logging(
+            operation_level=logs_cfg.operation_level,
+            flush_interval_sec=logs_cfg.flush_interval_sec,
+            flush_bytes=logs_cfg.flush_bytes,
+        )
+    except (TypeError, ValueError) as e:
+        print(f"Warning: Invalid logs settings in config.yaml: {e}")
 
     # operation_dir が未設定なら conversation_dir と同じ場所を使用
     effective_operation_dir = operation_log_dir or conversation_log_dir
     operation_log_filename = lm.create_operation_log_filename(effective_operation_dir)
+    if structured_log:
+        # LLM 呼び出し等のイベントを operation_*.jsonl へも出力（oplog_query.py で集計）
+        lm.enable_structured_log(operation_log_filename)
     lm.write_operation_log(operation_log_filename, "INFO", "Main", "Application startup initiated.")
     print(f"Operation log file: {operation_log_filename}")
 
     # すべての Ollama モデルをサーバ起動時にウォームアップ（設定でON/OFFと同期/非同期を切替）
     try:
-        config_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'config.yaml')
-        with open(config_path, 'r', encoding='utf-8') as f:
-            cfg = yaml.safe_load(f) or {}
-        characters = cfg.get('characters', [])
-        startup_cfg = (cfg.get('startup') or {}) if isinstance(cfg, dict) else {}
-        preload_models: bool = bool(startup_cfg.get('preload_models', True))
-        preload_blocking: bool = bool(startup_cfg.get('preload_blocking', True))
+        characters = cfg.app.characters
+        preload_models: bool = cfg.app.startup.preload_models
+        preload_blocking: bool = cfg.app.startup.preload_blocking
 
         async def _preload_async():
             try:
@@ -134,9 +141,7 @@ async def startup_event():
                 def _work():
                     for char in characters:
                         if str(char.get('provider', '')).lower() == 'ollama':
-                            base_url = char.get('base_url', 'http://localhost:11434')
-                            model = char.get('model')
-                            ensure_ollama_model_ready_sync(base_url, model, operation_log_filename)
+                            ensure_character_endpoints_ready_sync(char, operation_log_filename)
                 await loop.run_in_executor(None, _work)
                 lm.write_operation_log(operation_log_filename, "INFO", "Main", "All Ollama models preloaded (async mode).")
             except Exception as e:
@@ -146,9 +151,7 @@ async def startup_event():
             if preload_blocking:
                 for char in characters:
                     if str(char.get('provider', '')).lower() == 'ollama':
-                        base_url = char.get('base_url', 'http://localhost:11434')
-                        model = char.get('model')
-                        ensure_ollama_model_ready_sync(base_url, model, operation_log_filename)
+                        ensure_character_endpoints_ready_sync(char, operation_log_filename)
                 lm.write_operation_log(operation_log_filename, "INFO", "Main", "All Ollama models preloaded (blocking mode).")
             else:
                 asyncio.create_task(_preload_async())
@@ -160,7 +163,15 @@ async def startup_event():
 
 @app.on_event("shutdown")
 async def shutdown_event():
+    # 共有LLMクライアントとHTTP接続プールを閉じる（keep-alive 接続を明示的に解放）
+    try:
+        await aclose_shared_llms()
+        await aclose_http_clients()
+    except Exception as e:
+        lm.write_operation_log(operation_log_filename, "WARNING", "Main", f"HTTP pool shutdown failed: {e}")
     lm.write_operation_log(operation_log_filename, "INFO", "Main", "Application shutdown completed.")
+    # バッファ済みのログ行を書き出してライタを停止
+    lm.shutdown_logging()
 
 @app.get("/")
 async def root():
@@ -180,15 +191,7 @@ async def api_ingest(payload: dict = Body(...)):
     strict = bool(payload.get("strict") or False)
     topic_type = str(payload.get("topicType") or "unknown").strip().lower()
     # KB設定から最大自動巡回数を取得（無ければ3）
-    # KB設定からオート継続回数
-    try:
-        kb_cfg_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'KB', 'config.yaml')
-        with open(kb_cfg_path, 'r', encoding='utf-8') as f:
-            kb_cfg = yaml.safe_load(f) or {}
-        v = kb_cfg.get('max_auto_next') if isinstance(kb_cfg, dict) else None
-    except Exception:
-        v = None
-    auto_next_max = v if isinstance(v, int) and v >= 0 else 3
+    auto_next_max = get_config().kb.max_auto_next
     lm.write_operation_log(operation_log_filename, "INFO", "API", f"Ingest requested: topic={topic}, domain={domain}, rounds={rounds}, strict={strict}")
     # ログをフロントへ逐次返すための簡易バッファ
     logs: list[str] = []
@@ -257,7 +260,7 @@ async def api_kb_cleanup(payload: dict = Body(...)):
 # ==== KB Query API ====
 
 def _default_db_path() -> str:
-    # KB/config.yaml の db_path（相対なら KB 直下基準）を解決
+    # KB/config.yaml の db_path（設定サービスで解決済み）
     return _resolve_kb_db_path()
 
 def _open_db(db_path: Optional[str] = None) -> sqlite3.Connection:
@@ -392,6 +395,7 @@ async def ws_endpoint(websocket: WebSocket):
     lm.write_operation_log(operation_log_filename, "INFO", "WebSocket", "New WebSocket connection established.")
     await websocket.accept()
     lm.write_operation_log(operation_log_filename, "INFO", "WebSocket", "WebSocket connection accepted.")
+    metrics.WS_SESSIONS_OPEN.inc()
     try:
         characters = [c for c in manager.list_characters() if not c.get("hidden")]
         config_data = [{
@@ -413,6 +417,7 @@ async def ws_endpoint(websocket: WebSocket):
         lm.write_operation_log(operation_log_filename, "ERROR", "WebSocket", f"Error in WebSocket endpoint: {e}\n{error_details}")
         print(f"WebSocket error: {e} (Log file: {log_filename})")
     finally:
+        metrics.WS_SESSIONS_OPEN.dec()
         lm.write_operation_log(operation_log_filename, "INFO", "WebSocket", "WebSocket connection closed.")
 
 if __name__ == "__main__":
@@ -6,7 +6,7 @@ from typing import Any, Dict, List, Optional
 
 from typing import Any
 
-from log_manager import read_log, write_operation_log
+from log_manager import aread_log, write_operation_log
 
 
 _SESSION_THREAD_COUNTER: Dict[str, int] = {}
@@ -54,7 +54,7 @@ async def persist_thread_from_log(
         session_id = _derive_session_id_from_log(log_filename)
         thread_id = _next_thread_id_for_session(session_id)
 
-        full_log_text = read_log(log_filename)
+        full_log_text = await aread_log(log_filename)
         if not full_log_text:
             write_operation_log(operation_log_filename, "WARNING", "MemoryManager", "No log content to persist.")
             return
@@ -0,0 +1,256 @@
+import bisect
+import math
+import threading
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+
+# Prometheus テキスト形式（0.0.4）で出力する軽量メトリクス。
+# 記録側はラベル値のタプルをキーにした dict 更新のみで、整形は /metrics の取得時にだけ行う。
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 秒単位レイテンシ向けの既定バケット
+DEFAULT_LATENCY_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = [f'{n}="{_escape_label(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, object]) -> Tuple[str, ...]:
+        try:
+            key = tuple(str(labels[n]) for n in self.labelnames)
+        except KeyError:
+            key = None
+        if key is None or len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name}: expected labels {self.labelnames}, got {tuple(labels)}")
+        return key
+
+    def labels(self, **labels: object) -> "_Child":
+        """ラベルを確定した子を返す（ループ内など同じラベルで何度も記録する場合に使う）。"""
+        return _Child(self, self._key(labels))
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+    def _samples(self) -> Iterable[str]:
+        return []
+
+
+class _Child:
+    __slots__ = ("_metric", "_key")
+
+    def __init__(self, metric: _Metric, key: Tuple[str, ...]):
+        self._metric = metric
+        self._key = key
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._metric._inc(self._key, amount)  # type: ignore[attr-defined]
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._metric._inc(self._key, -amount)  # type: ignore[attr-defined]
+
+    def set(self, value: float) -> None:
+        self._metric._set(self._key, value)  # type: ignore[attr-defined]
+
+    def observe(self, value: float) -> None:
+        self._metric._observe(self._key, value)  # type: ignore[attr-defined]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: object) -> None:
+        self._inc(self._key(labels), amount)
+
+    def _inc(self, key: Tuple[str, ...], amount: float) -> None:
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: object) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        for key, v in items:
+            yield f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(v)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels: object) -> None:
+        self._inc(self._key(labels), -amount)
+
+    def set(self, value: float, **labels: object) -> None:
+        self._set(self._key(labels), value)
+
+    def _set(self, key: Tuple[str, ...], value: float) -> None:
+        with self._lock:
+            self._values[key] = float(value)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets: Tuple[float, ...] = tuple(sorted(float(b) for b in buckets if b != math.inf))
+        # key -> [バケットごとの件数(非累積, 末尾は +Inf), 合計, 件数]
+        self._values: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels: object) -> None:
+        self._observe(self._key(labels), value)
+
+    def _observe(self, key: Tuple[str, ...], value: float) -> None:
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = [[0] * (len(self.buckets) + 1), 0.0, 0]
+                self._values[key] = state
+            state[0][idx] += 1
+            state[1] += value
+            state[2] += 1
+
+    def count(self, **labels: object) -> int:
+        state = self._values.get(self._key(labels))
+        return state[2] if state else 0
+
+    def _samples(self) -> Iterable[str]:
+        with self._lock:
+            items = sorted((k, (list(s[0]), s[1], s[2])) for k, s in self._values.items())
+        for key, (counts, total, n) in items:
+            cumulative = 0
+            for bound, c in zip(self.buckets + (math.inf,), counts):
+                cumulative += c
+                le = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                yield f"{self.name}_bucket{le} {cumulative}"
+            base = _format_labels(self.labelnames, key)
+            yield f"{self.name}_sum{base} {_format_value(total)}"
+            yield f"{self.name}_count{base} {n}"
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric: _Metric) -> _Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS,
+    ) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))  # type: ignore[return-value]
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for m in metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = MetricsRegistry()
+
+# ---- アプリ共通のメトリクス定義 ----
+LLM_CALL_SECONDS = REGISTRY.histogram(
+    "llm_call_duration_seconds", "LLM call latency (request sent to response complete).",
+    ("provider", "model", "character"),
+)
+LLM_CALL_FAILURES = REGISTRY.counter(
+    "llm_call_failures_total", "LLM calls that timed out or raised.",
+    ("provider", "model", "character", "reason"),
+)
+WS_SESSIONS_OPEN = REGISTRY.gauge("ws_sessions_open", "Currently open WebSocket sessions.")
+TURNS_PER_USER_MESSAGE = REGISTRY.histogram(
+    "turns_per_user_message", "Character turns generated per user message.",
+    buckets=(0, 1, 2, 3, 4, 5, 6, 8, 10, 15, 20),
+)
+KB_QUERY_SECONDS = REGISTRY.histogram(
+    "kb_query_duration_seconds", "KB API (/api/db/*) request latency.", ("endpoint",),
+)
+INGEST_ROUNDS = REGISTRY.counter("ingest_rounds_total", "Ingest search rounds executed.")
+INGEST_PAGES_FETCHED = REGISTRY.counter("ingest_pages_fetched_total", "Pages fetched by ingest.", ("result",))
+INGEST_BYTES_FETCHED = REGISTRY.counter("ingest_bytes_fetched_total", "Bytes of page content fetched by ingest.")
+KB_ROWS_INSERTED = REGISTRY.counter("kb_rows_inserted_total", "Rows inserted into the KB database.", ("table",))
+
+
+class KbIngestRowTally:
+    """
+    KB.ingest.ingest_payload の log_fn として渡し、'ADD <table>: ...' 行を数える。
+    ingest_payload はトランザクションの途中でログを出すため、メトリクスへの反映は
+    ingest_payload が正常に戻った（コミットされた）あとで commit() を呼んだときに行う。
+    """
+
+    def __init__(self):
+        self._counts: Dict[str, int] = {}
+
+    def __call__(self, message: str) -> None:
+        if message.startswith("ADD "):
+            table = message[4:].split(":", 1)[0].strip()
+            if table:
+                self._counts[table] = self._counts.get(table, 0) + 1
+
+    def commit(self) -> None:
+        for table, n in self._counts.items():
+            KB_ROWS_INSERTED.inc(n, table=table)
+        self._counts.clear()
+
+
+def render_metrics() -> str:
+    return REGISTRY.render()
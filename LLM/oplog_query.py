@@ -0,0 +1,157 @@
+import argparse
+import glob
+import json
+import math
+import os
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence
+
+
+# 構造化運用ログ（operation_*.jsonl）の集計 CLI
+# 例: python LLM/oplog_query.py logs --since "2025-01-01 09:00" --by model,base_url
+
+
+def _expand_paths(paths: Sequence[str]) -> List[str]:
+    """ファイル/ディレクトリ/glob を operation_*.jsonl のファイル一覧に展開する。"""
+    out: List[str] = []
+    for p in paths:
+        if os.path.isdir(p):
+            out.extend(sorted(glob.glob(os.path.join(p, "*.jsonl"))))
+        elif any(ch in p for ch in "*?["):
+            out.extend(sorted(glob.glob(p)))
+        else:
+            out.append(p)
+    return out
+
+
+def iter_records(paths: Sequence[str]) -> Iterator[Dict[str, Any]]:
+    """JSONL を 1 行ずつ読み、dict のレコードを返す（壊れた行は読み飛ばす）。"""
+    for path in _expand_paths(paths):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        obj = json.loads(line)
+                    except ValueError:
+                        continue
+                    if isinstance(obj, dict):
+                        yield obj
+        except FileNotFoundError:
+            continue
+
+
+def parse_time(value: Optional[str]) -> Optional[float]:
+    """'YYYY-mm-dd[ HH:MM[:SS]]' / ISO 形式 / UNIX 秒を epoch 秒に変換する。"""
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    return datetime.fromisoformat(value.strip().replace("/", "-")).timestamp()
+
+
+def percentile(sorted_values: Sequence[float], p: float) -> Optional[float]:
+    """最近傍順位法のパーセンタイル（sorted_values は昇順済み）。"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(p / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(
+    records: Iterable[Dict[str, Any]],
+    by: Sequence[str] = ("model", "base_url"),
+    metric: str = "gen_ms",
+    event: str = "llm_call",
+    since: Optional[float] = None,
+    until: Optional[float] = None,
+) -> List[Dict[str, Any]]:
+    """
+    event のレコードを by のキーで束ね、件数・タイムアウト率・エラー率と
+    成功呼び出しの metric の p50/p95/p99 を返す。
+    """
+    groups: Dict[tuple, Dict[str, Any]] = {}
+    for rec in records:
+        if rec.get("event") != event:
+            continue
+        epoch = rec.get("epoch")
+        if since is not None and (epoch is None or epoch < since):
+            continue
+        if until is not None and (epoch is None or epoch >= until):
+            continue
+        key = tuple(str(rec.get(k, "")) for k in by)
+        g = groups.setdefault(key, {"count": 0, "timeouts": 0, "errors": 0, "values": []})
+        g["count"] += 1
+        status = rec.get("status", "ok")
+        if status == "timeout":
+            g["timeouts"] += 1
+        elif status == "error":
+            g["errors"] += 1
+        elif isinstance(rec.get(metric), (int, float)):
+            g["values"].append(float(rec[metric]))
+
+    rows: List[Dict[str, Any]] = []
+    for key, g in sorted(groups.items()):
+        values = sorted(g["values"])
+        row: Dict[str, Any] = dict(zip(by, key))
+        row.update({
+            "count": g["count"],
+            "timeout_rate": g["timeouts"] / g["count"],
+            "error_rate": g["errors"] / g["count"],
+            "p50": percentile(values, 50),
+            "p95": percentile(values, 95),
+            "p99": percentile(values, 99),
+        })
+        rows.append(row)
+    return rows
+
+
+def format_table(rows: List[Dict[str, Any]], by: Sequence[str], metric: str) -> str:
+    headers = list(by) + ["count", "timeout%", "error%", f"{metric} p50", "p95", "p99"]
+    body: List[List[str]] = []
+    for r in rows:
+        def _ms(v):
+            return "-" if v is None else f"{v:.0f}"
+        body.append(
+            [str(r.get(k, "")) for k in by]
+            + [str(r["count"]), f"{r['timeout_rate'] * 100:.1f}", f"{r['error_rate'] * 100:.1f}",
+               _ms(r["p50"]), _ms(r["p95"]), _ms(r["p99"])]
+        )
+    widths = [max(len(h), *(len(line[i]) for line in body)) if body else len(h) for i, h in enumerate(headers)]
+    lines = ["  ".join(h.ljust(w) for h, w in zip(headers, widths))]
+    lines += ["  ".join(c.ljust(w) for c, w in zip(line, widths)) for line in body]
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    ap = argparse.ArgumentParser(description="構造化運用ログ（JSONL）のレイテンシ集計")
+    ap.add_argument("paths", nargs="*", default=["logs"], help="operation_*.jsonl / ディレクトリ / glob（既定: logs）")
+    ap.add_argument("--since", default=None, help="集計開始時刻（例: 2025-01-01 09:00、ISO、UNIX秒）")
+    ap.add_argument("--until", default=None, help="集計終了時刻（この時刻を含まない）")
+    ap.add_argument("--by", default="model,base_url", help="集計キー（カンマ区切り。例: model,base_url / speaker）")
+    ap.add_argument("--metric", default="gen_ms", help="パーセンタイルを取る項目（gen_ms/ttft_ms/queue_wait_ms など）")
+    ap.add_argument("--event", default="llm_call", help="対象イベント名")
+    ap.add_argument("--json", action="store_true", help="表ではなく JSON で出力")
+    args = ap.parse_args(argv)
+
+    by = [k.strip() for k in args.by.split(",") if k.strip()]
+    rows = summarize(
+        iter_records(args.paths),
+        by=by,
+        metric=args.metric,
+        event=args.event,
+        since=parse_time(args.since),
+        until=parse_time(args.until),
+    )
+    if args.json:
+        print(json.dumps(rows, ensure_ascii=False, indent=2))
+    else:
+        print(format_table(rows, by, args.metric))
+
+
+if __name__ == "__main__":
+    main()
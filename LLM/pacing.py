@@ -0,0 +1,150 @@
+import asyncio
+import json
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional
+
+from fastapi import WebSocket
+
+
+PACING_MODES = ("none", "fixed", "proportional", "client_ack")
+
+
+@dataclass(frozen=True)
+class PacingSettings:
+    """
+    キャラクター発言の間隔。生成は待たずに進め、次の発言の「表示」だけを遅らせる。
+    - none: 間隔なし
+    - fixed: 直前の発言から fixed_sec 秒あける
+    - proportional: 直前の発言の文字数 / chars_per_sec 秒（min_sec〜max_sec に丸める）
+    - client_ack: ブラウザの描画完了 ack を待つ（ack_timeout_sec で打ち切り）
+    """
+    mode: str = "fixed"
+    fixed_sec: float = 1.0
+    chars_per_sec: float = 20.0
+    min_sec: float = 0.3
+    max_sec: float = 4.0
+    ack_timeout_sec: float = 10.0
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "PacingSettings":
+        data = data or {}
+        mode = str(data.get("mode", cls.mode)).lower()
+        if mode not in PACING_MODES:
+            mode = cls.mode
+        return cls(
+            mode=mode,
+            fixed_sec=float(data.get("fixed_sec", cls.fixed_sec)),
+            chars_per_sec=max(1.0, float(data.get("chars_per_sec", cls.chars_per_sec))),
+            min_sec=float(data.get("min_sec", cls.min_sec)),
+            max_sec=float(data.get("max_sec", cls.max_sec)),
+            ack_timeout_sec=float(data.get("ack_timeout_sec", cls.ack_timeout_sec)),
+        )
+
+    def delay_for(self, text: str) -> float:
+        if self.mode == "fixed":
+            return max(0.0, self.fixed_sec)
+        if self.mode == "proportional":
+            return min(self.max_sec, max(self.min_sec, len(text or "") / self.chars_per_sec))
+        return 0.0
+
+
+def parse_ack(text: str) -> Optional[Dict[str, Any]]:
+    """クライアントからの描画完了通知 {"type": "ack", ...} なら dict を返す（それ以外は None）。"""
+    if not text or not text.lstrip().startswith("{"):
+        return None
+    try:
+        obj = json.loads(text)
+    except ValueError:
+        return None
+    if isinstance(obj, dict) and obj.get("type") == "ack":
+        return obj
+    return None
+
+
+class TurnPacer:
+    """
+    セッション単位のペーシング。
+    - note_delivered(): 発言を送った直後に呼び、次の発言を出してよい時刻（または ack 待ち）を記録する
+    - wait_ready(): 次の発言を送る直前に呼ぶ。待っている間も次のキャラクターの生成は進んでいる
+    - receive_text(): ユーザー入力の受信。ack は読み捨て、ack 待ち中に届いた入力は保留分から先に返す
+    """
+
+    def __init__(self, websocket: WebSocket, settings: PacingSettings):
+        self.websocket = websocket
+        self.settings = settings
+        self.pending_inputs: Deque[str] = deque()
+        self._ready_at = 0.0
+        self._awaiting_ack = False
+        self._ack_deadline = 0.0
+        self._closed_exc: Optional[BaseException] = None
+
+    @property
+    def wants_ack(self) -> bool:
+        return self.settings.mode == "client_ack"
+
+    @property
+    def max_wait_sec(self) -> float:
+        """wait_ready() が待ちうる最大秒数（生成タイムアウトへの上乗せ分）。"""
+        if self.wants_ack:
+            return max(0.0, self.settings.ack_timeout_sec)
+        if self.settings.mode == "fixed":
+            return max(0.0, self.settings.fixed_sec)
+        if self.settings.mode == "proportional":
+            return max(0.0, self.settings.max_sec)
+        return 0.0
+
+    def reset(self) -> None:
+        """ユーザー入力を受けたら、前サイクルの間隔/ack 待ちは持ち越さない。"""
+        self._ready_at = 0.0
+        self._awaiting_ack = False
+
+    def note_delivered(self, text: str) -> None:
+        now = time.monotonic()
+        if self.wants_ack:
+            self._awaiting_ack = True
+            self._ack_deadline = now + max(0.0, self.settings.ack_timeout_sec)
+        else:
+            self._ready_at = now + self.settings.delay_for(text)
+
+    async def wait_ready(self) -> None:
+        if self.wants_ack:
+            await self._wait_ack()
+            return
+        remaining = self._ready_at - time.monotonic()
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+    async def _wait_ack(self) -> None:
+        while self._awaiting_ack and self._closed_exc is None:
+            remaining = self._ack_deadline - time.monotonic()
+            if remaining <= 0:
+                self._awaiting_ack = False
+                return
+            try:
+                text = await asyncio.wait_for(self.websocket.receive_text(), timeout=remaining)
+            except asyncio.TimeoutError:
+                self._awaiting_ack = False
+                return
+            except Exception as e:
+                # 切断などは次の receive_text() で呼び出し側へ伝える
+                self._closed_exc = e
+                self._awaiting_ack = False
+                return
+            if parse_ack(text) is not None:
+                self._awaiting_ack = False
+            else:
+                self.pending_inputs.append(text)
+
+    async def receive_text(self) -> str:
+        while True:
+            if self.pending_inputs:
+                return self.pending_inputs.popleft()
+            if self._closed_exc is not None:
+                raise self._closed_exc
+            text = await self.websocket.receive_text()
+            if parse_ack(text) is None:
+                return text
+            # 遅れて届いた ack は読み捨てる
+            self._awaiting_ack = False
@@ -0,0 +1,220 @@
+import asyncio
+import atexit
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import metrics
+from config_service import get_config
+
+
+# 取り込み（ingest / /kbcomplete / /kb special）で取得したページ本文をディスクに保存して再利用する。
+# キーは URL。本文は zlib 圧縮して SQLite に置き、ETag / Last-Modified も合わせて保存する。
+#   - fresh_sec 以内の取得分はそのまま返す
+#   - それより古いものは条件付き GET（If-None-Match / If-Modified-Since）で再検証し、304 なら保存分を返す
+#   - 圧縮後の合計が max_bytes を超えたら最終参照の古いものから消す（LRU）
+#   - offline: true のときはネットワークに出ず、保存分だけで再生する
+#   - 取得に失敗（接続エラー/5xx）したときは、取得から max_stale_sec 以内の保存分で代用する
+# SQLite の読み書きは専用スレッド 1 本で行い（aget/aput/atouch）、イベントループを止めない。
+# 最終参照時刻はメモリに溜めて、まとめて書く（LRU の削除前とクローズ時、または一定件数ごと）。
+
+_ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+DEFAULT_PAGE_CACHE_SETTINGS: Dict[str, Any] = {
+    "enabled": True,
+    "path": "LLM/cache/pages.db",  # プロジェクトルート基準
+    "fresh_sec": 6 * 3600.0,
+    "max_bytes": 256 * 1024 * 1024,
+    "offline": False,
+    "max_stale_sec": 7 * 86400.0,
+}
+
+# 最終参照時刻をこの件数まで溜めたら書き出す
+_ACCESS_FLUSH_COUNT = 64
+
+INGEST_PAGE_CACHE = metrics.REGISTRY.counter(
+    "ingest_page_cache_total", "Ingest page cache lookups.", ("result",),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL,
+    etag TEXT,
+    last_modified TEXT,
+    fetched_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_pages_last_access ON pages(last_access);
+"""
+
+
+def page_cache_settings() -> Dict[str, Any]:
+    settings = dict(DEFAULT_PAGE_CACHE_SETTINGS)
+    try:
+        cfg = get_config().app.raw.get("ingest_page_cache") or {}
+        settings.update({k: v for k, v in cfg.items() if k in DEFAULT_PAGE_CACHE_SETTINGS})
+    except Exception:
+        pass
+    return settings
+
+
+@dataclass
+class CachedPage:
+    text: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+    def is_fresh(self, fresh_sec: float) -> bool:
+        return self.fetched_at + fresh_sec >= time.time()
+
+    def is_usable_stale(self, max_stale_sec: float) -> bool:
+        """取得失敗時の代用に使ってよいか（取得から max_stale_sec 以内。0 以下なら代用しない）。"""
+        return max_stale_sec > 0 and self.fetched_at + max_stale_sec >= time.time()
+
+    def validators(self) -> Dict[str, str]:
+        """条件付き GET 用のヘッダ。"""
+        headers: Dict[str, str] = {}
+        if self.etag:
+            headers["If-None-Match"] = self.etag
+        if self.last_modified:
+            headers["If-Modified-Since"] = self.last_modified
+        return headers
+
+
+class PageCache:
+    def __init__(self, path: str, max_bytes: int = DEFAULT_PAGE_CACHE_SETTINGS["max_bytes"]):
+        self.path = path
+        self.max_bytes = int(max_bytes)
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        # 圧縮後の合計サイズ（起動時に 1 回だけ数え、以降は put/削除で増減させる）
+        self._total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+        # まだ書いていない最終参照時刻（url -> 時刻）
+        self._accessed: Dict[str, float] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="page-cache")
+
+    def get(self, url: str) -> Optional[CachedPage]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT body, etag, last_modified, fetched_at FROM pages WHERE url = ?", (url,)
+            ).fetchone()
+            if row is None:
+                return None
+            self._accessed[url] = time.time()
+            if len(self._accessed) >= _ACCESS_FLUSH_COUNT:
+                self._flush_access_locked()
+                self._conn.commit()
+        try:
+            text = zlib.decompress(row[0]).decode("utf-8")
+        except Exception:
+            return None
+        return CachedPage(text=text, etag=row[1], last_modified=row[2], fetched_at=row[3])
+
+    def put(self, url: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        body = zlib.compress(text.encode("utf-8"), 6)
+        now = time.time()
+        with self._lock:
+            old = self._conn.execute("SELECT size FROM pages WHERE url = ?", (url,)).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pages (url, body, size, etag, last_modified, fetched_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (url, body, len(body), etag, last_modified, now, now),
+            )
+            self._accessed.pop(url, None)
+            self._total += len(body) - (old[0] if old else 0)
+            self._evict_locked()
+            self._conn.commit()
+
+    def touch(self, url: str) -> None:
+        """304（未変更）を受けたときに取得時刻を更新する。"""
+        now = time.time()
+        with self._lock:
+            self._accessed.pop(url, None)
+            self._conn.execute("UPDATE pages SET fetched_at = ?, last_access = ? WHERE url = ?", (now, now, url))
+            self._conn.commit()
+
+    async def aget(self, url: str) -> Optional[CachedPage]:
+        return await self._run(self.get, url)
+
+    async def aput(self, url: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None) -> None:
+        await self._run(self.put, url, text, etag, last_modified)
+
+    async def atouch(self, url: str) -> None:
+        await self._run(self.touch, url)
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _flush_access_locked(self) -> None:
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE pages SET last_access = ? WHERE url = ?",
+                [(ts, url) for url, ts in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def _evict_locked(self) -> None:
+        if self.max_bytes <= 0 or self._total <= self.max_bytes:
+            return
+        # 削除順を決める前に溜めていた最終参照時刻を反映する
+        self._flush_access_locked()
+        # 最終参照の古いものから上限に収まるまで削除
+        victims = []
+        for url, size in self._conn.execute("SELECT url, size FROM pages ORDER BY last_access ASC"):
+            if self._total <= self.max_bytes:
+                break
+            victims.append((url,))
+            self._total -= size
+        self._conn.executemany("DELETE FROM pages WHERE url = ?", victims)
+
+    def flush(self) -> None:
+        """溜めている最終参照時刻を書き出す。"""
+        with self._lock:
+            self._flush_access_locked()
+            self._conn.commit()
+
+    def total_bytes(self) -> int:
+        with self._lock:
+            return self._total
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM pages").fetchone()[0]
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._flush_access_locked()
+            self._conn.commit()
+            self._conn.close()
+
+
+_cache: Optional[PageCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_page_cache() -> Optional[PageCache]:
+    """プロセス共通のページキャッシュ（enabled: false なら None）。"""
+    global _cache
+    s = page_cache_settings()
+    if not s.get("enabled", True):
+        return None
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                path = s["path"] if os.path.isabs(s["path"]) else os.path.join(_ROOT_DIR, s["path"])
+                _cache = PageCache(path, s["max_bytes"])
+                # 溜めている最終参照時刻は終了時に書き出す
+                atexit.register(_cache.flush)
+    return _cache
@@ -0,0 +1,141 @@
+import re
+import threading
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence, Tuple
+
+
+# {identifier} のみをプレースホルダとみなす（JSON の {"next": ...} などはリテラルのまま）
+PLACEHOLDER_PATTERN = re.compile(r"\{([A-Za-z_][A-Za-z0-9_]*)\}")
+
+DEFAULT_PERSONA_PROMPT = "あなたはAIです。日本語で応答してください。"
+
+
+class CompiledTemplate:
+    """
+    テンプレートを一度だけ (リテラル, プレースホルダ名) の並びに分解しておく。
+    render() は分解済みの並びをつなぐだけで正規表現を使わない。置換した値は再走査しない。
+    未定義のキーは {key} のまま残す。
+    """
+
+    __slots__ = ("parts",)
+
+    def __init__(self, template: str = "", parts: Optional[List[Tuple[str, Optional[str]]]] = None):
+        if parts is None:
+            parts = []
+            pos = 0
+            for m in PLACEHOLDER_PATTERN.finditer(template or ""):
+                parts.append((template[pos:m.start()], m.group(1)))
+                pos = m.end()
+            parts.append(((template or "")[pos:], None))
+        self.parts = parts
+
+    @property
+    def keys(self) -> Tuple[str, ...]:
+        return tuple(k for _, k in self.parts if k is not None)
+
+    def render(self, **kwargs: Any) -> str:
+        out: List[str] = []
+        for literal, key in self.parts:
+            out.append(literal)
+            if key is not None:
+                out.append(str(kwargs[key]) if key in kwargs else "{" + key + "}")
+        return "".join(out)
+
+    def bind(self, **kwargs: Any) -> "CompiledTemplate":
+        """一部のキーだけを埋めたテンプレートを返す（埋めた値はリテラルとして扱う）。"""
+        parts: List[Tuple[str, Optional[str]]] = []
+        pending = ""
+        for literal, key in self.parts:
+            pending += literal
+            if key is None:
+                continue
+            if key in kwargs:
+                pending += str(kwargs[key])
+            else:
+                parts.append((pending, key))
+                pending = ""
+        parts.append((pending, None))
+        return CompiledTemplate(parts=parts)
+
+    def split_at(self, key: str) -> Tuple[str, "CompiledTemplate"]:
+        """最初の {key} の直前までのリテラルと、{key} 以降のテンプレートに分ける（{key} が無ければ全体が前半）。"""
+        for i, (literal, k) in enumerate(self.parts):
+            if k == key:
+                head = "".join(lit + ("{" + kk + "}" if kk else "") for lit, kk in self.parts[:i]) + literal
+                return head, CompiledTemplate(parts=[("", key)] + self.parts[i + 1:])
+        return self.render(), CompiledTemplate(parts=[("", None)])
+
+
+class CharacterPrompt:
+    """
+    キャラクター 1 人分のシステムプロンプト。会話履歴より前（ペルソナ・プロファイル・応答制約・進行ルール）は
+    組み立て済みの static_prefix として保持し、ターンごとには履歴以降だけを埋める。
+    static_prefix はターンをまたいで同一なので、バックエンドのプロンプトキャッシュ（KV 再利用）が効く範囲になる。
+    """
+
+    __slots__ = ("character_name", "static_prefix", "_tail")
+
+    def __init__(self, character_name: str, static_prefix: str, tail: CompiledTemplate):
+        self.character_name = character_name
+        self.static_prefix = static_prefix
+        self._tail = tail
+
+    @property
+    def static_prefix_len(self) -> int:
+        return len(self.static_prefix)
+
+    def render(self, conversation_log: str) -> str:
+        return self.static_prefix + self._tail.render(conversation_log=conversation_log)
+
+
+def compile_character_prompt(
+    character_name: str,
+    persona_prompt: str,
+    global_rules: Mapping[str, Any],
+    other_characters: str,
+) -> CharacterPrompt:
+    """global_rules.yaml の prompt_template に会話履歴以外の値を埋めて CharacterPrompt を作る。"""
+    response_constraints = CompiledTemplate(global_rules.get("response_constraints", "")).render(character_name=character_name)
+    flow_rules = CompiledTemplate(global_rules.get("flow_rules", "")).render(other_characters=other_characters)
+    bound = CompiledTemplate(global_rules.get("prompt_template", "{persona_prompt}")).bind(
+        character_name=character_name,
+        persona_prompt=persona_prompt or DEFAULT_PERSONA_PROMPT,
+        response_constraints=response_constraints,
+        flow_rules=flow_rules,
+        other_characters=other_characters,
+    )
+    prefix, tail = bound.split_at("conversation_log")
+    return CharacterPrompt(character_name, prefix, tail)
+
+
+class CharacterPromptCache:
+    """
+    CharacterPrompt のキャッシュ。ルール/参加者一覧はオブジェクトの同一性（設定スナップショットの差し替えで変わる）、
+    ペルソナは文字列の一致で判定し、変わっていればその時だけ作り直す。
+    """
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._entries: Dict[Tuple[str, str], Tuple[Mapping[str, Any], Sequence[Any], CharacterPrompt]] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        character_name: str,
+        persona_prompt: str,
+        global_rules: Mapping[str, Any],
+        roster: Sequence[Any],
+        other_characters: Callable[[], str],
+    ) -> CharacterPrompt:
+        key = (character_name, persona_prompt)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] is global_rules and entry[1] is roster:
+            return entry[2]
+        prompt = compile_character_prompt(character_name, persona_prompt, global_rules, other_characters())
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[key] = (global_rules, roster, prompt)
+        return prompt
+
+
+PROMPT_CACHE = CharacterPromptCache()
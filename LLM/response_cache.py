@@ -0,0 +1,271 @@
+import asyncio
+import atexit
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Dict, Mapping, Optional
+
+import metrics
+from config_service import get_config
+from llm_factory import llm_call_stats
+from stop_policy import StopPolicy
+
+
+# 決定的な LLM 呼び出し（temperature 0 のサーチャー/抽出・修復プロンプトなど）の応答をディスクに保存して再利用する。
+# キー: (プロバイダ, モデル, 生成パラメータ, クライアント設定, 停止条件, system のハッシュ, user のハッシュ)
+# 保存先は SQLite。ttl_sec を過ぎたものは読み出し時に捨て、max_entries を超えたら最終参照の古いものから消す（LRU）。
+# SQLite の読み書きは専用スレッド 1 本で行い（aget/aput）、イベントループを止めない。
+# 最終参照時刻はメモリに溜めて、まとめて書く（LRU の削除前とクローズ時、または一定件数ごと）。
+
+_ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+DEFAULT_CACHE_SETTINGS: Dict[str, Any] = {
+    "path": "LLM/cache/llm_responses.db",  # プロジェクトルート基準
+    "ttl_sec": 7 * 24 * 3600.0,
+    "max_entries": 5000,
+}
+
+# 最終参照時刻をこの件数まで溜めたら書き出す
+_ACCESS_FLUSH_COUNT = 64
+
+LLM_RESPONSE_CACHE = metrics.REGISTRY.counter(
+    "llm_response_cache_total", "LLM response cache lookups.", ("result",),
+)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model TEXT NOT NULL,
+    response TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access);
+"""
+
+
+def cache_settings() -> Dict[str, Any]:
+    settings = dict(DEFAULT_CACHE_SETTINGS)
+    try:
+        cfg = get_config().app.raw.get("llm_response_cache") or {}
+        settings.update({k: v for k, v in cfg.items() if k in DEFAULT_CACHE_SETTINGS})
+    except Exception:
+        pass
+    return settings
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+
+def cache_key(
+    provider: str,
+    model: str,
+    gen_params: Optional[Mapping[str, Any]],
+    client_options: Optional[Mapping[str, Any]],
+    stop_policy: Optional[StopPolicy],
+    system_prompt: str,
+    user_message: str,
+) -> str:
+    stop = None
+    if stop_policy is not None:
+        stop = [stop_policy.max_sentences, stop_policy.max_chars, stop_policy.stop_on_next_tag, list(stop_policy.stop_sequences),
+                stop_policy.next_tag_grace_chars]
+    material = {
+        "provider": (provider or "").lower(),
+        "model": model,
+        "gen": {str(k): v for k, v in (gen_params or {}).items()},
+        "client": {str(k): v for k, v in (client_options or {}).items()},
+        "stop": stop,
+        "system": _sha256(system_prompt),
+        "user": _sha256(user_message),
+    }
+    return _sha256(json.dumps(material, sort_keys=True, ensure_ascii=False, default=str))
+
+
+class ResponseCache:
+    def __init__(self, path: str, ttl_sec: float = DEFAULT_CACHE_SETTINGS["ttl_sec"], max_entries: int = DEFAULT_CACHE_SETTINGS["max_entries"]):
+        self.path = path
+        self.ttl_sec = float(ttl_sec)
+        self.max_entries = int(max_entries)
+        if path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.Lock()
+        # 件数（起動時に 1 回だけ数え、以降は追加/削除で増減させる）
+        self._count = self._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+        # まだ書いていない最終参照時刻（key -> 時刻）
+        self._accessed: Dict[str, float] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="response-cache")
+
+    def get(self, key: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT response, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            if self.ttl_sec > 0 and row[1] + self.ttl_sec < now:
+                self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self._accessed.pop(key, None)
+                self._count -= 1
+                self._conn.commit()
+                return None
+            self._accessed[key] = now
+            if len(self._accessed) >= _ACCESS_FLUSH_COUNT:
+                self._flush_access_locked()
+                self._conn.commit()
+        return row[0]
+
+    def put(self, key: str, model: str, response: str) -> None:
+        now = time.time()
+        with self._lock:
+            existed = self._conn.execute("SELECT 1 FROM responses WHERE key = ?", (key,)).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model, response, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (key, model, response, now, now),
+            )
+            self._accessed.pop(key, None)
+            if not existed:
+                self._count += 1
+            self._evict_locked()
+            self._conn.commit()
+
+    async def aget(self, key: str) -> Optional[str]:
+        return await self._run(self.get, key)
+
+    async def aput(self, key: str, model: str, response: str) -> None:
+        await self._run(self.put, key, model, response)
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, fn, *args)
+
+    def _flush_access_locked(self) -> None:
+        if self._accessed:
+            self._conn.executemany(
+                "UPDATE responses SET last_access = ? WHERE key = ?",
+                [(ts, key) for key, ts in self._accessed.items()],
+            )
+            self._accessed.clear()
+
+    def _evict_locked(self) -> None:
+        excess = self._count - self.max_entries
+        if self.max_entries <= 0 or excess <= 0:
+            return
+        # 削除順を決める前に溜めていた最終参照時刻を反映し、最終参照の古いものから超過分だけ消す
+        self._flush_access_locked()
+        victims = self._conn.execute(
+            "SELECT key FROM responses ORDER BY last_access ASC LIMIT ?", (excess,)
+        ).fetchall()
+        self._conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        self._count -= len(victims)
+
+    def flush(self) -> None:
+        """溜めている最終参照時刻を書き出す。"""
+        with self._lock:
+            self._flush_access_locked()
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        with self._lock:
+            self._flush_access_locked()
+            self._conn.commit()
+            self._conn.close()
+
+
+_cache: Optional[ResponseCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> ResponseCache:
+    """プロセス共通のキャッシュ（設定の path/ttl_sec/max_entries で初回に開く）。"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                s = cache_settings()
+                path = s["path"] if os.path.isabs(s["path"]) else os.path.join(_ROOT_DIR, s["path"])
+                _cache = ResponseCache(path, s["ttl_sec"], s["max_entries"])
+                # 溜めている最終参照時刻は終了時に書き出す
+                atexit.register(_cache.flush)
+    return _cache
+
+
+def _mark_cache_hit() -> None:
+    stats = llm_call_stats.get()
+    if stats is not None:
+        stats["cache_hit"] = True
+
+
+class CachedLLM:
+    """
+    LLM クライアントのラッパー。ainvoke/astream の結果をキャッシュし、同じ入力なら LLM を呼ばずに返す。
+    ストリームは最後まで読み切った場合だけ保存する（呼び出し側が途中でやめた応答は保存しない）。
+    それ以外の属性（pool/base_url/client など）は元のクライアントのものを返す。
+    """
+
+    def __init__(
+        self,
+        llm: Any,
+        cache: ResponseCache,
+        provider: str,
+        model: str,
+        gen_params: Optional[Mapping[str, Any]] = None,
+        client_options: Optional[Mapping[str, Any]] = None,
+    ):
+        self.llm = llm
+        self.cache = cache
+        self.provider = provider
+        self.model = model
+        self.gen_params = dict(gen_params or {})
+        self.client_options = dict(client_options or {})
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.llm, name)
+
+    def _key(self, system_prompt: str, user_message: str, stop_policy: Optional[StopPolicy]) -> str:
+        return cache_key(self.provider, self.model, self.gen_params, self.client_options, stop_policy, system_prompt, user_message)
+
+    async def _lookup(self, key: str) -> Optional[str]:
+        hit = await self.cache.aget(key)
+        LLM_RESPONSE_CACHE.inc(result="hit" if hit is not None else "miss")
+        if hit is not None:
+            _mark_cache_hit()
+        return hit
+
+    async def ainvoke(self, system_prompt: str, user_message: str, stop_policy: Optional[StopPolicy] = None, static_prefix_len: int = 0) -> str:
+        key = self._key(system_prompt, user_message, stop_policy)
+        hit = await self._lookup(key)
+        if hit is not None:
+            return hit
+        text = await self.llm.ainvoke(system_prompt, user_message, stop_policy, static_prefix_len=static_prefix_len)
+        if text:
+            await self.cache.aput(key, self.model, text)
+        return text
+
+    async def astream(self, system_prompt: str, user_message: str, stop_policy: Optional[StopPolicy] = None, static_prefix_len: int = 0) -> AsyncIterator[str]:
+        key = self._key(system_prompt, user_message, stop_policy)
+        hit = await self._lookup(key)
+        if hit is not None:
+            yield hit
+            return
+        parts = []
+        stream = self.llm.astream(system_prompt, user_message, stop_policy, static_prefix_len=static_prefix_len)
+        try:
+            async for delta in stream:
+                parts.append(delta)
+                yield delta
+        finally:
+            await stream.aclose()
+        text = "".join(parts)
+        if text.strip():
+            await self.cache.aput(key, self.model, text)
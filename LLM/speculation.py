@@ -0,0 +1,81 @@
+import asyncio
+import time
+from typing import Any, AsyncIterator, Callable, Dict
+
+from llm_factory import llm_call_stats
+
+
+_END = object()
+
+
+class _Failed:
+    __slots__ = ("error",)
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+class SpeculativeStream:
+    """
+    先行生成。別タスクで差分を読み進めてバッファし、採用されたら consume() で先頭から再生する。
+    棄却（ロールバック）時は cancel() でタスクごと止め、上流のストリーム（HTTP レスポンス）も閉じる。
+    計測値（llm_call_stats）はタスク固有の stats に記録される。
+    """
+
+    def __init__(self, factory: Callable[[], AsyncIterator[str]]):
+        self.stats: Dict[str, Any] = {}
+        self.started_at = time.perf_counter()
+        self.buffered_chars = 0
+        self._queue: "asyncio.Queue[Any]" = asyncio.Queue()
+        self._task = asyncio.create_task(self._pump(factory))
+
+    async def _pump(self, factory: Callable[[], AsyncIterator[str]]) -> None:
+        # create_task でコンテキストは複製済みなので、この set は呼び出し元に影響しない
+        llm_call_stats.set(self.stats)
+        agen = factory()
+        try:
+            async for delta in agen:
+                self.buffered_chars += len(delta)
+                self._queue.put_nowait(delta)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._queue.put_nowait(_Failed(e))
+            return
+        finally:
+            aclose = getattr(agen, "aclose", None)
+            if aclose is not None:
+                try:
+                    await aclose()
+                except Exception:
+                    pass
+        self._queue.put_nowait(_END)
+
+    @property
+    def done(self) -> bool:
+        return self._task.done()
+
+    async def consume(self) -> AsyncIterator[str]:
+        """バッファ済みの差分から順に返し、以降は生成に追従する。"""
+        while True:
+            item = await self._queue.get()
+            if item is _END:
+                return
+            if isinstance(item, _Failed):
+                raise item.error
+            yield item
+
+    async def collect(self) -> str:
+        parts = [delta async for delta in self.consume()]
+        return "".join(parts).strip()
+
+    def cancel(self) -> None:
+        if not self._task.done():
+            self._task.cancel()
+
+
+async def invoke_once(invoke: Callable[[], Any]) -> AsyncIterator[str]:
+    """ainvoke（非ストリーム）を 1 要素のストリームとして扱うためのアダプタ。"""
+    text = await invoke()
+    if text:
+        yield str(text)
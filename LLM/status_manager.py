@@ -5,7 +5,7 @@ from fastapi import WebSocket
 from log_manager import write_operation_log
 
 async def update_status(websocket: WebSocket, character: str, status: str, log_filename: str, operation_log_filename: str):
-    write_operation_log(operation_log_filename, "INFO", "StatusManager", f"Updating status for {character} to {status}.")
+    write_operation_log(operation_log_filename, "INFO", "StatusManager", "Updating status for %s to %s.", character, status)
     await websocket.send_json({
         "type": "status",
         "character": character,
@@ -13,6 +13,6 @@ async def update_status(websocket: WebSocket, character: str, status: str, log_f
     })
 
 async def update_all_statuses(websocket: WebSocket, characters: List[str], status: str, log_filename: str, operation_log_filename: str):
-    write_operation_log(operation_log_filename, "INFO", "StatusManager", f"Updating status for all characters to {status}.")
+    write_operation_log(operation_log_filename, "INFO", "StatusManager", "Updating status for all characters to %s.", status)
     for char in characters:
         await update_status(websocket, char, status, log_filename, operation_log_filename)
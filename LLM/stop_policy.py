@@ -0,0 +1,62 @@
+import re
+from dataclasses import dataclass, field
+from typing import Callable, List, Optional, Tuple
+
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[。.!?！？])\s*")
+_NEXT_TAG_RE = re.compile(r"\[Next:[^\]]*\]", re.IGNORECASE)
+_OPEN_NEXT_TAG_RE = re.compile(r"\[(?:N(?:e(?:x(?:t(?::[^\]]*)?)?)?)?)?$", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class StopPolicy:
+    """
+    生成の打ち切り条件。
+    - stop_sequences: サーバ側へ押し下げる停止文字列（Ollama options.stop / OpenAI stop）
+    - max_sentences / max_chars / stop_on_next_tag: クライアント側で判定し、満たした時点で上流リクエストを閉じる
+    - next_tag_grace_chars: stop_on_next_tag と併用。文数/文字数に達しても [Next:] は応答末尾に来るため、
+      そこからさらにこの文字数までは読み続けて指名タグを待つ（0 なら達した時点で止める）
+    - text_filter: 判定前に生テキストへ適用する整形（<think> 除去や前置き除去など、呼び出し側の都合）
+    """
+    max_sentences: Optional[int] = None
+    max_chars: Optional[int] = None
+    stop_on_next_tag: bool = False
+    stop_sequences: Tuple[str, ...] = ()
+    next_tag_grace_chars: int = 0
+    text_filter: Optional[Callable[[str], str]] = field(default=None, compare=False)
+
+    @property
+    def needs_client_side(self) -> bool:
+        return bool(self.max_sentences or self.max_chars or self.stop_on_next_tag)
+
+    def server_stop(self, limit: Optional[int] = None) -> List[str]:
+        seqs = [s for s in self.stop_sequences if s]
+        return seqs[:limit] if limit else seqs
+
+    def is_satisfied(self, text: str) -> bool:
+        """累積テキストが打ち切り条件を満たしたかを返す。"""
+        if not text:
+            return False
+        if self.stop_on_next_tag and _NEXT_TAG_RE.search(text):
+            return True
+        if not self._budget_reached(text):
+            return False
+        grace = self.next_tag_grace_chars if self.stop_on_next_tag else 0
+        if grace <= 0:
+            return True
+        # 予算到達から grace 文字（書きかけの [Next: があれば 2 倍）読むまでは止めない
+        if _OPEN_NEXT_TAG_RE.search(text):
+            grace *= 2
+        return len(text) > grace and self._budget_reached(text[:-grace])
+
+    def _budget_reached(self, text: str) -> bool:
+        s = self.text_filter(text) if self.text_filter else text.strip()
+        if not s:
+            return False
+        if self.max_chars and len(s) >= self.max_chars:
+            return True
+        if self.max_sentences:
+            complete_sentences = len(_SENTENCE_SPLIT_RE.split(s)) - 1
+            if complete_sentences >= self.max_sentences:
+                return True
+        return False
@@ -0,0 +1,38 @@
+import importlib
+import importlib.abc
+import importlib.util
+import os
+import sys
+
+# LLM 配下のモジュールは互いに LLM ディレクトリ直下のモジュールとして import し合う（from deadline import ...）。
+# テストは LLM.xxx として import するので、そのままだと同じファイルが 2 回読み込まれ、
+# 設定やメトリクスのシングルトン・ContextVar が別物になる。
+# LLM ディレクトリ（と KB）をパスに載せ、LLM.xxx は直下として読み込んだモジュールそのものを返すようにする。
+
+_LLM_DIR = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+_KB_DIR = os.path.abspath(os.path.join(_LLM_DIR, "..", "KB"))
+for _path in (_LLM_DIR, _KB_DIR):
+    if _path not in sys.path:
+        sys.path.append(_path)
+
+
+class _FlatModuleAlias(importlib.abc.MetaPathFinder, importlib.abc.Loader):
+    """LLM.<name> の import を、LLM ディレクトリ直下の <name> モジュールに振り向ける。"""
+
+    def find_spec(self, fullname, path=None, target=None):
+        package, _, name = fullname.partition(".")
+        if package != "LLM" or not name or "." in name:
+            return None
+        if not os.path.isfile(os.path.join(_LLM_DIR, name + ".py")):
+            return None
+        return importlib.util.spec_from_loader(fullname, self)
+
+    def create_module(self, spec):
+        return importlib.import_module(spec.name.partition(".")[2])
+
+    def exec_module(self, module):
+        pass  # 直下として読み込んだ時点で実行済み
+
+
+if not any(isinstance(f, _FlatModuleAlias) for f in sys.meta_path):
+    sys.meta_path.insert(0, _FlatModuleAlias())
@@ -0,0 +1,80 @@
+import os
+import tempfile
+import time
+import unittest
+
+from LLM.config_service import ConfigService
+
+
+def _write(path, text, mtime=None):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    if mtime is not None:
+        os.utime(path, (mtime, mtime))
+
+
+class ConfigServiceTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        d = self.tmp.name
+        self.paths = {
+            "app": os.path.join(d, "config.yaml"),
+            "kb": os.path.join(d, "kb.yaml"),
+            "global_rules": os.path.join(d, "global_rules.yaml"),
+            "personas": os.path.join(d, "personas.yaml"),
+            "user_profile": os.path.join(d, "user_profile.yaml"),
+        }
+        _write(self.paths["app"], (
+            "characters:\n  - name: A\n    display_name: エー\n"
+            "conversation:\n  auto_loops: 2\n  streaming:\n    enabled: false\n"
+            "kb:\n  ingest_mode: true\n"
+        ), mtime=1000)
+        _write(self.paths["kb"], "db_path: media.db\nmax_auto_next: 5\n")
+        _write(self.paths["personas"], "a:\n  name: エー\n  system_prompt: こんにちは\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_typed_snapshot(self):
+        cfg = ConfigService(self.paths).get()
+        self.assertEqual(cfg.app.characters[0]["display_name"], "エー")
+        self.assertEqual(cfg.app.conversation.auto_loops, 2)
+        self.assertFalse(cfg.app.conversation.streaming_enabled)
+        self.assertTrue(cfg.app.conversation.stop_at_budget)
+        self.assertEqual(cfg.kb.max_auto_next, 5)
+        self.assertTrue(os.path.isabs(cfg.kb.db_path))
+        self.assertEqual(cfg.kb_ingest_db_path, cfg.kb.db_path)
+        self.assertEqual(cfg.personas, {"エー": "こんにちは"})
+        self.assertEqual(dict(cfg.user_profile), {})
+        with self.assertRaises(TypeError):
+            cfg.app.raw["characters"] = []
+
+    def test_reload_on_mtime_change(self):
+        service = ConfigService(self.paths, check_interval_sec=0)
+        first = service.get()
+        self.assertIs(service.get(), first)
+
+        _write(self.paths["app"], "conversation:\n  auto_loops: 7\n", mtime=2000)
+        second = service.get()
+        self.assertIsNot(second, first)
+        self.assertEqual(second.app.conversation.auto_loops, 7)
+        self.assertEqual(second.version, first.version + 1)
+        # 変更のないファイルは読み直さない
+        self.assertIs(second.global_rules, first.global_rules)
+
+    def test_check_interval_throttles_stat(self):
+        service = ConfigService(self.paths, check_interval_sec=3600)
+        first = service.get()
+        _write(self.paths["app"], "conversation:\n  auto_loops: 7\n", mtime=2000)
+        self.assertIs(service.get(), first)
+        self.assertEqual(service.refresh().app.conversation.auto_loops, 7)
+
+    def test_broken_file_keeps_previous_values(self):
+        service = ConfigService(self.paths, check_interval_sec=0)
+        service.get()
+        _write(self.paths["app"], "conversation: [unclosed\n", mtime=3000)
+        self.assertEqual(service.get().app.conversation.auto_loops, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,102 @@
+import asyncio
+import os
+import re
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from LLM import log_manager as lm
+
+
+def _legacy_history(filename, max_lines=50):
+    lm.flush_logs()
+    with open(filename, 'r', encoding='utf-8') as f:
+        lines = f.readlines()[-max_lines:]
+    pattern = re.compile(r"\[.*?\] \[(?!System)(.*?)\] (.*)")
+    out = []
+    for line in lines:
+        m = pattern.match(line)
+        if m:
+            out.append(f"{m.group(1)}: {m.group(2).strip()}")
+    return "\n".join(out)
+
+
+class ConversationHistoryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.log = os.path.join(self.tmpdir.name, "conversation_test.log")
+
+    def tearDown(self):
+        lm.release_conversation_history(self.log)
+        self.tmpdir.cleanup()
+
+    def _write_many(self, n):
+        for i in range(n):
+            speaker = "System" if i % 7 == 0 else ("USER" if i % 2 else "ルミナ")
+            message = f"発言{i}" if i % 11 else f"複数行{i}\n続き{i}"
+            lm.write_log(self.log, speaker, message)
+
+    def test_matches_file_parse(self):
+        self.assertEqual(lm.get_formatted_conversation_history(self.log), "")
+        self._write_many(120)
+        self.assertEqual(lm.get_formatted_conversation_history(self.log), _legacy_history(self.log))
+
+    def test_reload_from_tail(self):
+        self._write_many(500)
+        lm.release_conversation_history(self.log)
+        history = lm.ConversationHistory(50)
+        history.reload_from_tail(self.log)
+        self.assertEqual(history.format(), _legacy_history(self.log))
+
+    def test_async_load_does_not_block_loop(self):
+        self._write_many(30)
+        lm.release_conversation_history(self.log)
+        released = threading.Event()
+        real_flush = lm._writer.flush
+
+        def slow_flush(timeout=5.0):
+            # ループ側のコルーチンが released を立てるまで待つ（ループを止めていれば待ちきれない）
+            self.assertTrue(released.wait(2.0))
+            real_flush(timeout)
+
+        async def scenario():
+            task = asyncio.create_task(lm.aload_conversation_history(self.log))
+            await asyncio.sleep(0)
+            released.set()
+            return await task
+
+        with mock.patch.object(lm._writer, "flush", side_effect=slow_flush):
+            history = asyncio.run(scenario())
+        self.assertEqual(history.format(), _legacy_history(self.log))
+        self.assertIs(lm.get_conversation_history(self.log), history)
+
+
+class OperationLogTest(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.log = os.path.join(self.tmpdir.name, "operation_test.log")
+
+    def tearDown(self):
+        lm.configure_logging(operation_level="INFO")
+        lm.close_log_file(self.log)
+        lm.flush_logs()
+        self.tmpdir.cleanup()
+
+    def test_level_filter_skips_formatting(self):
+        class Exploding:
+            def __str__(self):
+                raise AssertionError("formatted while filtered")
+
+        lm.configure_logging(operation_level="WARNING")
+        lm.write_operation_log(self.log, "INFO", "Test", "Getting LLM for %s.", Exploding())
+        lm.write_operation_log(self.log, "WARNING", "Test", "kept %s %d", "a", 1)
+        lm.write_operation_log(self.log, "ERROR", "Test", "literal 100% without args")
+        content = lm.read_log(self.log)
+        self.assertNotIn("Getting LLM", content)
+        self.assertIn("[WARNING] [Test] kept a 1", content)
+        self.assertIn("literal 100% without args", content)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,185 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+import httpx
+
+from LLM.endpoint_pool import CircuitOpenError, EndpointPool, character_circuit_state, character_endpoints, get_endpoint_pool
+from LLM.deadline import llm_deadline, remaining_time
+from LLM.llm_factory import AsyncOllamaClient, llm_call_stats
+
+
+class EndpointPoolTest(unittest.TestCase):
+    def test_character_endpoints_accepts_string_or_list(self):
+        self.assertEqual(character_endpoints({"base_url": "http://a/"}), ("http://a",))
+        self.assertEqual(character_endpoints({"base_url": ["http://a", "http://b", "http://a"]}), ("http://a", "http://b"))
+        self.assertEqual(character_endpoints({}, "http://d"), ("http://d",))
+
+    def test_least_outstanding_and_unhealthy_skip(self):
+        pool = EndpointPool(["http://a", "http://b"])
+        first = pool.pick()
+        second = pool.pick()
+        self.assertNotEqual(first.url, second.url)
+        pool.release(first)
+        pool.release(second)
+        pool.record_failure(pool.get("http://a"))
+        self.assertEqual({pool.pick().url for _ in range(3)}, {"http://b"})
+        # 遮断中（unhealthy）のエンドポイントは、他が混んでいても選ばない
+        with mock.patch("LLM.endpoint_pool.breaker_settings", return_value={"failure_threshold": 1, "open_sec": 60.0, "max_open_sec": 60.0}):
+            pool.record_failure(pool.get("http://a"))
+        self.assertFalse(pool.get("http://a").healthy)
+        self.assertEqual({pool.pick().url for _ in range(3)}, {"http://b"})
+        self.assertIsNone(pool.pick(exclude=["http://b"], strict=True))
+        for _ in range(6):
+            pool.release(pool.get("http://b"))
+        pool.set_healthy("http://a", True)
+        # 全滅時も除外分以外から選ぶ
+        pool.record_failure(pool.get("http://b"))
+        self.assertEqual(pool.pick(exclude=["http://b"]).url, "http://a")
+
+    def test_character_circuit_state_reads_existing_pool_only(self):
+        cfg = {"provider": "ollama", "base_url": ["http://circuit-a:1", "http://circuit-b:1"]}
+        self.assertIsNone(character_circuit_state(cfg))
+        pool = get_endpoint_pool(("http://circuit-a:1", "http://circuit-b:1"))
+        self.assertEqual(character_circuit_state(cfg), "closed")
+        pool.set_healthy("http://circuit-a:1", False)
+        pool.set_healthy("http://circuit-b:1", False)
+        self.assertEqual(character_circuit_state(cfg), "open")
+
+    def test_readiness_timeout_counts_as_one_failure(self):
+        pool = EndpointPool(["http://a"])
+        ep = pool.get("http://a")
+        settings = {"failure_threshold": 2, "open_sec": 10.0, "max_open_sec": 40.0}
+        with mock.patch("LLM.endpoint_pool.breaker_settings", return_value=settings):
+            # ロード待ちで 1 回応答しなかっただけでは遮断しない
+            pool.record_readiness("http://a", False)
+            self.assertEqual((ep.state, ep.consecutive_failures), ("closed", 1))
+            pool.record_readiness("http://a", False)
+            self.assertEqual((ep.state, ep.open_count), ("open", 1))
+            # 遮断中の再チェック（再接続など）では遮断時間を延ばさない
+            open_until = ep.open_until
+            pool.record_readiness("http://a", False)
+            self.assertEqual((ep.open_count, ep.open_until), (1, open_until))
+            pool.record_readiness("http://a", True)
+            self.assertEqual((ep.state, ep.consecutive_failures, ep.open_count), ("closed", 0, 0))
+
+    def test_circuit_opens_after_threshold_and_backs_off(self):
+        pool = EndpointPool(["http://a"])
+        ep = pool.get("http://a")
+        settings = {"failure_threshold": 2, "open_sec": 10.0, "max_open_sec": 15.0}
+        with mock.patch("LLM.endpoint_pool.breaker_settings", return_value=settings):
+            pool.record_failure(ep)
+            self.assertEqual(pool.circuit_state(), "closed")
+            pool.record_failure(ep)
+            self.assertEqual(pool.circuit_state(), "open")
+            with self.assertRaises(CircuitOpenError):
+                pool.pick()
+            # 遮断時間明けの試行（half_open）が失敗すると、より長く遮断する
+            ep.open_until = 0.0
+            self.assertIs(pool.pick(), ep)
+            self.assertEqual(ep.state, "half_open")
+            pool.record_failure(ep)
+            pool.release(ep)
+            self.assertEqual(ep.state, "open")
+            self.assertGreater(ep.open_until - time.monotonic(), 14.0)
+            ep.open_until = 0.0
+            pool.pick()
+            pool.record_success(ep, 0.1)
+            pool.release(ep)
+        self.assertEqual((pool.circuit_state(), ep.consecutive_failures), ("closed", 0))
+
+    def test_ewma_prefers_faster_endpoint(self):
+        pool = EndpointPool(["http://a", "http://b"])
+        pool.record_success(pool.get("http://a"), 2.0)
+        pool.record_success(pool.get("http://b"), 0.2)
+        self.assertEqual(pool.pick("ewma").url, "http://b")
+
+
+class OllamaFailoverTest(unittest.TestCase):
+    def test_connection_error_fails_over_to_next_endpoint(self):
+        def handler(request):
+            if request.url.host == "down":
+                raise httpx.ConnectError("refused", request=request)
+            return httpx.Response(200, json={"response": "ok", "done": True})
+
+        async def run():
+            http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            client = AsyncOllamaClient(["http://down:1", "http://up:1"], "m")
+            stats = {}
+            token = llm_call_stats.set(stats)
+            try:
+                with mock.patch("LLM.llm_factory.get_http_client", return_value=http):
+                    text = await client.ainvoke("sys", "hi")
+                    deltas = [d async for d in client.astream("sys", "hi")]
+            finally:
+                llm_call_stats.reset(token)
+                await http.aclose()
+            return client, text, deltas, stats
+
+        client, text, deltas, stats = asyncio.run(run())
+        self.assertEqual(text, "ok")
+        self.assertEqual(deltas, ["ok"])
+        self.assertEqual(stats["endpoint"], "http://up:1")
+        self.assertEqual(client.pool.get("http://down:1").consecutive_failures, 1)
+        self.assertEqual(client.pool.get("http://up:1").outstanding, 0)
+
+
+class HedgingTest(unittest.TestCase):
+    def test_nested_deadline_keeps_the_earlier_one(self):
+        self.assertIsNone(remaining_time())
+        client = AsyncOllamaClient("http://x", "m")
+        with llm_deadline(5.0):
+            with llm_deadline(60.0) as left:
+                self.assertLessEqual(left, 5.0)
+            self.assertLessEqual(remaining_time(70.0), 5.0)
+            # HTTP タイムアウトも残り時間まで縮む
+            self.assertLessEqual(client._request_timeout().read, 5.0)
+
+    def test_slow_primary_is_hedged_and_cancelled(self):
+        cancelled = []
+
+        async def handler(request):
+            if request.url.host == "slow":
+                try:
+                    await asyncio.sleep(2.0)
+                except asyncio.CancelledError:
+                    cancelled.append(request.url.host)
+                    raise
+            return httpx.Response(200, content=b'{"response": "ok", "done": true}\n')
+
+        settings = {"enabled": True, "quantile": 0.95, "min_samples": 5, "min_delay_sec": 0.05}
+
+        async def run():
+            http = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+            client = AsyncOllamaClient(["http://slow:2", "http://fast:2"], "m")
+            slow, fast = client.pool.get("http://slow:2"), client.pool.get("http://fast:2")
+            for kind in ("invoke", "ttft"):
+                for _ in range(5):
+                    client.pool.record_success(slow, 0.05, kind)
+            # 振り分けでは slow が先に選ばれるようにする
+            fast.ewma_ms = 1000.0
+            stats = {}
+            token = llm_call_stats.set(stats)
+            try:
+                with mock.patch("LLM.llm_factory.get_http_client", return_value=http), \
+                        mock.patch("LLM.llm_factory.hedge_settings", return_value=settings):
+                    with llm_deadline(10.0):
+                        text = await client.ainvoke("sys", "hi")
+                        deltas = [d async for d in client.astream("sys", "hi")]
+            finally:
+                llm_call_stats.reset(token)
+                await http.aclose()
+            return client, text, deltas, stats
+
+        client, text, deltas, stats = asyncio.run(run())
+        self.assertEqual(text, "ok")
+        self.assertEqual(deltas, ["ok"])
+        self.assertTrue(stats.get("hedged"))
+        self.assertEqual(stats["endpoint"], "http://fast:2")
+        self.assertEqual(cancelled, ["slow", "slow"])
+        self.assertEqual([ep.outstanding for ep in client.pool.endpoints], [0, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,93 @@
+import asyncio
+import time
+import unittest
+from unittest import mock
+
+import httpx
+
+from LLM.fetch_scheduler import DEFAULT_FETCH_SCHEDULER_SETTINGS, FetchScheduler, parse_retry_after
+
+
+def _settings(**overrides):
+    return dict(DEFAULT_FETCH_SCHEDULER_SETTINGS, backoff_base_sec=0.01, **overrides)
+
+
+class FetchSchedulerTest(unittest.TestCase):
+    def _run(self, settings, handler, urls):
+        sent = []
+
+        async def recording(request):
+            sent.append((time.monotonic(), request.url.host))
+            return await handler(request)
+
+        async def run():
+            http = httpx.AsyncClient(transport=httpx.MockTransport(recording))
+            scheduler = FetchScheduler()
+            try:
+                with mock.patch("LLM.fetch_scheduler.fetch_scheduler_settings", return_value=settings):
+                    return await asyncio.gather(*(scheduler.get(http, u) for u in urls))
+            finally:
+                await http.aclose()
+
+        return asyncio.run(run()), sent
+
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("3"), 3.0)
+        self.assertAlmostEqual(parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT"), 0.0)
+        self.assertIsNone(parse_retry_after("soon"))
+
+    def test_token_bucket_spaces_requests_per_host(self):
+        async def ok(request):
+            return httpx.Response(200)
+
+        started = time.monotonic()
+        responses, sent = self._run(_settings(rate_per_sec=20.0, burst=1), ok, [f"http://a/{i}" for i in range(4)])
+        self.assertEqual([r.status_code for r in responses], [200] * 4)
+        # 1 件目は即時、以降は 1/20 秒ずつ
+        self.assertGreaterEqual(sent[-1][0] - started, 0.14)
+
+    def test_peak_in_flight_stays_under_the_limit_per_host(self):
+        active = {}
+        peak = {}
+
+        async def slow(request):
+            host = request.url.host
+            active[host] = active.get(host, 0) + 1
+            peak[host] = max(peak.get(host, 0), active[host])
+            try:
+                await asyncio.sleep(0.02)
+                return httpx.Response(200)
+            finally:
+                active[host] -= 1
+
+        urls = [f"http://{h}/{i}" for i in range(6) for h in ("a", "b")]
+        responses, _ = self._run(_settings(rate_per_sec=0.0, max_in_flight=2), slow, urls)
+        self.assertEqual([r.status_code for r in responses], [200] * len(urls))
+        # ホストごとに上限まで並行し、超えない
+        self.assertEqual(peak, {"a": 2, "b": 2})
+
+    def test_429_retry_after_pauses_the_host(self):
+        calls = {"n": 0}
+
+        async def throttled_once(request):
+            calls["n"] += 1
+            if calls["n"] == 1:
+                return httpx.Response(429, headers={"Retry-After": "0.2"})
+            return httpx.Response(200)
+
+        started = time.monotonic()
+        (response,), sent = self._run(_settings(rate_per_sec=0), throttled_once, ["http://a/x"])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(sent), 2)
+        self.assertGreaterEqual(sent[1][0] - started, 0.2)
+
+    def test_gives_up_after_max_retries(self):
+        async def down(request):
+            raise httpx.ConnectError("refused", request=request)
+
+        with self.assertRaises(httpx.ConnectError):
+            self._run(_settings(rate_per_sec=0, max_retries=1), down, ["http://a/x"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+import re
+import unittest
+
+from LLM import ingest_mode
+from LLM.html_scan import scan_html
+
+_PAGE = """<!DOCTYPE html><html><head>
+<title>国宝 : 作品情報 - 映画.com</title>
+<meta content="国宝" property="og:title">
+<meta name="description" content="歌舞伎の世界を描く。">
+<script>var s = '<a href="/movie/9/">スクリプト内</a>';</script>
+<script type="application/ld+json">{"@type": "Movie", "name": "国宝", "director": {"name": "李相日"}}</script>
+<style>.a > b { color: red }</style>
+</head><body>
+<!-- <a href="/movie/8/">コメント</a> -->
+<a href="/movie/100/"><span>作品&amp;A</span>
+</a><a class="x" href='/person/7/'>吉沢 亮</a>
+<p>出演: 吉沢亮、横浜流星<br>2025年公開。</p>
+<a href="/person/7/movie/2/">2</a>
+</body></html>"""
+
+
+# 走査を共有する前の正規表現による抽出（一致確認用）
+def _legacy_strip_html(html):
+    s = re.sub(r"<script[\s\S]*?</script>", " ", html, flags=re.IGNORECASE)
+    s = re.sub(r"<style[\s\S]*?</style>", " ", s, flags=re.IGNORECASE)
+    s = re.sub(r"<[^>]+>", " ", s)
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def _legacy_movie_entries(html):
+    entries, seen = [], set()
+    for _href, mid, inner in re.findall(r"<a[^>]+href=\"(/movie/(\d+)/)\"[^>]*>([\s\S]*?)</a>", html, re.IGNORECASE):
+        title = ingest_mode.sanitize_query(_legacy_strip_html(inner))
+        if title and (title, mid) not in seen:
+            seen.add((title, mid))
+            entries.append({"title": title, "movie_id": mid})
+    return entries
+
+
+def _legacy_titles(html, href_re):
+    titles = []
+    for inner in re.findall(r"<a[^>]+href=\"(?:" + href_re + r")\"[^>]*>([\s\S]*?)</a>", html, re.IGNORECASE):
+        text = ingest_mode.sanitize_query(_legacy_strip_html(inner))
+        if text and text not in titles:
+            titles.append(text)
+    return titles
+
+
+def _legacy_cast_pairs(html):
+    pairs = []
+    for href, inner in re.findall(r"<a[^>]*href=\"(/person/\d+/)\"[^>]*>([\s\S]*?)</a>", html, re.IGNORECASE):
+        name = ingest_mode.sanitize_query(_legacy_strip_html(inner))
+        if name and len(name) <= 40:
+            pairs.append({"name": name, "person_id": re.search(r"/person/(\d+)/", href).group(1)})
+    return pairs
+
+
+def _legacy_meta_title(html):
+    m = re.search(r"<meta[^>]*property=\"og:title\"[^>]*content=\"([^\"]+)\"", html, re.IGNORECASE)
+    return m.group(1).strip() if m else ""
+
+
+# 引用符が属性値の区切り以外の位置に現れるマークアップ
+_ADVERSARIAL = """<html><head><meta property="og:title" content="Tom's 作品"></head><body>
+<p>It's "quoted text with an unbalanced quote</p>
+<a href="/movie/1/">作品A</a>
+<img alt=it's a "x" src=x.png>
+<a href="/movie/2/"><span>作品B</span><br></a> it's <A HREF="/movie/3/" class=c>作品C</A>
+<!-- don't "close -->
+<a title="Jerry's" data-x=1 href="/movie/5/">作品D</a> 5'10" の俳優
+<a href="/person/11/">出演者 一</a> <a href="/person/12/" rel=it's>出演者 二</a>
+<a href="/drama/21/">ドラマA</a> <a href="/tv/show-b/">ドラマB</a> O'Brien
+<a href="/movie/1/">作品A</a>
+</body></html>"""
+
+
+class HtmlScanTest(unittest.TestCase):
+    def test_single_pass_collects_page_parts(self):
+        page = scan_html(_PAGE)
+        self.assertEqual([(a.href, a.text) for a in page.anchors],
+                         [("/movie/100/", "作品&A"), ("/person/7/", "吉沢 亮"), ("/person/7/movie/2/", "2")])
+        self.assertEqual(page.meta, {"og:title": "国宝", "description": "歌舞伎の世界を描く。"})
+        self.assertEqual(page.title, "国宝 : 作品情報 - 映画.com")
+        self.assertEqual(len(page.json_ld), 1)
+        self.assertEqual(page.paragraphs, ("出演: 吉沢亮、横浜流星 2025年公開。",))
+        # script/style/コメントの中身は本文に入らない
+        self.assertNotIn("スクリプト内", page.text)
+        self.assertNotIn("color", page.text)
+        self.assertNotIn("コメント", page.text)
+        self.assertIs(scan_html(_PAGE), page)
+
+    def test_extractors_share_the_scan(self):
+        data = ingest_mode.deep_extract_from_page("https://eiga.com/movie/100/", _PAGE)
+        self.assertEqual(data["title"], "国宝")
+        self.assertEqual(data["director"], ["李相日"])
+        self.assertIn("吉沢亮", data["actor"])
+        self.assertEqual(data["cast_pairs"], [{"name": "吉沢 亮", "person_id": "7"}])
+        self.assertEqual(ingest_mode._extract_movie_entries_from_person_movie_html(_PAGE), [{"title": "作品&A", "movie_id": "100"}])
+        self.assertEqual(ingest_mode._pager_last_page(_PAGE, "https://eiga.com/person/7/movie/"), 2)
+
+    def test_stray_quotes_do_not_swallow_markup(self):
+        page = scan_html(_ADVERSARIAL)
+        self.assertEqual([a.href for a in page.anchors], [
+            "/movie/1/", "/movie/2/", "/movie/3/", "/movie/5/", "/person/11/", "/person/12/",
+            "/drama/21/", "/tv/show-b/", "/movie/1/",
+        ])
+        self.assertIn("It's \"quoted text", page.text)
+        self.assertIn("O'Brien", page.text)
+
+    def test_matches_legacy_extractors_on_adversarial_markup(self):
+        html = _ADVERSARIAL
+        self.assertEqual(ingest_mode._extract_movie_entries_from_person_movie_html(html), _legacy_movie_entries(html))
+        self.assertEqual(ingest_mode._extract_movie_titles_from_person_movie_html(html), _legacy_titles(html, r"/movie/\d+/"))
+        self.assertEqual(ingest_mode._extract_drama_titles_from_person_drama_html(html), _legacy_titles(html, r"/drama/\d+/|/tv/[^\"]+/"))
+        self.assertEqual(ingest_mode.deep_extract_from_page("https://eiga.com/movie/1/", html)["cast_pairs"], _legacy_cast_pairs(html))
+        self.assertEqual(ingest_mode._extract_meta_title(html), _legacy_meta_title(html))
+
+
+if __name__ == "__main__":
+    unittest.main()
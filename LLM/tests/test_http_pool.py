@@ -0,0 +1,54 @@
+import asyncio
+import unittest
+
+from LLM import http_pool
+
+
+class HttpPoolTest(unittest.TestCase):
+    def setUp(self):
+        http_pool.configure_http_pool({"max_connections": 3, "max_keepalive_connections": 2, "http2": False})
+
+    def tearDown(self):
+        http_pool._clients.clear()
+        http_pool._pool_settings = None
+
+    def test_client_is_reused_per_origin_with_configured_limits(self):
+        async def run():
+            a1 = http_pool.get_http_client("http://ollama-a:11434/api/generate")
+            a2 = http_pool.get_http_client("HTTP://OLLAMA-A:11434/api/chat")
+            b = http_pool.get_http_client("http://ollama-b:11434/")
+            try:
+                return a1, a2, b
+            finally:
+                await http_pool.aclose_http_clients()
+
+        a1, a2, b = asyncio.run(run())
+        self.assertIs(a1, a2)
+        self.assertIsNot(a1, b)
+        pool = a1._transport._pool
+        self.assertEqual((pool._max_connections, pool._max_keepalive_connections), (3, 2))
+
+    def test_close_and_new_event_loop_rebuild_the_client(self):
+        async def first():
+            client = http_pool.get_http_client("http://x:1/")
+            await http_pool.aclose_http_clients()
+            return client
+
+        async def second():
+            client = http_pool.get_http_client("http://x:1/")
+            again = http_pool.get_http_client("http://x:1/")
+            await http_pool.aclose_http_clients()
+            return client, again
+
+        closed = asyncio.run(first())
+        self.assertTrue(closed.is_closed)
+        self.assertEqual(http_pool._clients, {})
+        # 閉じた後や別ループでは作り直し、同じループ内では再利用する
+        client, again = asyncio.run(second())
+        self.assertIsNot(client, closed)
+        self.assertIs(client, again)
+        self.assertTrue(client.is_closed)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,57 @@
+import asyncio
+import unittest
+from unittest import mock
+
+from LLM import ingest_mode
+
+_BASE = "https://eiga.com/person/100/"
+
+
+def _movie_page(page, last):
+    pager = "".join(f'<a href="/person/100/movie/{p}/">{p}</a>' for p in range(2, last + 1))
+    items = "".join(f'<a href="/movie/{page * 10 + i}/"><span>作品{page}-{i}</span></a>' for i in range(2))
+    return f"<html>{items}<div class=\"pager\">{pager}</div></html>"
+
+
+class PersonCrawlTest(unittest.TestCase):
+    def _run(self, pages, last_in_pager):
+        fetched = []
+        active = {"now": 0, "max": 0}
+
+        async def fake_fetch(url):
+            fetched.append(url)
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+            try:
+                await asyncio.sleep(0.02)
+                page = int(url.rstrip("/").rsplit("/", 1)[-1]) if not url.endswith("/movie/") else 1
+                if page > pages:
+                    raise RuntimeError("404")
+                return _movie_page(page, last_in_pager(page))
+            finally:
+                active["now"] -= 1
+
+        with mock.patch.object(ingest_mode, "_fetch_text", fake_fetch):
+            result = asyncio.run(ingest_mode._fetch_person_movies(_BASE))
+        return result, fetched, active["max"]
+
+    def test_pages_from_pager_are_fetched_concurrently_in_one_pass(self):
+        (entries, titles, page_count), fetched, peak = self._run(6, lambda p: 6)
+        self.assertEqual(page_count, 6)
+        self.assertEqual(len(fetched), 6)
+        self.assertEqual(titles[:2], ["作品1-0", "作品1-1"])
+        self.assertEqual(titles[-1], "作品6-1")
+        self.assertEqual([e["movie_id"] for e in entries], [str(p * 10 + i) for p in range(1, 7) for i in range(2)])
+        self.assertGreater(peak, 1)
+
+    def test_windowed_pager_and_missing_pager(self):
+        # ページャが 2 ページ先までしか出さない場合も最後まで辿る
+        (_e, titles, page_count), _f, _p = self._run(5, lambda p: min(5, p + 2))
+        self.assertEqual((page_count, titles[-1]), (5, "作品5-1"))
+        # ページャ無し: 1 ページずつ辿り、取得できなかったページで止める
+        (_e, titles, page_count), fetched, peak = self._run(3, lambda p: 1)
+        self.assertEqual((page_count, len(fetched), peak), (3, 4, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,83 @@
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from LLM import ingest_mode
+
+
+def _hit(url):
+    return {"title": url, "url": url, "snippet": ""}
+
+
+class SearchPlanTest(unittest.TestCase):
+    def test_plan_runs_concurrently_and_merges_in_plan_order(self):
+        # 先頭 SEARCH_CONCURRENCY 件が同時に走っていなければ待ち合わせが成立しない（直列なら BrokenBarrierError）
+        barrier = threading.Barrier(ingest_mode.SEARCH_CONCURRENCY, timeout=5.0)
+        lock = threading.Lock()
+        state = {"in_flight": 0, "peak": 0, "calls": 0}
+
+        def fake_search(q, region="jp-jp", max_results=10, safesearch="moderate"):
+            with lock:
+                state["calls"] += 1
+                first_wave = state["calls"] <= ingest_mode.SEARCH_CONCURRENCY
+                state["in_flight"] += 1
+                state["peak"] = max(state["peak"], state["in_flight"])
+            try:
+                if first_wave:
+                    barrier.wait()
+                suffix = q.split(" ", 1)[1]
+                # 上位クエリほど遅く返す（統合が完了順ではなく計画順になることを見る）
+                if suffix == "site:eiga.com/person":
+                    time.sleep(0.05)
+                return [_hit(f"https://eiga.com/{suffix.replace('/', '_').replace(' ', '_')}/{i}") for i in range(3)]
+            finally:
+                with lock:
+                    state["in_flight"] -= 1
+
+        async def run(tmp):
+            # 生検索結果の保存先（BASE_DIR/../logs/search）を一時ディレクトリへ
+            with mock.patch.object(ingest_mode, "search_text", fake_search), \
+                    mock.patch.object(ingest_mode, "build_deep_hints", mock.AsyncMock(return_value="")), \
+                    mock.patch.object(ingest_mode, "BASE_DIR", os.path.join(tmp, "LLM")):
+                return await ingest_mode.perform_web_search_and_hints("テスト", "映画")
+
+        with tempfile.TemporaryDirectory() as tmp:
+            hits, merged, *_rest, dump_path = asyncio.run(run(tmp))
+            with open(dump_path, encoding="utf-8") as f:
+                dump = json.load(f)
+        # 上位クエリ（遅い）のヒットが先頭に来る
+        self.assertTrue(merged[0]["url"].startswith("https://eiga.com/site:eiga.com_person/"))
+        self.assertEqual(len(merged), ingest_mode.MAX_HITS_TOTAL)
+        # 8 件に達した時点で打ち切る（統合に使うのは先頭 3 クエリまで）
+        self.assertEqual([r["plan_query"] for r in dump["per_query_results"]], dump["search_plan"][:3])
+        self.assertEqual(state["peak"], ingest_mode.SEARCH_CONCURRENCY)
+
+    def test_person_fallback_logs_each_query_when_issued(self):
+        events = []
+
+        def fake_search(q, region="jp-jp", max_results=10, safesearch="moderate"):
+            events.append(("search", q))
+            return []
+
+        async def run():
+            with mock.patch.object(ingest_mode, "search_text", fake_search), \
+                    mock.patch.object(ingest_mode, "SEARCH_CONCURRENCY", 1), \
+                    mock.patch.object(ingest_mode, "_search_eiga_person_url", mock.AsyncMock(return_value=None)):
+                return await ingest_mode.resolve_person_base_url_from_hits("テスト", [], lambda m: events.append(("log", m)))
+
+        self.assertIsNone(asyncio.run(run()))
+        # 1 件ずつ投げる設定では、2 件目のログは 1 件目の検索が終わってから出る
+        self.assertEqual(events, [
+            ("log", "Person fallback search: テスト site:eiga.com/person"),
+            ("search", "テスト site:eiga.com/person"),
+            ("log", 'Person fallback search: "テスト" site:eiga.com/person'),
+            ("search", '"テスト" site:eiga.com/person'),
+        ])
+
+if __name__ == "__main__":
+    unittest.main()
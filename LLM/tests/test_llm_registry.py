@@ -0,0 +1,37 @@
+import os
+import tempfile
+import unittest
+
+from LLM.character_manager import CharacterManager
+from LLM import llm_instance_manager as lim
+
+
+class SharedLLMRegistryTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.op_log = os.path.join(self.tmp.name, "operation.log")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_sessions_share_components_and_clients(self):
+        a = CharacterManager(os.path.join(self.tmp.name, "a.log"), self.op_log)
+        b = CharacterManager(os.path.join(self.tmp.name, "b.log"), self.op_log)
+        self.assertNotEqual(a.log_filename, b.log_filename)
+        self.assertIs(a.llm_manager, b.llm_manager)
+        self.assertIs(a.persona_manager, b.persona_manager)
+
+        name = a.get_character_names()[0]
+        llm = a.get_llm(name)
+        self.assertIsNotNone(llm)
+        self.assertIs(b.get_llm(name), llm)
+
+    def test_instance_key_follows_definition(self):
+        k1 = lim._instance_key("ollama", "m", None, {"temperature": 0.7}, "op")
+        self.assertEqual(k1, lim._instance_key("Ollama", "m", "", {"temperature": 0.7}, "op"))
+        self.assertNotEqual(k1, lim._instance_key("ollama", "m", None, {"temperature": 0.2}, "op"))
+        self.assertNotEqual(k1, lim._instance_key("ollama", "m2", None, {"temperature": 0.7}, "op"))
+
+
+if __name__ == "__main__":
+    unittest.main()
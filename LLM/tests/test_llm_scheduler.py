@@ -0,0 +1,66 @@
+import asyncio
+import unittest
+
+from LLM.llm_scheduler import BackendScheduler, llm_priority, current_priority
+
+
+class BackendSchedulerTest(unittest.TestCase):
+    def test_priority_then_round_robin_across_sessions(self):
+        async def run():
+            sched = BackendScheduler("http://x", max_concurrency=1, interactive_reserve=0)
+            order = []
+            await sched.acquire("interactive", "holder")
+
+            async def job(priority, session, tag):
+                await sched.acquire(priority, session)
+                order.append(tag)
+                await asyncio.sleep(0)
+                sched.release()
+
+            tasks = [
+                asyncio.create_task(job("ingest", "bulk", "ingest1")),
+                asyncio.create_task(job("interactive", "a", "a1")),
+                asyncio.create_task(job("interactive", "a", "a2")),
+                asyncio.create_task(job("interactive", "b", "b1")),
+                asyncio.create_task(job("kbcomplete", "a", "kb1")),
+            ]
+            await asyncio.sleep(0)
+            self.assertEqual(sched.waiting(), 5)
+            sched.release()
+            await asyncio.gather(*tasks)
+            return order
+
+        self.assertEqual(asyncio.run(run()), ["a1", "b1", "a2", "kb1", "ingest1"])
+
+    def test_interactive_reserve_and_cancellation(self):
+        async def run():
+            sched = BackendScheduler("http://x", max_concurrency=2, interactive_reserve=1)
+            await sched.acquire("ingest", "bulk")
+            waiter = asyncio.create_task(sched.acquire("ingest", "bulk"))
+            await asyncio.sleep(0)
+            # バックグラウンドは予約枠を使えないが、会話はすぐ通る
+            self.assertFalse(waiter.done())
+            await asyncio.wait_for(sched.acquire("interactive", "s"), timeout=1)
+            self.assertEqual(sched.inflight, 2)
+            waiter.cancel()
+            with self.assertRaises(asyncio.CancelledError):
+                await waiter
+            self.assertEqual(sched.waiting(), 0)
+            sched.release()
+            sched.release()
+            self.assertEqual(sched.inflight, 0)
+
+        asyncio.run(run())
+
+    def test_priority_scope(self):
+        self.assertEqual(current_priority(), "interactive")
+        with llm_priority("kbcomplete"):
+            with llm_priority("ingest", only_if_unset=True):
+                self.assertEqual(current_priority(), "kbcomplete")
+        with llm_priority("ingest", only_if_unset=True):
+            self.assertEqual(current_priority(), "ingest")
+        self.assertEqual(current_priority(), "interactive")
+
+
+if __name__ == "__main__":
+    unittest.main()
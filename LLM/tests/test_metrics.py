@@ -0,0 +1,59 @@
+import unittest
+
+from LLM import metrics
+from LLM.metrics import Counter, Gauge, Histogram, KbIngestRowTally, MetricsRegistry
+
+
+class MetricsTest(unittest.TestCase):
+    def test_text_exposition(self):
+        registry = MetricsRegistry()
+        calls = registry.counter("calls_total", "Calls.", ("model",))
+        open_sessions = registry.gauge("sessions_open", "Open sessions.")
+        latency = registry.histogram("latency_seconds", "Latency.", ("endpoint",), buckets=(0.1, 1.0))
+
+        calls.inc(model="a")
+        calls.labels(model='q"x').inc(2)
+        open_sessions.inc()
+        open_sessions.inc()
+        open_sessions.dec()
+        child = latency.labels(endpoint="/api/db/fts")
+        for v in (0.05, 0.5, 3.0):
+            child.observe(v)
+
+        text = registry.render()
+        self.assertIn("# TYPE calls_total counter", text)
+        self.assertIn('calls_total{model="a"} 1', text)
+        self.assertIn('calls_total{model="q\\"x"} 2', text)
+        self.assertIn("sessions_open 1", text)
+        self.assertIn('latency_seconds_bucket{endpoint="/api/db/fts",le="0.1"} 1', text)
+        self.assertIn('latency_seconds_bucket{endpoint="/api/db/fts",le="1"} 2', text)
+        self.assertIn('latency_seconds_bucket{endpoint="/api/db/fts",le="+Inf"} 3', text)
+        self.assertIn('latency_seconds_count{endpoint="/api/db/fts"} 3', text)
+        self.assertIn('latency_seconds_sum{endpoint="/api/db/fts"} 3.55', text)
+
+    def test_label_mismatch_raises(self):
+        c = Counter("c_total", "c", ("a",))
+        with self.assertRaises(ValueError):
+            c.inc(b="x")
+        g = Gauge("g", "g", ("a",))
+        g.set(5, a="x")
+        g.dec(2, a="x")
+        self.assertEqual(g.value(a="x"), 3)
+        self.assertEqual(Histogram("h", "h").count(), 0)
+
+    def test_kb_rows_counted_after_commit(self):
+        before = metrics.KB_ROWS_INSERTED.value(table="person")
+        tally = KbIngestRowTally()
+        tally("ADD person: 吉沢亮")
+        tally("SKIP duplicate person: 横浜流星")
+        tally("ADD person: 横浜流星")
+        # コミット前（ingest_payload の途中や、例外でロールバックされた場合）は数えない
+        self.assertEqual(metrics.KB_ROWS_INSERTED.value(table="person"), before)
+        tally.commit()
+        self.assertEqual(metrics.KB_ROWS_INSERTED.value(table="person"), before + 2)
+        tally.commit()
+        self.assertEqual(metrics.KB_ROWS_INSERTED.value(table="person"), before + 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,60 @@
+import asyncio
+import json
+import unittest
+
+import httpx
+
+from LLM.llm_factory import AsyncOllamaClient
+
+
+SYSTEM = "STATIC RULES\n- 履歴:\n" + "ユーザー: こんにちは\n\n## 指示\n応答して"
+PREFIX_LEN = len("STATIC RULES\n- 履歴:\n")
+
+
+class OllamaPayloadTest(unittest.TestCase):
+    def test_chat_keeps_static_prefix_as_system(self):
+        client = AsyncOllamaClient("http://x", "m", api="chat", keep_alive="30m")
+        payload = client._build_payload(SYSTEM, "質問", False, None, PREFIX_LEN)
+        self.assertEqual(client._url, "http://x/api/chat")
+        self.assertEqual(payload["keep_alive"], "30m")
+        system, user = payload["messages"]
+        self.assertEqual(system, {"role": "system", "content": SYSTEM[:PREFIX_LEN]})
+        self.assertTrue(user["content"].startswith("ユーザー: こんにちは"))
+        self.assertTrue(user["content"].endswith("質問"))
+        # 静的プレフィックス長が不明なら全体を system に置く
+        payload = client._build_payload(SYSTEM, "質問", False, None)
+        self.assertEqual(payload["messages"][0]["content"], SYSTEM)
+
+    def test_generate_default_is_unchanged(self):
+        client = AsyncOllamaClient("http://x", "m")
+        payload = client._build_payload(SYSTEM, "質問", True, None, PREFIX_LEN)
+        self.assertEqual(payload["prompt"], f"{SYSTEM}\n\n質問")
+        self.assertNotIn("keep_alive", payload)
+        self.assertNotIn("context", payload)
+
+    def test_carry_context_primes_prefix_once(self):
+        requests = []
+
+        def handler(request):
+            requests.append(json.loads(request.content))
+            return httpx.Response(200, json={"response": "", "done": True, "context": [1, 2, 3]})
+
+        async def run():
+            client = AsyncOllamaClient("http://x", "m", carry_context=True)
+            async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as http:
+                first = await client._prefix_context(http, SYSTEM, PREFIX_LEN)
+                second = await client._prefix_context(http, SYSTEM, PREFIX_LEN)
+            return client, first, second
+
+        client, first, second = asyncio.run(run())
+        self.assertEqual(first, [1, 2, 3])
+        self.assertIs(second, first)
+        self.assertEqual(len(requests), 1)
+        self.assertEqual(requests[0]["prompt"], SYSTEM[:PREFIX_LEN])
+        payload = client._build_payload(SYSTEM, "質問", False, None, PREFIX_LEN, first)
+        self.assertEqual(payload["context"], [1, 2, 3])
+        self.assertFalse(payload["prompt"].startswith("STATIC RULES"))
+
+
+if __name__ == "__main__":
+    unittest.main()
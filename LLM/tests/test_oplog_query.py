@@ -0,0 +1,43 @@
+import os
+import tempfile
+import unittest
+
+from LLM import log_manager as lm
+from LLM.oplog_query import iter_records, percentile, summarize
+
+
+class OplogQueryTest(unittest.TestCase):
+    def test_percentile_nearest_rank(self):
+        values = sorted(float(v) for v in range(1, 101))
+        self.assertEqual(percentile(values, 50), 50.0)
+        self.assertEqual(percentile(values, 95), 95.0)
+        self.assertEqual(percentile(values, 99), 99.0)
+        self.assertIsNone(percentile([], 50))
+
+    def test_summarize_structured_log(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            op_log = os.path.join(tmpdir, "operation_test.log")
+            sink = lm.enable_structured_log(op_log)
+            try:
+                for i in range(1, 21):
+                    lm.write_structured_log(op_log, "llm_call", model="m1", base_url="u", status="ok", gen_ms=float(i))
+                lm.write_structured_log(op_log, "llm_call", model="m1", base_url="u", status="timeout")
+                lm.write_structured_log(op_log, "llm_call", model="m2", base_url="u", status="error", error="boom")
+                lm.write_structured_log(op_log, "other", model="m1", base_url="u")
+                lm.flush_logs()
+                rows = summarize(iter_records([tmpdir]))
+            finally:
+                lm.disable_structured_log(op_log)
+                lm.flush_logs()
+        self.assertEqual(sink, os.path.join(tmpdir, "operation_test.jsonl"))
+        by_model = {r["model"]: r for r in rows}
+        self.assertEqual(by_model["m1"]["count"], 21)
+        self.assertAlmostEqual(by_model["m1"]["timeout_rate"], 1 / 21)
+        self.assertEqual(by_model["m1"]["p50"], 10.0)
+        self.assertEqual(by_model["m1"]["p99"], 20.0)
+        self.assertEqual(by_model["m2"]["error_rate"], 1.0)
+        self.assertIsNone(by_model["m2"]["p50"])
+
+
+if __name__ == "__main__":
+    unittest.main()
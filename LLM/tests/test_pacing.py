@@ -0,0 +1,54 @@
+import asyncio
+import json
+import unittest
+
+from LLM.pacing import PacingSettings, TurnPacer, parse_ack
+
+
+class _FakeWebSocket:
+    def __init__(self, incoming):
+        self.incoming = list(incoming)
+
+    async def receive_text(self):
+        if not self.incoming:
+            await asyncio.sleep(3600)
+        return self.incoming.pop(0)
+
+
+class PacingTest(unittest.TestCase):
+    def test_delay_modes(self):
+        self.assertEqual(PacingSettings.from_dict({"mode": "none"}).delay_for("abc"), 0.0)
+        self.assertEqual(PacingSettings.from_dict({"mode": "fixed", "fixed_sec": 0.5}).delay_for("abc"), 0.5)
+        prop = PacingSettings.from_dict({"mode": "proportional", "chars_per_sec": 10, "min_sec": 0.2, "max_sec": 3})
+        self.assertEqual(prop.delay_for("a" * 15), 1.5)
+        self.assertEqual(prop.delay_for(""), 0.2)
+        self.assertEqual(prop.delay_for("a" * 100), 3)
+        self.assertEqual(PacingSettings.from_dict({"mode": "bogus"}).mode, "fixed")
+
+    def test_client_ack_stashes_user_input(self):
+        ack = json.dumps({"type": "ack", "speaker": "ルミナ"})
+        ws = _FakeWebSocket(["途中の入力", ack, ack, "次の入力"])
+        pacer = TurnPacer(ws, PacingSettings(mode="client_ack", ack_timeout_sec=1.0))
+
+        async def run():
+            pacer.note_delivered("こんにちは。")
+            await pacer.wait_ready()
+            first = await pacer.receive_text()
+            second = await pacer.receive_text()
+            return first, second
+
+        self.assertEqual(asyncio.run(run()), ("途中の入力", "次の入力"))
+        self.assertIsNone(parse_ack("こんにちは"))
+
+    def test_ack_timeout(self):
+        pacer = TurnPacer(_FakeWebSocket([]), PacingSettings(mode="client_ack", ack_timeout_sec=0.05))
+
+        async def run():
+            pacer.note_delivered("x")
+            await pacer.wait_ready()
+
+        asyncio.run(asyncio.wait_for(run(), 1.0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,154 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import httpx
+
+from LLM import ingest_mode
+from LLM.page_cache import DEFAULT_PAGE_CACHE_SETTINGS, PageCache
+
+
+class PageCacheTest(unittest.TestCase):
+    def test_roundtrip_and_lru_byte_cap(self):
+        cache = PageCache(":memory:", max_bytes=0)
+        cache.put("http://a/", "あ" * 1000, etag='"v1"', last_modified="Mon, 01 Jan 2024 00:00:00 GMT")
+        page = cache.get("http://a/")
+        self.assertEqual(page.text, "あ" * 1000)
+        self.assertEqual(page.validators(), {"If-None-Match": '"v1"', "If-Modified-Since": "Mon, 01 Jan 2024 00:00:00 GMT"})
+        self.assertLess(cache.total_bytes(), 100)  # 圧縮して保存
+        # 上限を 2 件分にすると、最終参照の古いものから消える
+        cache.max_bytes = cache.total_bytes() * 2
+        cache.put("http://b/", "あ" * 1000)
+        cache.get("http://a/")
+        cache.put("http://c/", "あ" * 1000)
+        self.assertIsNone(cache.get("http://b/"))
+        self.assertEqual(len(cache), 2)
+        # 合計は都度集計せずに増減させている（置き換えた分も差し引く）
+        cache.put("http://c/", "い" * 10)
+        self.assertEqual(cache.total_bytes(), cache._conn.execute("SELECT SUM(size) FROM pages").fetchone()[0])
+        cache.close()
+
+    def test_access_time_is_written_lazily(self):
+        cache = PageCache(":memory:")
+        cache.put("http://a/", "本文")
+        written = cache._conn.execute("SELECT last_access FROM pages").fetchone()[0]
+        cache.get("http://a/")
+        self.assertEqual(cache._conn.execute("SELECT last_access FROM pages").fetchone()[0], written)
+        cache.flush()
+        self.assertGreaterEqual(cache._conn.execute("SELECT last_access FROM pages").fetchone()[0], written)
+        self.assertEqual(cache._accessed, {})
+        cache.close()
+
+
+class CachedFetchTest(unittest.TestCase):
+    def _fetch_twice(self, settings, handler):
+        requests = []
+
+        def recording(request):
+            requests.append(request)
+            return handler(request)
+
+        async def run():
+            http = httpx.AsyncClient(transport=httpx.MockTransport(recording))
+            cache = PageCache(":memory:")
+            try:
+                # 5xx の再試行は待たずに最後の応答として扱う
+                with mock.patch.object(ingest_mode, "get_http_client", return_value=http), \
+                        mock.patch.object(ingest_mode, "get_page_cache", return_value=cache), \
+                        mock.patch.object(ingest_mode, "page_cache_settings", return_value=settings), \
+                        mock.patch.object(ingest_mode.get_fetch_scheduler(), "_retry_delay", return_value=None):
+                    first = await ingest_mode._fetch_text("https://eiga.com/movie/1/")
+                    try:
+                        second = await ingest_mode._fetch_text("https://eiga.com/movie/1/")
+                    except Exception as e:
+                        second = e
+            finally:
+                await http.aclose()
+                cache.close()
+            return first, second
+
+        return asyncio.run(run()), requests
+
+    def test_fresh_entry_is_served_without_network(self):
+        settings = dict(DEFAULT_PAGE_CACHE_SETTINGS)
+        (first, second), requests = self._fetch_twice(settings, lambda r: httpx.Response(200, content="本文".encode("utf-8")))
+        self.assertEqual((first, second), ("本文", "本文"))
+        self.assertEqual(len(requests), 1)
+
+    def test_stale_entry_is_revalidated_with_conditional_get(self):
+        settings = dict(DEFAULT_PAGE_CACHE_SETTINGS, fresh_sec=0.0)
+
+        def handler(request):
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(304)
+            return httpx.Response(200, content="本文".encode("utf-8"), headers={"ETag": '"v1"'})
+
+        (first, second), requests = self._fetch_twice(settings, handler)
+        self.assertEqual((first, second), ("本文", "本文"))
+        self.assertEqual([r.headers.get("If-None-Match") for r in requests], [None, '"v1"'])
+
+    def _fetch_then_fail(self, status, **overrides):
+        settings = dict(DEFAULT_PAGE_CACHE_SETTINGS, fresh_sec=0.0, **overrides)
+
+        def handler(request):
+            if request.headers.get("If-None-Match") == '"v1"':
+                return httpx.Response(status)
+            return httpx.Response(200, content="本文".encode("utf-8"), headers={"ETag": '"v1"'})
+
+        (first, second), _ = self._fetch_twice(settings, handler)
+        self.assertEqual(first, "本文")
+        return second
+
+    def test_stale_entry_is_served_on_5xx(self):
+        self.assertEqual(self._fetch_then_fail(503), "本文")
+
+    def test_stale_entry_is_not_served_on_4xx_or_when_too_old(self):
+        for status, overrides in ((404, {}), (410, {}), (503, {"max_stale_sec": 0.0})):
+            second = self._fetch_then_fail(status, **overrides)
+            self.assertIsInstance(second, httpx.HTTPStatusError)
+            self.assertEqual(second.response.status_code, status)
+
+
+class BoundedFetchTest(unittest.TestCase):
+    def _fetch(self, chunks, stop_at=None, status=200):
+        produced = []
+
+        async def body():
+            for chunk in chunks:
+                produced.append(chunk)
+                yield chunk
+
+        async def run():
+            http = httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(status, content=body())))
+            try:
+                with mock.patch.object(ingest_mode, "get_http_client", return_value=http), \
+                        mock.patch.object(ingest_mode, "get_page_cache", return_value=PageCache(":memory:")):
+                    return await ingest_mode._fetch_text("https://eiga.com/search/?q=x", stop_at=stop_at)
+            finally:
+                await http.aclose()
+
+        return asyncio.run(run()), produced
+
+    def test_stops_reading_at_the_limit_and_decodes_split_characters(self):
+        # マルチバイト文字がチャンク境界で分かれても崩れない
+        data = ("あ" * 50000).encode("utf-8")
+        chunks = [data[i:i + 4097] for i in range(0, len(data), 4097)] * 4
+        with mock.patch.object(ingest_mode, "FETCH_BYTES_LIMIT", 30000):
+            text, produced = self._fetch(chunks)
+        self.assertEqual(text, "あ" * 30000)
+        self.assertLess(len(produced), len(chunks) // 2)
+
+    def test_stop_at_pattern_ends_the_read_early(self):
+        chunks = [b"<html>" + b"x" * 1000, b'<a href="/per', b'son/42/">p</a>'] + [b"y" * 1000] * 20
+        text, produced = self._fetch(chunks, stop_at=ingest_mode._PERSON_LINK_RE)
+        self.assertEqual(ingest_mode._PERSON_LINK_RE.search(text).group(2), "42")
+        self.assertEqual(len(produced), 3)
+
+    def test_non_200_success_status_is_read(self):
+        # 203（プロキシ経由など）も 2xx なので本文を読む
+        text, _ = self._fetch(["本文".encode("utf-8")], status=203)
+        self.assertEqual(text, "本文")
+
+
+if __name__ == "__main__":
+    unittest.main()
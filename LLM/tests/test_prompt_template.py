@@ -0,0 +1,61 @@
+import os
+import unittest
+
+from LLM.config_service import read_yaml
+from LLM.conversation_loop import safe_brace_format
+from LLM.prompt_template import CharacterPromptCache, CompiledTemplate, compile_character_prompt
+
+
+class CompiledTemplateTest(unittest.TestCase):
+    def test_render_matches_safe_brace_format(self):
+        template = '{a} と {"next":"X"} と {missing} と {b}{a}'
+        self.assertEqual(
+            CompiledTemplate(template).render(a="1", b="{a}"),
+            safe_brace_format(template, a="1", b="{a}"),
+        )
+
+    def test_bind_keeps_values_literal(self):
+        bound = CompiledTemplate("{x}-{y}-{x}").bind(x="{y}")
+        self.assertEqual(bound.render(y="Y"), "{y}-Y-{y}")
+        self.assertEqual(bound.keys, ("y",))
+
+
+class CharacterPromptTest(unittest.TestCase):
+    def setUp(self):
+        self.rules = read_yaml(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "global_rules.yaml"))
+
+    def _legacy(self, name, persona, others, log):
+        rc = safe_brace_format(self.rules.get("response_constraints", ""), character_name=name)
+        fr = safe_brace_format(self.rules.get("flow_rules", ""), other_characters=others)
+        return safe_brace_format(
+            self.rules.get("prompt_template", "{persona_prompt}"),
+            character_name=name, persona_prompt=persona, response_constraints=rc,
+            flow_rules=fr, other_characters=others, conversation_log=log,
+        )
+
+    def test_same_output_as_per_turn_formatting(self):
+        compiled = compile_character_prompt("ルミナ", "ペルソナ", self.rules, "クラリス, ノクス")
+        log = "ユーザー: こんにちは {conversation_log}"
+        self.assertEqual(compiled.render(log), self._legacy("ルミナ", "ペルソナ", "クラリス, ノクス", log))
+        self.assertTrue(compiled.render(log).startswith(compiled.static_prefix))
+        self.assertGreater(compiled.static_prefix_len, 1000)
+        self.assertNotIn("ユーザー: こんにちは", compiled.static_prefix)
+
+    def test_cache_rebuilds_only_on_change(self):
+        cache = CharacterPromptCache()
+        roster = ("a", "b")
+        calls = []
+
+        def others():
+            calls.append(1)
+            return "b"
+
+        first = cache.get("a", "p", self.rules, roster, others)
+        self.assertIs(cache.get("a", "p", self.rules, roster, others), first)
+        self.assertEqual(len(calls), 1)
+        self.assertIsNot(cache.get("a", "p", self.rules, ("a", "b", "c"), others), first)
+        self.assertIsNot(cache.get("a", "p2", self.rules, roster, others), first)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,80 @@
+import asyncio
+import unittest
+
+from LLM.response_cache import CachedLLM, ResponseCache, cache_key
+from LLM.stop_policy import StopPolicy
+
+
+class _FakeLLM:
+    def __init__(self):
+        self.calls = 0
+        self.base_url = "http://x"
+
+    async def ainvoke(self, system_prompt, user_message, stop_policy=None, static_prefix_len=0):
+        self.calls += 1
+        return f"{system_prompt}:{user_message}"
+
+    async def astream(self, system_prompt, user_message, stop_policy=None, static_prefix_len=0):
+        self.calls += 1
+        for part in ("a", "b", "c"):
+            yield part
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def test_key_covers_prompt_params_and_stop_policy(self):
+        base = cache_key("ollama", "m", {"temperature": 0.0}, {}, None, "sys", "user")
+        self.assertEqual(base, cache_key("Ollama", "m", {"temperature": 0.0}, {}, None, "sys", "user"))
+        self.assertNotEqual(base, cache_key("ollama", "m", {"temperature": 0.0}, {}, None, "sys2", "user"))
+        self.assertNotEqual(base, cache_key("ollama", "m", {"temperature": 0.0, "num_predict": 10}, {}, None, "sys", "user"))
+        self.assertNotEqual(base, cache_key("ollama", "m", {"temperature": 0.0}, {}, StopPolicy(max_chars=10), "sys", "user"))
+
+    def test_ttl_and_lru_limit(self):
+        cache = ResponseCache(":memory:", ttl_sec=60, max_entries=2)
+        cache.put("k1", "m", "one")
+        cache.put("k2", "m", "two")
+        self.assertEqual(cache.get("k1"), "one")  # k1 を最近参照にする
+        cache.put("k3", "m", "three")
+        self.assertIsNone(cache.get("k2"))
+        self.assertEqual((cache.get("k1"), cache.get("k3"), len(cache)), ("one", "three", 2))
+        cache.ttl_sec = 1e-9
+        self.assertIsNone(cache.get("k1"))
+        self.assertEqual(len(cache), cache._conn.execute("SELECT COUNT(*) FROM responses").fetchone()[0])
+        cache.close()
+
+    def test_hit_access_time_is_written_lazily(self):
+        cache = ResponseCache(":memory:", max_entries=10)
+        cache.put("k1", "m", "one")
+        written = cache._conn.execute("SELECT last_access FROM responses").fetchone()[0]
+
+        async def run():
+            return await cache.aget("k1")
+
+        self.assertEqual(asyncio.run(run()), "one")
+        # 参照のたびには書き込まない（溜めて flush/削除前にまとめて書く）
+        self.assertEqual(cache._conn.execute("SELECT last_access FROM responses").fetchone()[0], written)
+        self.assertIn("k1", cache._accessed)
+        cache.flush()
+        self.assertEqual(cache._accessed, {})
+        cache.close()
+
+    def test_cached_llm_reuses_invoke_and_completed_stream(self):
+        fake = _FakeLLM()
+        llm = CachedLLM(fake, ResponseCache(":memory:"), "ollama", "m", {"temperature": 0.0})
+
+        async def run():
+            first = await llm.ainvoke("s", "u")
+            second = await llm.ainvoke("s", "u")
+            streamed = [d async for d in llm.astream("s", "v")]
+            replay = [d async for d in llm.astream("s", "v")]
+            return first, second, streamed, replay
+
+        first, second, streamed, replay = asyncio.run(run())
+        self.assertEqual((first, second), ("s:u", "s:u"))
+        self.assertEqual(streamed, ["a", "b", "c"])
+        self.assertEqual(replay, ["abc"])
+        self.assertEqual(fake.calls, 2)
+        self.assertEqual(llm.base_url, "http://x")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,58 @@
+import asyncio
+import unittest
+
+# アプリ本体と同じくフラットな import（from llm_factory import ...）を解決する
+
+from LLM.speculation import SpeculativeStream
+
+
+class SpeculativeStreamTest(unittest.TestCase):
+    def test_buffers_then_replays(self):
+        async def source():
+            for t in ("a", "b", "c"):
+                yield t
+
+        async def run():
+            spec = SpeculativeStream(source)
+            await asyncio.sleep(0.01)
+            self.assertTrue(spec.done)
+            self.assertEqual(spec.buffered_chars, 3)
+            return await spec.collect()
+
+        self.assertEqual(asyncio.run(run()), "abc")
+
+    def test_cancel_closes_upstream(self):
+        closed = []
+
+        async def source():
+            try:
+                while True:
+                    await asyncio.sleep(0.005)
+                    yield "x"
+            finally:
+                closed.append(True)
+
+        async def run():
+            spec = SpeculativeStream(source)
+            await asyncio.sleep(0.02)
+            spec.cancel()
+            await asyncio.sleep(0.01)
+            return spec.done
+
+        self.assertTrue(asyncio.run(run()))
+        self.assertEqual(closed, [True])
+
+    def test_error_is_raised_on_consume(self):
+        async def source():
+            yield "a"
+            raise RuntimeError("boom")
+
+        async def run():
+            return await SpeculativeStream(source).collect()
+
+        with self.assertRaises(RuntimeError):
+            asyncio.run(run())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import unittest
+
+from LLM.stop_policy import StopPolicy
+
+
+class StopPolicyTest(unittest.TestCase):
+    def test_sentence_budget(self):
+        policy = StopPolicy(max_sentences=2)
+        self.assertFalse(policy.is_satisfied("一文目。二文目"))
+        self.assertTrue(policy.is_satisfied("一文目。二文目。"))
+
+    def test_char_budget(self):
+        policy = StopPolicy(max_chars=10)
+        self.assertFalse(policy.is_satisfied("あいうえお"))
+        self.assertTrue(policy.is_satisfied("あいうえおかきくけこ"))
+
+    def test_next_tag(self):
+        policy = StopPolicy(stop_on_next_tag=True)
+        self.assertFalse(policy.is_satisfied("了解です。[Next: LUM"))
+        self.assertTrue(policy.is_satisfied("了解です。[Next: LUMINA]"))
+
+    def test_budget_waits_for_trailing_next_tag(self):
+        policy = StopPolicy(max_sentences=2, stop_on_next_tag=True, next_tag_grace_chars=20)
+        two = "一文目。二文目。"
+        self.assertFalse(policy.is_satisfied(two))
+        self.assertFalse(policy.is_satisfied(two + "[Next: CLA"))
+        self.assertTrue(policy.is_satisfied(two + "[Next: CLARIS]"))
+        # タグが来なければ猶予分を読んだところで止める
+        self.assertFalse(policy.is_satisfied(two + "三" * 19))
+        self.assertTrue(policy.is_satisfied(two + "三" * 20))
+
+    def test_text_filter_applied_before_counting(self):
+        policy = StopPolicy(max_sentences=1, text_filter=lambda s: s.replace("こんにちは！", "").strip())
+        self.assertFalse(policy.is_satisfied("こんにちは！"))
+        self.assertTrue(policy.is_satisfied("こんにちは！晴れです。"))
+
+    def test_server_side_only(self):
+        policy = StopPolicy(stop_sequences=("<<<JSON_END>>>",))
+        self.assertFalse(policy.needs_client_side)
+        self.assertEqual(policy.server_stop(), ["<<<JSON_END>>>"])
+
+
+if __name__ == "__main__":
+    unittest.main()
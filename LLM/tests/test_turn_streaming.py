@@ -0,0 +1,101 @@
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+import httpx
+
+from LLM.conversation_loop import StreamingResponseShaper, _final_message_frame, _stream_response, build_turn_stop_policy
+from LLM.llm_factory import AsyncOllamaClient
+
+
+class _FakeWebSocket:
+    def __init__(self):
+        self.frames = []
+
+    async def send_json(self, frame):
+        self.frames.append(frame)
+
+
+def _ollama_stream(parts, produced):
+    async def body():
+        for part in parts:
+            produced.append(part)
+            yield (json.dumps({"response": part, "done": False}) + "\n").encode("utf-8")
+        yield b'{"response": "", "done": true}\n'
+    return body()
+
+
+class StreamingShaperTest(unittest.TestCase):
+    def _feed_all(self, parts):
+        shaper = StreamingResponseShaper(max_sentences=2, max_chars=160)
+        return shaper, [shaper.feed(p) for p in parts]
+
+    def test_think_block_tags_and_json_are_never_shown(self):
+        shaper, outs = self._feed_all([
+            "<think>考え中", "…</think>", "晴れです。", "[ASK_SEA", "RCHER: 天気]", "明日も", "晴れます。", '{"next": "X"}',
+        ])
+        self.assertEqual("".join(outs), "晴れです。明日も晴れます。")
+        self.assertEqual(outs[:2], ["", ""])
+        self.assertEqual(shaper.sent, "晴れです。明日も晴れます。")
+
+    def test_preamble_is_held_then_removed(self):
+        shaper, outs = self._feed_all(["こんにちは", "！", "今日は雨です。"])
+        # 前置きだけの段階では何も出さず、本文が来てから前置きを除いて出す
+        self.assertEqual(outs, ["", "", "今日は雨です。"])
+
+    def test_deltas_stop_at_the_display_budget(self):
+        shaper, outs = self._feed_all(["一文目。", "二文目。", "三文目。", "[Next: LUMINA]"])
+        self.assertEqual(outs, ["一文目。", "二文目。", "", ""])
+        self.assertIn("[Next: LUMINA]", shaper.raw)
+
+
+class FinalFrameTest(unittest.TestCase):
+    def test_message_end_after_deltas_and_message_otherwise(self):
+        streamed = StreamingResponseShaper()
+        streamed.feed("一文目です。")
+        self.assertEqual(_final_message_frame(streamed, "ルミナ", "一文目です。"),
+                         {"type": "message_end", "speaker": "ルミナ", "text": "一文目です。"})
+        self.assertEqual(_final_message_frame(StreamingResponseShaper(), "ルミナ", "全文。", wants_ack=True),
+                         {"type": "message", "speaker": "ルミナ", "text": "全文。", "ack": True})
+
+
+class TurnStreamingTest(unittest.TestCase):
+    def _run_turn(self, parts):
+        produced = []
+
+        async def run():
+            http = httpx.AsyncClient(transport=httpx.MockTransport(lambda r: httpx.Response(200, content=_ollama_stream(parts, produced))))
+            ws = _FakeWebSocket()
+            shaper = StreamingResponseShaper(max_sentences=2, max_chars=160)
+            client = AsyncOllamaClient("http://ollama:1", "m")
+            try:
+                with mock.patch("LLM.llm_factory.get_http_client", return_value=http):
+                    raw = await _stream_response(ws, client.astream("sys", "hi", build_turn_stop_policy()), "ルミナ", shaper)
+            finally:
+                await http.aclose()
+            return raw, ws.frames, shaper
+
+        raw, frames, shaper = asyncio.run(run())
+        return raw, frames, shaper, produced
+
+    def test_next_tag_after_second_sentence_is_read_but_not_displayed(self):
+        parts = ["一文目です。", "二文目です。", "三文目も", "書きます。", "[Next: ", "CLARIS]", "その後の余計な文。"] + ["続き。"] * 20
+        raw, frames, shaper, produced = self._run_turn(parts)
+        # 表示は 2 文で止まるが、上流は指名タグまで読んでから閉じる
+        self.assertIn("[Next: CLARIS]", raw)
+        self.assertEqual(len(produced), 6)
+        shown = "".join(f["text"] for f in frames)
+        self.assertEqual(shown, "一文目です。二文目です。")
+        self.assertEqual({f["type"] for f in frames}, {"message_delta"})
+
+    def test_grace_budget_ends_the_stream_without_tag(self):
+        parts = ["一文目です。", "二文目です。"] + ["あ" * 10] * 30
+        raw, frames, shaper, produced = self._run_turn(parts)
+        self.assertNotIn("[Next:", raw)
+        self.assertLess(len(produced), len(parts))
+        self.assertEqual(shaper.sent, "一文目です。二文目です。")
+
+
+if __name__ == "__main__":
+    unittest.main()
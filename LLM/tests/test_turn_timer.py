@@ -0,0 +1,32 @@
+import time
+import unittest
+
+from LLM.turn_timer import TurnTimer
+
+
+class TurnTimerTest(unittest.TestCase):
+    def test_spans_accumulate(self):
+        timer = TurnTimer(True)
+        with timer.span("status"):
+            time.sleep(0.002)
+        with timer.span("status"):
+            time.sleep(0.002)
+        timer.add("llm", 5.0)
+        frame = timer.frame("ルミナ", "ab12cd34")
+        self.assertEqual(frame["type"], "timing")
+        self.assertEqual(frame["req_id"], "ab12cd34")
+        self.assertGreaterEqual(frame["spans"]["status"], 4.0)
+        self.assertEqual(frame["spans"]["llm"], 5.0)
+        self.assertGreaterEqual(frame["total_ms"], frame["spans"]["status"])
+
+    def test_disabled_is_noop(self):
+        timer = TurnTimer(False)
+        with timer.span("status"):
+            pass
+        timer.add("llm", 5.0)
+        self.assertEqual(timer.spans, {})
+        self.assertEqual(timer.total_ms(), 0.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+import time
+from contextlib import nullcontext
+from typing import Any, Dict, Optional
+
+
+_NULL_SPAN = nullcontext()
+
+
+class _Span:
+    __slots__ = ("_timer", "_name", "_started")
+
+    def __init__(self, timer: "TurnTimer", name: str):
+        self._timer = timer
+        self._name = name
+        self._started = 0.0
+
+    def __enter__(self) -> "_Span":
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> bool:
+        self._timer.add(self._name, (time.perf_counter() - self._started) * 1000)
+        return False
+
+
+class TurnTimer:
+    """
+    1ターン内の区間（span）ごとの所要時間を ms で集計する。
+    enabled=False のときは span() が共有の nullcontext を返すだけで、時刻取得も行わない。
+    同名の span は合算する。
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.spans: Dict[str, float] = {}
+        self.llm: Dict[str, Any] = {}
+        self._started = time.perf_counter() if enabled else 0.0
+
+    def span(self, name: str):
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def add(self, name: str, ms: float) -> None:
+        if self.enabled:
+            self.spans[name] = self.spans.get(name, 0.0) + ms
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self._started) * 1000 if self.enabled else 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        total = self.total_ms()
+        spans = {k: round(v, 1) for k, v in self.spans.items()}
+        out: Dict[str, Any] = {
+            "total_ms": round(total, 1),
+            "spans": spans,
+            # 計測していない区間（span の隙間）の合計
+            "unaccounted_ms": round(max(0.0, total - sum(self.spans.values())), 1),
+        }
+        if self.llm:
+            out["llm"] = dict(self.llm)
+        return out
+
+    def frame(self, speaker: str, req_id: Optional[str] = None) -> Dict[str, Any]:
+        """WebSocket へ送る {"type": "timing"} フレームを組み立てる。"""
+        data: Dict[str, Any] = {"type": "timing", "speaker": speaker}
+        if req_id:
+            data["req_id"] = req_id
+        data.update(self.as_dict())
+        return data
@@ -20,6 +20,8 @@ document.addEventListener('DOMContentLoaded', () => {
     let statusElements = {};
     let nameMapping = {};
     let shortNameMapping = {};
+    // ストリーミング中の吹き出し（speaker -> <p>要素）
+    let streamingBubbles = {};
     
     // ★★★ WebSocketのセットアップ ★★★
     const ws = new WebSocket(`ws://${window.location.host}/ws`);
@@ -40,10 +42,22 @@ document.addEventListener('DOMContentLoaded', () => {
             appLog('info', 'Processing message type:', data);
             // 新しいメッセージをログに追加
             addMessage(data.speaker, data.text);
+            ackRendered(data);
+        } else if (data.type === 'message_delta') {
+            // ストリーミング中の差分を話者ごとの吹き出しへ追記
+            appendMessageDelta(data.speaker, data.text);
+        } else if (data.type === 'message_end') {
+            appLog('info', 'Processing message_end type:', data);
+            // 最終テキストで確定（差分が無かった場合は新規に追加）
+            finalizeStreamingMessage(data.speaker, data.text);
+            ackRendered(data);
         } else if (data.type === 'status') {
             appLog('info', 'Processing status type:', data);
             // キャラクターステータスを更新
             updateStatus(data.character, data.status);
+        } else if (data.type === 'timing') {
+            // デバッグ用のターン内訳（画面には出さずコンソールへ）
+            console.debug('Turn timing:', data.speaker, data.total_ms, data.spans, data.llm);
         } else if (data.type === 'config') {
             appLog('info', 'Processing config type:', data);
             // キャラクター設定情報を受信
@@ -166,6 +180,39 @@ document.addEventListener('DOMContentLoaded', () => {
         appLog('info', `Message added: ${speaker}: ${text}`);
     };
     
+    const appendMessageDelta = (speaker, delta) => {
+        let p = streamingBubbles[speaker];
+        if (!p) {
+            const messageElement = createMessageElement(speaker, '');
+            chatLog.appendChild(messageElement);
+            p = messageElement.querySelector('.message-content p');
+            streamingBubbles[speaker] = p;
+        }
+        p.textContent += (delta || '');
+        scrollToBottom();
+    };
+
+    const finalizeStreamingMessage = (speaker, text) => {
+        const p = streamingBubbles[speaker];
+        if (p) {
+            p.textContent = text;
+            delete streamingBubbles[speaker];
+            scrollToBottom();
+        } else {
+            addMessage(speaker, text);
+        }
+    };
+    
+    // ペーシング（client_ack）: 描画が反映された次のフレームで ack を返す
+    const ackRendered = (data) => {
+        if (!data.ack) return;
+        requestAnimationFrame(() => {
+            if (ws.readyState === WebSocket.OPEN) {
+                ws.send(JSON.stringify({ type: 'ack', speaker: data.speaker }));
+            }
+        });
+    };
+
     const addSystemMessage = (text) => {
         appLog('info', `Adding system message: ${text}`);
         const msgDiv = document.createElement('div');